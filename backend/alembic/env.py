@@ -47,7 +47,8 @@ from app.db.base import Base
 # ⚠️ Si no importas un modelo, Alembic no lo verá en autogenerate
 from app.models import user, role, brand, audit_log, setting, category, subcategory, group, subgroup, \
     unit, account, concept, document, country, division, municipality, product, warehouse, \
-    third_party, purchase, entry, stock, payment_term
+    third_party, purchase, entry, stock, payment_term, stock_snapshot, kardex, stock_reservation, stock_alert, \
+    document_sequence, audit_read_rollup
  
 # Obtenemos los metadatos de los modelos ORM (tablas, columnas, etc.)
 target_metadata = Base.metadata
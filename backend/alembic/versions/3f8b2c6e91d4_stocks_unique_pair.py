@@ -0,0 +1,81 @@
+"""Unique (product_id, warehouse_id) on stocks
+
+Revision ID: 3f8b2c6e91d4
+Revises: 7c1e9a3d5b20
+Create Date: 2026-10-17 11:18:45.207731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8b2c6e91d4'
+down_revision: Union[str, Sequence[str], None] = '7c1e9a3d5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fusiona duplicados creados por altas concurrentes. Antes,
+    # `adjust_stock_quantity` reemplazaba el saldo por SUM(entradas) - SUM(salidas)
+    # del par, así que cada fila duplicada tenía el total completo (y luego
+    # dejaba de actualizarse): sumarlas multiplicaría el stock. Se conserva la
+    # fila más antigua con el saldo recalculado igual que en
+    # `rebuild_stock_quantities` (último cierre + movimientos activos
+    # posteriores) y `reserved` en 0 (nada lo mantenía todavía).
+    op.execute("""
+        WITH dup AS (
+            SELECT DISTINCT ON (product_id, warehouse_id) id, product_id, warehouse_id
+            FROM stocks
+            WHERE (product_id, warehouse_id) IN (
+                SELECT product_id, warehouse_id FROM stocks
+                GROUP BY product_id, warehouse_id HAVING COUNT(*) > 1
+            )
+            ORDER BY product_id, warehouse_id, created_at, id
+        ),
+        last_close AS (
+            SELECT MAX(period_end) AS period_end FROM stock_snapshots
+        ),
+        opening AS (
+            SELECT ss.product_id, ss.warehouse_id, ss.quantity
+            FROM stock_snapshots ss, last_close lc
+            WHERE ss.period_end = lc.period_end
+        ),
+        mv AS (
+            SELECT ei.product_id, e.warehouse_id,
+                   SUM(CASE d.document_type WHEN 'E' THEN ei.quantity
+                                            WHEN 'S' THEN -ei.quantity
+                                            ELSE 0 END) AS qty
+            FROM entry_items ei
+            JOIN entries e   ON e.id = ei.entry_id
+            JOIN documents d ON d.id = e.document_id
+            CROSS JOIN last_close lc
+            WHERE e.active
+              AND (lc.period_end IS NULL OR e.created_at > lc.period_end)
+            GROUP BY ei.product_id, e.warehouse_id
+        )
+        UPDATE stocks s
+        SET quantity = COALESCE(o.quantity, 0) + COALESCE(mv.qty, 0),
+            reserved = 0
+        FROM dup
+        LEFT JOIN opening o ON o.product_id = dup.product_id AND o.warehouse_id = dup.warehouse_id
+        LEFT JOIN mv        ON mv.product_id = dup.product_id AND mv.warehouse_id = dup.warehouse_id
+        WHERE s.id = dup.id
+    """)
+    op.execute("""
+        DELETE FROM stocks s
+        USING stocks k
+        WHERE s.product_id = k.product_id
+          AND s.warehouse_id = k.warehouse_id
+          AND (k.created_at, k.id) < (s.created_at, s.id)
+    """)
+    op.create_unique_constraint('uq_stocks_product_warehouse', 'stocks', ['product_id', 'warehouse_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_stocks_product_warehouse', 'stocks', type_='unique')
@@ -0,0 +1,39 @@
+"""Aggregated read-audit rollups
+
+Revision ID: 4a9c7e1b3f58
+Revises: 8e1f4a6c2d97
+Create Date: 2026-10-17 16:40:27.530912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a9c7e1b3f58'
+down_revision: Union[str, Sequence[str], None] = '8e1f4a6c2d97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('audit_read_rollups',
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('action', sa.String(length=50), nullable=False),
+    sa.Column('reads', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('bucket', 'user_id', 'entity', 'action')
+    )
+    op.create_index('ix_audit_read_rollups_entity_bucket', 'audit_read_rollups', ['entity', 'bucket'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_audit_read_rollups_entity_bucket', table_name='audit_read_rollups')
+    op.drop_table('audit_read_rollups')
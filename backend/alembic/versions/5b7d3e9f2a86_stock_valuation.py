@@ -0,0 +1,38 @@
+"""Weighted-average cost valuation on stocks
+
+Revision ID: 5b7d3e9f2a86
+Revises: c2e5f8a1d7b4
+Create Date: 2026-10-17 13:20:38.094551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7d3e9f2a86'
+down_revision: Union[str, Sequence[str], None] = 'c2e5f8a1d7b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('stocks', sa.Column('avg_cost', sa.Numeric(precision=14, scale=4), server_default='0', nullable=False))
+    op.add_column('stocks', sa.Column('total_value', sa.Numeric(precision=16, scale=2), server_default='0', nullable=False))
+    # Punto de partida: el costo de ficha del producto (luego se mueve con cada entrada)
+    op.execute("""
+        UPDATE stocks s
+        SET avg_cost = p.cost,
+            total_value = ROUND(s.quantity * p.cost, 2)
+        FROM products p
+        WHERE p.id = s.product_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('stocks', 'total_value')
+    op.drop_column('stocks', 'avg_cost')
@@ -0,0 +1,96 @@
+"""Partition audit_logs by month on created_at
+
+Revision ID: 6d2b8f0e4c71
+Revises: 4a9c7e1b3f58
+Create Date: 2026-10-17 17:25:49.106384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d2b8f0e4c71'
+down_revision: Union[str, Sequence[str], None] = '4a9c7e1b3f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_legacy")
+    op.execute("ALTER TABLE audit_logs_legacy RENAME CONSTRAINT audit_logs_pkey TO audit_logs_legacy_pkey")
+    op.execute("ALTER TABLE audit_logs_legacy RENAME CONSTRAINT audit_logs_user_id_fkey TO audit_logs_legacy_user_id_fkey")
+
+    # La clave de partición debe formar parte de la PK
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id          uuid         NOT NULL,
+            action      varchar(50)  NOT NULL,
+            entity      varchar(50)  NOT NULL,
+            entity_id   uuid,
+            description text         NOT NULL,
+            user_id     uuid,
+            created_at  timestamptz  NOT NULL DEFAULT now(),
+            CONSTRAINT audit_logs_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT audit_logs_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    # Red de seguridad: filas fuera de las particiones mensuales (no debería usarse)
+    op.execute("CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT")
+
+    # Una partición por mes (UTC) desde el registro más antiguo hasta 3 meses adelante
+    op.execute("""
+        DO $$
+        DECLARE
+            m      timestamp;
+            last_m timestamp := date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months';
+        BEGIN
+            SELECT COALESCE(date_trunc('month', min(created_at) AT TIME ZONE 'UTC'),
+                            date_trunc('month', now() AT TIME ZONE 'UTC'))
+              INTO m
+              FROM audit_logs_legacy;
+            WHILE m <= last_m LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                    'audit_logs_p' || to_char(m, 'YYYYMM'),
+                    to_char(m, 'YYYY-MM-DD') || ' 00:00:00+00',
+                    to_char(m + interval '1 month', 'YYYY-MM-DD') || ' 00:00:00+00'
+                );
+                m := m + interval '1 month';
+            END LOOP;
+        END $$;
+    """)
+
+    op.execute("""
+        INSERT INTO audit_logs (id, action, entity, entity_id, description, user_id, created_at)
+        SELECT id, action, entity, entity_id, description, user_id, created_at
+        FROM audit_logs_legacy
+    """)
+    op.execute("DROP TABLE audit_logs_legacy")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_partitioned")
+    op.execute("ALTER TABLE audit_logs_partitioned RENAME CONSTRAINT audit_logs_pkey TO audit_logs_partitioned_pkey")
+    op.execute("ALTER TABLE audit_logs_partitioned RENAME CONSTRAINT audit_logs_user_id_fkey TO audit_logs_partitioned_user_id_fkey")
+    op.create_table('audit_logs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('action', sa.String(length=50), nullable=False),
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.UUID(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("""
+        INSERT INTO audit_logs (id, action, entity, entity_id, description, user_id, created_at)
+        SELECT id, action, entity, entity_id, description, user_id, created_at
+        FROM audit_logs_partitioned
+    """)
+    op.execute("DROP TABLE audit_logs_partitioned CASCADE")
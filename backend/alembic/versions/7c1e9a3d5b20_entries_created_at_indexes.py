@@ -0,0 +1,30 @@
+"""Entries indexes for point-in-time stock
+
+Revision ID: 7c1e9a3d5b20
+Revises: f686417acd20
+Create Date: 2026-10-17 10:41:27.530118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e9a3d5b20'
+down_revision: Union[str, Sequence[str], None] = 'f686417acd20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_entries_warehouse_created', 'entries', ['warehouse_id', 'created_at'], unique=False)
+    op.create_index('ix_entries_created_at', 'entries', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_entries_created_at', table_name='entries')
+    op.drop_index('ix_entries_warehouse_created', table_name='entries')
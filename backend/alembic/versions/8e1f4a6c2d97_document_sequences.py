@@ -0,0 +1,44 @@
+"""Per document type and year sequence counters
+
+Revision ID: 8e1f4a6c2d97
+Revises: 5b7d3e9f2a86
+Create Date: 2026-10-17 15:02:11.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e1f4a6c2d97'
+down_revision: Union[str, Sequence[str], None] = '5b7d3e9f2a86'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('document_sequences',
+    sa.Column('scope', sa.String(length=50), nullable=False),
+    sa.Column('document_id', sa.UUID(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('last_value', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+    sa.PrimaryKeyConstraint('scope', 'document_id', 'year')
+    )
+    # Continúa la numeración existente: último consecutivo por tipo y año de cada tabla
+    for scope in ('entries', 'purchases'):
+        op.execute(f"""
+            INSERT INTO document_sequences (scope, document_id, year, last_value)
+            SELECT '{scope}', document_id, CAST(date_part('year', created_at) AS integer), MAX(sequence_number)
+            FROM {scope}
+            GROUP BY document_id, date_part('year', created_at)
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('document_sequences')
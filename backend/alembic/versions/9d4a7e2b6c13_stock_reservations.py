@@ -0,0 +1,49 @@
+"""Stock reservations with TTL
+
+Revision ID: 9d4a7e2b6c13
+Revises: 3f8b2c6e91d4
+Create Date: 2026-10-17 11:52:09.663104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4a7e2b6c13'
+down_revision: Union[str, Sequence[str], None] = '3f8b2c6e91d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stock_reservations',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('warehouse_id', sa.UUID(), nullable=False),
+    sa.Column('quantity', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('reference', sa.String(length=100), nullable=True),
+    sa.Column('entry_id', sa.UUID(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['entry_id'], ['entries.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['warehouse_id'], ['warehouses.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_reservations_active_expires', 'stock_reservations', ['expires_at'], unique=False, postgresql_where=sa.text("status = 'ACTIVE'"))
+    op.create_index('ix_stock_reservations_reference', 'stock_reservations', ['reference'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_reservations_reference', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_active_expires', table_name='stock_reservations')
+    op.drop_table('stock_reservations')
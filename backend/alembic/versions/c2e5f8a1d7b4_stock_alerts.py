@@ -0,0 +1,60 @@
+"""Stock min/max alerts
+
+Revision ID: c2e5f8a1d7b4
+Revises: 9d4a7e2b6c13
+Create Date: 2026-10-17 12:37:15.418820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e5f8a1d7b4'
+down_revision: Union[str, Sequence[str], None] = '9d4a7e2b6c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(sa.schema.CreateSequence(sa.Sequence('stock_alerts_change_seq')))
+    op.create_table('stock_alerts',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('warehouse_id', sa.UUID(), nullable=False),
+    sa.Column('alert_type', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('quantity', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('threshold', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('change_seq', sa.BigInteger(), server_default=sa.text("nextval('stock_alerts_change_seq')"), nullable=False),
+    sa.Column('opened_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('resolved_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['warehouse_id'], ['warehouses.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_stock_alerts_open_pair_type', 'stock_alerts', ['product_id', 'warehouse_id', 'alert_type'], unique=True, postgresql_where=sa.text("status = 'OPEN'"))
+    op.create_index('ix_stock_alerts_status_warehouse', 'stock_alerts', ['status', 'warehouse_id', 'opened_at'], unique=False)
+    op.create_index('ix_stock_alerts_change_seq', 'stock_alerts', ['change_seq'], unique=True)
+
+    # Estado inicial: una pasada única sobre stocks (después sólo filas tocadas)
+    op.execute("""
+        INSERT INTO stock_alerts (id, product_id, warehouse_id, alert_type, status, quantity, threshold)
+        SELECT gen_random_uuid(), product_id, warehouse_id, 'LOW', 'OPEN', quantity, min_stock
+        FROM stocks WHERE active AND min_stock > 0 AND quantity <= min_stock
+        UNION ALL
+        SELECT gen_random_uuid(), product_id, warehouse_id, 'OVER', 'OPEN', quantity, max_stock
+        FROM stocks WHERE active AND max_stock > 0 AND quantity > max_stock
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_alerts_change_seq', table_name='stock_alerts')
+    op.drop_index('ix_stock_alerts_status_warehouse', table_name='stock_alerts')
+    op.drop_index('uq_stock_alerts_open_pair_type', table_name='stock_alerts')
+    op.drop_table('stock_alerts')
+    op.execute(sa.schema.DropSequence(sa.Sequence('stock_alerts_change_seq')))
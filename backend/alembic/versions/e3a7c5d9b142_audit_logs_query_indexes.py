@@ -0,0 +1,36 @@
+"""Composite indexes for audit log queries
+
+Revision ID: e3a7c5d9b142
+Revises: 6d2b8f0e4c71
+Create Date: 2026-10-17 18:02:13.517204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c5d9b142'
+down_revision: Union[str, Sequence[str], None] = '6d2b8f0e4c71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Índices sobre la tabla particionada: PostgreSQL los crea en cada partición
+    # (y en las que se creen después)
+    op.create_index('ix_audit_logs_created_id', 'audit_logs', ['created_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_user_created', 'audit_logs', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_entity_created', 'audit_logs', ['entity', 'entity_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_action_created', 'audit_logs', ['action', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_audit_logs_action_created', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_entity_created', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_user_created', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_created_id', table_name='audit_logs')
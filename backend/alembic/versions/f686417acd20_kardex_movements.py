@@ -0,0 +1,52 @@
+"""Kardex movement ledger
+
+Revision ID: f686417acd20
+Revises: 02a4502c7505
+Create Date: 2026-10-17 10:04:51.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f686417acd20'
+down_revision: Union[str, Sequence[str], None] = '02a4502c7505'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('kardex_movements',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('seq', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('warehouse_id', sa.UUID(), nullable=False),
+    sa.Column('entry_id', sa.UUID(), nullable=True),
+    sa.Column('document_id', sa.UUID(), nullable=True),
+    sa.Column('document_number', sa.String(length=20), nullable=True),
+    sa.Column('document_date', sa.DateTime(), nullable=True),
+    sa.Column('movement_type', sa.String(length=20), nullable=False),
+    sa.Column('quantity', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('unit_cost', sa.Numeric(precision=14, scale=4), nullable=False),
+    sa.Column('balance', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('occurred_at', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+    sa.ForeignKeyConstraint(['entry_id'], ['entries.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['warehouse_id'], ['warehouses.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('seq')
+    )
+    op.create_index('ix_kardex_pair_occurred', 'kardex_movements', ['product_id', 'warehouse_id', 'occurred_at', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_kardex_pair_occurred', table_name='kardex_movements')
+    op.drop_table('kardex_movements')
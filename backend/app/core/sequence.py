@@ -1,46 +1,168 @@
+# =============================================================================
+# NUMERACIÓN DE DOCUMENTOS (consecutivo por tabla, tipo de documento y año)
+# =============================================================================
+# - El último consecutivo vive en `document_sequences`; el siguiente se toma
+#   con un único INSERT ... ON CONFLICT DO UPDATE ... RETURNING (O(1), sin
+#   MAX() sobre la tabla ni bloqueo de la fila de `documents`).
+# - La fila del contador queda bloqueada hasta el commit del documento: la
+#   numeración sigue siendo sin huecos (un rollback devuelve el número) y sólo
+#   espera quien numera el MISMO tipo de documento en el mismo año.
+# - Importaciones masivas: `reserve_document_number_blocks` toma un bloque
+#   contiguo por (documento, año) para todo el archivo en UNA sentencia y en
+#   una transacción corta propia, así la carga no retiene el contador.
+# =============================================================================
 from __future__ import annotations
+from collections import Counter
 from uuid import UUID
-from typing import Optional, Tuple, Type
 from datetime import datetime
+from typing import Iterable, Mapping
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, text
-from app.models.document import Document
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from fastapi import HTTPException
 
-# ✅ Asegúrate de tener una versión asíncrona de get_setting
-# (puedes renombrarla como prefieras)
-from app.core.settings import get_setting_async  # <-- implementa/usa tu versión async
+from app.models.document import Document
+from app.models.document_sequence import DocumentSequence
+
+
+def format_document_number(prefix: str, year: int, sequence: int) -> str:
+    """
+    Código visible del documento:
+      <prefix opcional terminado en '-'><año>-<secuencia 5 dígitos>
+    Ejemplo: 'FAC-2025-00042' o '2025-00042' si no hay prefijo.
+    """
+    p = (prefix or "").strip()
+    if p and not p.endswith("-"):
+        p += "-"
+    return f"{p}{year}-{sequence:05d}"
+
+
+async def allocate_document_sequence_blocks(
+    db: AsyncSession,
+    *,
+    scope: str,                                 # tabla numerada: 'entries', 'purchases'
+    counts: Mapping[tuple[UUID, int], int],     # {(document_id, year): cantidad de números}
+) -> dict[tuple[UUID, int], range]:
+    """
+    Reserva un bloque contiguo de consecutivos por (documento, año) con un
+    único UPSERT ... RETURNING y devuelve {(document_id, year): range}.
+    Los contadores se bloquean en orden, igual para todos, sin deadlocks.
+    No hace commit.
+    """
+    wanted = {(UUID(str(d)), int(y)): int(n) for (d, y), n in counts.items()}
+    if any(n < 1 for n in wanted.values()):
+        raise ValueError("count debe ser >= 1")
+    if not wanted:
+        return {}
+    ins = pg_insert(DocumentSequence).values([
+        {"scope": scope, "document_id": d, "year": y, "last_value": n}
+        for (d, y), n in sorted(wanted.items(), key=lambda kv: (str(kv[0][0]), kv[0][1]))
+    ])
+    stmt = ins.on_conflict_do_update(
+        index_elements=[DocumentSequence.scope, DocumentSequence.document_id, DocumentSequence.year],
+        set_={
+            "last_value": DocumentSequence.last_value + ins.excluded.last_value,
+            "updated_at": datetime.utcnow(),
+        },
+    ).returning(DocumentSequence.document_id, DocumentSequence.year, DocumentSequence.last_value)
+    blocks: dict[tuple[UUID, int], range] = {}
+    for document_id, year, last_value in (await db.execute(stmt)).all():
+        n = wanted[(document_id, year)]
+        blocks[(document_id, year)] = range(int(last_value) - n + 1, int(last_value) + 1)
+    return blocks
+
+
+async def allocate_document_sequence(
+    db: AsyncSession,
+    *,
+    scope: str,            # tabla numerada: 'entries', 'purchases'
+    document_id: UUID,
+    year: int,
+    count: int = 1,
+) -> int:
+    """
+    Reserva `count` consecutivos y devuelve el ÚLTIMO del bloque
+    (el bloque es `ultimo - count + 1 .. ultimo`). No hace commit.
+    """
+    blocks = await allocate_document_sequence_blocks(db, scope=scope, counts={(document_id, year): count})
+    return blocks[(UUID(str(document_id)), year)][-1]
+
+
+class DocumentNumberBlocks:
+    """Números pre-asignados de una importación; `take` entrega el siguiente por fila."""
+
+    def __init__(self, documents: dict[UUID, tuple[str, object]], blocks: dict[tuple[UUID, int], range]) -> None:
+        self._documents = documents                     # {document_id: (prefix, document_type)}
+        self._next = {k: iter(r) for k, r in blocks.items()}
+
+    def take(self, doc_id_str: str, year: int) -> tuple[UUID, object, int, str]:
+        """(document_id, document_type, secuencia, número visible) para la fila."""
+        try:
+            document_id = UUID(doc_id_str)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"document_id no es UUID: {doc_id_str}")
+        if document_id not in self._documents:
+            raise HTTPException(status_code=400, detail=f"document_id inválido: {doc_id_str}")
+        prefix, document_type = self._documents[document_id]
+        sequence = next(self._next[(document_id, year)])
+        return document_id, document_type, sequence, format_document_number(prefix, year, sequence)
+
+
+async def reserve_document_number_blocks(
+    session_factory,
+    *,
+    scope: str,
+    keys: Iterable[tuple[str, int]],            # (document_id del archivo, año) por fila
+) -> DocumentNumberBlocks:
+    """
+    Pre-asigna la numeración de una importación: una lectura de los tipos de
+    documento y un UPSERT con todos los bloques, en una transacción corta
+    propia que confirma de inmediato. Los ids mal formados o inexistentes no
+    reservan números; `take` levanta el error de la fila.
+    Si la importación se cancela, su bloque queda como hueco en la serie.
+    """
+    counts: Counter = Counter()
+    for doc_id_str, year in keys:
+        try:
+            counts[(UUID(doc_id_str), year)] += 1
+        except ValueError:
+            continue
+
+    async with session_factory() as db:
+        documents: dict[UUID, tuple[str, object]] = {}
+        if counts:
+            rows = await db.execute(
+                select(Document.id, Document.prefix, Document.document_type).where(
+                    Document.id.in_({d for d, _ in counts})
+                )
+            )
+            documents = {d: (prefix or "", document_type) for d, prefix, document_type in rows.all()}
+        blocks = await allocate_document_sequence_blocks(
+            db, scope=scope, counts={k: n for k, n in counts.items() if k[0] in documents}
+        )
+        await db.commit()
+    return DocumentNumberBlocks(documents, blocks)
+
 
 async def get_next_document_number_async(
     db: AsyncSession,
     *,
-    model,                 # Entry
+    model,                 # Entry / Purchase
     document_id: UUID,
     document_date: datetime,
     sequence_field: str = "sequence_number",
     prefix: str = "",
     date_field: str = "created_at",
 ) -> tuple[str, int]:
-    year = document_date.year
-
-    # 1) Lock del tipo de documento para serializar
-    dt_locked = await db.execute(
-        select(Document).where(Document.id == document_id).with_for_update()
-    )
-    if dt_locked.scalar_one_or_none() is None:
+    """
+    Siguiente número del documento para `model` en el año de `document_date`.
+    `sequence_field` y `date_field` se conservan por compatibilidad: el
+    contador ya no se calcula sobre esas columnas.
+    """
+    if document_id is None:
         raise HTTPException(status_code=404, detail="Tipo de documento no encontrado para numeración.")
-
-    # 2) Máximo consecutivo del año para ese tipo
-    date_col = getattr(model, date_field)
-    res = await db.execute(
-        select(func.coalesce(func.max(getattr(model, sequence_field)), 0)).where(
-            model.document_id == document_id,
-            func.date_part("year", date_col) == year,
-        )
+    year = document_date.year
+    next_seq = await allocate_document_sequence(
+        db, scope=model.__tablename__, document_id=document_id, year=year
     )
-    current_max = int(res.scalar_one() or 0)
-    next_seq = current_max + 1
-
-    # 3) Formato del número
-    doc_number = f"{prefix}-{year}-{next_seq:05d}" if prefix else f"{year}-{next_seq:05d}"
-    return doc_number, next_seq
\ No newline at end of file
+    return format_document_number(prefix, year, next_seq), next_seq
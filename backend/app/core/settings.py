@@ -1,41 +1,24 @@
-from sqlalchemy.orm import Session
-from app.models.setting import Setting
+from typing import Any
 
-async def get_setting_async(db: Session, key: str, default=None):
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.utils.settings_cache import settings_cache
+
+async def get_setting_async(db: AsyncSession, key: str, default: Any = None) -> Any:
     """
-    Recupera el valor de una configuración (setting) desde la base de datos,
-    realizando la conversión automática al tipo de dato correspondiente.
-    Si no existe la configuración, retorna el valor por defecto.
+    Recupera el valor de una configuración (setting) ya convertido al tipo
+    declarado (bool, int, float, json; el resto como str).
+    Se sirve desde la caché en memoria de settings (app/utils/settings_cache.py):
+    sólo consulta la base de datos si la caché no está cargada o fue invalidada.
+    Si no existe la configuración, o su valor no es válido para su tipo,
+    retorna el valor por defecto.
 
     Args:
-        db (Session): Sesión activa de SQLAlchemy.
+        db (AsyncSession): Sesión asíncrona activa de SQLAlchemy.
         key (str): Llave (nombre) del setting a buscar.
         default (Any, opcional): Valor a retornar si el setting no existe.
 
     Returns:
         Any: Valor del setting (ya convertido al tipo correspondiente), o default.
     """
-
-    # Busca el registro en la tabla 'settings' por la llave proporcionada
-    setting = await db.query(Setting).filter_by(key=key).first()
-    #print("SETTING:", setting.value)  
-    
-    # Si no existe el registro, retorna el valor por defecto
-    if not setting:
-        return default
-
-    # Procesa según el tipo declarado en el setting
-    if setting.type == "bool":
-        # Interpreta el valor como booleano (acepta "true", "True", "TRUE")
-        return setting.value.lower() == "true"
-    if setting.type == "int":
-        try:
-            # Convierte a entero, si falla retorna default
-            return int(setting.value)
-        except Exception:
-            return default
-
-    # Para otros tipos (ej: "string", "float", etc), retorna el valor tal cual está en la BD
-    return setting.value
-
-# Si quieres, puedes agregar también set_setting o utilidades similares aquí.
+    return await settings_cache.get(db, key, default)
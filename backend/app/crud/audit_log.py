@@ -1,7 +1,22 @@
 # app/crud/audit_log.py
+import base64
+import binascii
+import logging
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.models.audit_log import AuditLog
 from app.schemas.audit_log import AuditLogCreate
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.audit import log_action
+from app.utils.audit_level import get_audit_level
+
+logger = logging.getLogger(__name__)
 
 async def create_audit_log(
     db: AsyncSession,
@@ -13,3 +28,132 @@ async def create_audit_log(
     audit_log = AuditLog(**log_in.model_dump())
     db.add(audit_log)
     return audit_log  # Retornamos el objeto por si se quiere usar luego
+
+
+# =========================
+# CONSULTA (paginación por cursor sobre (created_at, id))
+# =========================
+def encode_audit_cursor(created_at: datetime, log_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{log_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_audit_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, log_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(log_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _audit_filters(
+    *,
+    user_id: Optional[UUID] = None,
+    entity: Optional[str] = None,
+    entity_id: Optional[UUID] = None,
+    action: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> list:
+    # Con rango de fechas PostgreSQL descarta las particiones mensuales que no tocan
+    filters = []
+    if user_id is not None:
+        filters.append(AuditLog.user_id == user_id)
+    if entity is not None:
+        filters.append(AuditLog.entity == entity)
+    if entity_id is not None:
+        filters.append(AuditLog.entity_id == entity_id)
+    if action is not None:
+        filters.append(AuditLog.action == action.upper())
+    if date_from is not None:
+        filters.append(AuditLog.created_at >= date_from)
+    if date_to is not None:
+        filters.append(AuditLog.created_at < date_to)
+    return filters
+
+
+def _describe(filters: dict) -> str:
+    return ", ".join(f"{k}={v}" for k, v in filters.items() if v is not None) or "sin filtros"
+
+
+async def list_audit_logs(
+    db: AsyncSession,
+    *,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    audit_user_id: Optional[UUID] = None,  # para auditar lecturas si nivel > 2
+    **filters,
+) -> Tuple[List[AuditLog], Optional[str]]:
+    """
+    Página de eventos del más reciente al más antiguo. El cursor es la última
+    (created_at, id) entregada: la página siguiente es un range scan sobre el
+    índice compuesto del filtro, sin OFFSET ni COUNT.
+    """
+    try:
+        conditions = _audit_filters(**filters)
+        if cursor:
+            conditions.append(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(*decode_audit_cursor(cursor)))
+
+        res = await db.execute(
+            select(AuditLog)
+            .where(*conditions)
+            .order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+            .limit(limit + 1)
+        )
+        items = list(res.scalars().all())
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_audit_cursor(items[-1].created_at, items[-1].id)
+
+        audit_level = await get_audit_level(db)
+        if audit_level > 2 and audit_user_id:
+            await log_action(
+                db,
+                action="LIST",
+                entity="AuditLog",
+                description=f"Consulta de auditoría ({_describe(filters)}) - limit={limit}",
+                user_id=audit_user_id,
+            )
+            await db.flush()  # sin commit en GET
+
+        return items, next_cursor
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("[list_audit_logs] Error SQLAlchemy: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al consultar la auditoría")
+
+
+async def stream_audit_logs(
+    db: AsyncSession,
+    *,
+    audit_user_id: UUID,
+    batch_size: int = 1000,
+    **filters,
+) -> AsyncIterator[dict]:
+    """
+    Todos los eventos del filtro en orden cronológico, leídos con un cursor de
+    servidor en lotes de `batch_size`: memoria constante sin importar el total.
+    Se leen columnas (no objetos ORM) para no pagar el mapeo por fila.
+    La exportación siempre queda auditada (fila durable, antes de leer).
+    """
+    await log_action(
+        db,
+        action="EXPORT",
+        entity="AuditLog",
+        description=f"Exportación de auditoría ({_describe(filters)})",
+        user_id=audit_user_id,
+        durable=True,
+    )
+    await db.commit()
+
+    result = await db.stream(
+        select(*AuditLog.__table__.c)
+        .where(*_audit_filters(**filters))
+        .order_by(AuditLog.created_at, AuditLog.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for row in result.mappings():
+        yield dict(row)
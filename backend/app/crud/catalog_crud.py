@@ -95,7 +95,7 @@ class CatalogCRUD:
 
             audit_level = await get_audit_level(db)
             if audit_level and audit_level >= 2:
-                await log_action(db, "CREATE", self.table_name, obj.id, user_id, {}, data)
+                await log_action(db, action="CREATE", entity=self.table_name, entity_id=obj.id, description=f"Creado: {data}", user_id=user_id)
             return obj
 
         except HTTPException:
@@ -130,7 +130,7 @@ class CatalogCRUD:
 
             audit_level = await get_audit_level(db)
             if audit_level and audit_level > 2 and user_id and hasattr(self.model, "id"):
-                await log_action(db, "LIST", self.table_name, None, user_id, {}, {"skip": skip, "limit": limit, "search": search, "active": active})
+                await log_action(db, action="LIST", entity=self.table_name, description=f"Consulta - skip={skip}, limit={limit}, search={search}, active={active}", user_id=user_id)
 
             return {"total": total, "items": rows}
 
@@ -183,7 +183,7 @@ class CatalogCRUD:
 
             audit_level = await get_audit_level(db)
             if audit_level and audit_level >= 2:
-                await log_action(db, "UPDATE", self.table_name, obj.id, user_id, old, data)
+                await log_action(db, action="UPDATE", entity=self.table_name, entity_id=obj.id, description=f"Cambios: {old} → {data}", user_id=user_id)
 
             return obj
 
@@ -227,7 +227,7 @@ class CatalogCRUD:
 
             audit_level = await get_audit_level(db)
             if audit_level and audit_level >= 2:
-                await log_action(db, "PATCH", self.table_name, obj.id, user_id, old, data)
+                await log_action(db, action="PATCH", entity=self.table_name, entity_id=obj.id, description=f"Actualización parcial: {old} → {data}", user_id=user_id)
 
             return obj
 
@@ -258,7 +258,7 @@ class CatalogCRUD:
 
             audit_level = await get_audit_level(db)
             if audit_level and audit_level >= 2:
-                await log_action(db, "DELETE", self.table_name, obj.id, user_id, {}, {})
+                await log_action(db, action="DELETE", entity=self.table_name, entity_id=obj.id, description="Eliminado", user_id=user_id)
 
             return True
 
@@ -93,7 +93,16 @@ from app.utils.audit import log_action
 from app.utils.audit_level import get_audit_level
 # ↑ Lee el nivel de auditoría desde settings (1=basic, 2=medium, 3=full) para decidir qué loguear.
 
-from app.helper.stock import adjust_stock_quantity
+from app.helper.stock import adjust_stock_quantities, movement_sign, stock_key
+
+from app.helper.stock_snapshot import ensure_period_open
+
+from app.helper.stock_reservation import commit_reservations
+
+from app.helper.kardex import kardex_movement, item_unit_cost, record_kardex_movements
+from app.helper.valuation import get_purchase_prices, movement_unit_costs, cost_outflows_at_average
+
+from app.models.document import Document
 # ↑ Helper transaccional que ajusta stock con SELECT ... FOR UPDATE (sin commit), seguro en concurrencia.
 
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -118,19 +127,19 @@ async def create_entry(
 ) -> Entry:
     """
     Crea una entrada (Entry) con sus ítems (EntryItem), ajusta el stock por bodega/producto
-    usando `adjust_stock_quantity` y registra auditoría dependiendo del nivel configurado.
+    usando `adjust_stock_quantities` (un solo lote) y registra auditoría dependiendo del nivel configurado.
 
     ⚙️ Flujo:
       1) Calcula fecha base y obtiene el tipo de documento (prefijo).
       2) Genera numeración consecutiva segura (posible uso de locks/advisory en la impl. interna).
       3) Inserta cabecera e ítems.
-      4) Ajusta stock acumulando delta POSITIVO (entradas aumentan inventario).
+      4) Ajusta stock con delta CON SIGNO según el tipo de documento (Entrada +, Salida -).
       5) Registra auditoría si corresponde.
       6) Commit explícito al final. Si algo falla, rollback.
 
     🔒 Transacción:
       - No se utiliza `with db.begin()` por petición expresa.
-      - `adjust_stock_quantity` NO debe hacer `commit()` ni `rollback()`.
+      - `adjust_stock_quantities` NO debe hacer `commit()` ni `rollback()`.
       - Cualquier excepción dispara `await db.rollback()` y se re-lanza traducida a HTTPException.
 
     Args:
@@ -163,6 +172,8 @@ async def create_entry(
             # Importante: mapeamos a 404 porque el tipo de documento es requerido y no existe.
             raise HTTPException(status_code=404, detail="Tipo de documento no encontrado.")
         prefix = doc_type.prefix or ""  # Si no hay prefijo, usamos cadena vacía y seguimos.
+        # Signo del movimiento: +1 Entrada, -1 Salida, 0 Neutral (no mueve inventario).
+        sign = movement_sign(doc_type.document_type)
 
         # ----------------------------------------------------------------------------------
         # 3) GENERAR NUMERACIÓN CORRELATIVA
@@ -189,6 +200,8 @@ async def create_entry(
 
         # Extraemos items del payload para insertarlos en su propia tabla
         items_data = entry_data.pop("items", [])
+        # Apartados (POS) que esta salida consume; no son columnas de Entry
+        reservation_ids = entry_data.pop("reservation_ids", None) or []
         # Inject numeración generada en la cabecera
         entry_data["entry_number"] = doc_number
         entry_data["sequence_number"] = sequence
@@ -201,6 +214,9 @@ async def create_entry(
         db.add(entry)
         await db.flush()  # => entry.id disponible para FK en items y logs
 
+        # No se admiten movimientos con fecha dentro de un periodo de stock ya cerrado
+        await ensure_period_open(db, entry.created_at)
+
         # ----------------------------------------------------------------------------------
         # 6) INSERTAR ÍTEMS Y AJUSTAR STOCK
         # ----------------------------------------------------------------------------------
@@ -210,8 +226,12 @@ async def create_entry(
 
         # Por cada ítem:
         #  - Insertar en `entry_items`
-        #  - Ajustar el stock de (warehouse_id, product_id) con delta POSITIVO
-        #    (porque esta operación es una ENTRADA de inventario).
+        #  - Acumular el delta de stock de (product_id, warehouse_id) con el signo del documento.
+        # El ajuste se aplica después, en UN solo lote (bloqueo + flush únicos).
+        stock_deltas: dict[tuple, Decimal] = {}
+        movements: list[dict] = []  # Kardex: un movimiento por ítem
+        # Costo de entrada: precio de la compra origen (si la hay) o subtotal / cantidad
+        purchase_prices = await get_purchase_prices(db, entry.purchase_id) if sign > 0 else {}
         for item_dict in items_data:
             # 6.1) Insertar ítem
             db_item = EntryItem(
@@ -225,25 +245,66 @@ async def create_entry(
             )
             db.add(db_item)
 
-            # 6.2) Ajuste de stock
+            # 6.2) Delta de stock
             # Convertimos la cantidad a Decimal para evitar issues de precisión si en el futuro
             # manejas cantidades fraccionarias; si son enteras, también funciona correctamente.
-            qty_delta = Decimal(str(item_dict["quantity"]))
-
-            # Llamamos al helper de stock:
-            #   - Debe hacer "upsert" (crear si no existe el registro de stock de esa bodega/producto).
-            #   - NO debe hacer commit/rollback; la transacción la gobierna este CRUD.
-            #   - Puede registrar auditoría interna o devolver cambios, pero sin confirmar.
-            await adjust_stock_quantity(
-                db=db,
+            # El delta lleva el signo del tipo de documento (Salidas restan).
+            qty_delta = Decimal(str(item_dict["quantity"])) * sign
+            if not qty_delta:
+                continue  # Documento neutral: no mueve inventario
+            key = (item_dict["product_id"], entry_in.warehouse_id)
+            stock_deltas[key] = stock_deltas.get(key, Decimal("0")) + qty_delta
+            unit_cost = purchase_prices.get(str(item_dict["product_id"])) or item_unit_cost(
+                item_dict["quantity"], item_dict["subtotal"], item_dict.get("price")
+            )
+            movements.append(kardex_movement(
                 product_id=item_dict["product_id"],
                 warehouse_id=entry_in.warehouse_id,
-                delta=qty_delta,                 # Delta POSITIVO porque es ENTRADA (aumenta el stock)
-                user_id=user_id,                 # Autor del movimiento (para auditoría de stock si aplica)
-                reason=f"Entrada {doc_number}",  # Contexto del movimiento (útil en auditoría)
-            )
-            # Si tu helper NO crea el registro de stock en ausencia, agrega esa lógica allí
-            # (o realiza una inicialización aquí antes de llamar a `adjust_stock_quantity`).
+                quantity=qty_delta,
+                movement_type="ENTRY",
+                unit_cost=unit_cost,
+                entry_id=entry.id,
+                document_id=entry.document_id,
+                document_number=doc_number,
+                document_date=entry.created_at,
+                user_id=user_id,
+            ))
+
+        # 6.3) Apartados: sólo una salida puede consumirlos, y sólo de sus propios pares.
+        #      Se confirman aquí para que salida y liberación de `reserved` sean atómicas.
+        released: dict[tuple, Decimal] = {}
+        if reservation_ids:
+            if sign >= 0:
+                raise HTTPException(status_code=400, detail="Sólo una salida de inventario puede consumir apartados.")
+            released = await commit_reservations(db, reservation_ids, entry_id=entry.id)
+            own_keys = {stock_key(p, w) for p, w in stock_deltas}
+            foreign = [k for k in released if k not in own_keys]
+            if foreign:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Apartados de pares que no están en la salida: "
+                           + "; ".join(f"product={p} en warehouse={w}" for p, w in foreign) + ".",
+                )
+
+        # 6.4) Ajuste de stock por lote:
+        #   - Hace "upsert" de los registros de stock faltantes.
+        #   - NO hace commit/rollback; la transacción la gobierna este CRUD.
+        #   - Inserta los ítems pendientes en el mismo flush.
+        #   - Una salida sólo consume lo disponible más lo que liberan sus apartados.
+        stocks = await adjust_stock_quantities(
+            db,
+            deltas=stock_deltas,
+            released=released,
+            user_id=user_id,                 # Autor del movimiento (para auditoría de stock si aplica)
+            reason=f"Entrada {doc_number}",  # Contexto del movimiento (útil en auditoría)
+            # Valorización: las entradas ingresan a su costo; las salidas salen al promedio vigente
+            unit_costs=movement_unit_costs(movements) if sign > 0 else None,
+        )
+
+        # 6.5) Kardex: movimientos con saldo corrido, en la misma transacción
+        if sign < 0:
+            cost_outflows_at_average(movements, stocks)
+        await record_kardex_movements(db, movements, {k: s.quantity for k, s in stocks.items()})
 
         # ----------------------------------------------------------------------------------
         # 7) AUDITORÍA DE LA CREACIÓN DE ENTRADA (CONDICIONAL)
@@ -296,6 +357,11 @@ async def create_entry(
         await db.rollback()
         raise
 
+    except ValueError as ve:
+        # Stock insuficiente (negativo o comprometido por apartados de otros): conflicto, no error interno
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(ve)) from ve
+
     except Exception as e:
         # Cualquier otro error inesperado (programación, red, etc.)
         await db.rollback()
@@ -396,8 +462,8 @@ async def deactivate_entry_and_return_stock(
     user_id: Optional[UUID] = None,
 ) -> Tuple[Optional[Entry], Optional[dict]]:
     """
-    Inactiva la entrada y recalcula el stock por producto en su bodega:
-    stock(producto, bodega) = sum(Entradas activas) - sum(Salidas activas)
+    Inactiva la entrada y revierte su efecto en el stock de su bodega
+    aplicando, por producto, el delta con signo contrario al del documento.
     """
     try:
         # 1) Cargar la entrada con ítems
@@ -418,31 +484,59 @@ async def deactivate_entry_and_return_stock(
             await db.flush()
             return entry, None
 
-        # 3) Marcar inactiva
+        # 3) Marcar inactiva (sólo si su periodo de stock sigue abierto)
+        await ensure_period_open(db, entry.created_at)
         entry.active = False
         entry.updated_at = datetime.utcnow()
-
-        # 4) Recalcular stock por producto (Entradas - Salidas)
-        #    - Hacemos flush para que esta entrada ya NO cuente en los SELECT del recalculo
         await db.flush()
 
+        # 4) Revertir el efecto de la entrada sobre el stock (delta con signo contrario)
+        #    - Entrada anulada → resta; Salida anulada → devuelve al inventario.
+        document_type = (
+            await db.execute(select(Document.document_type).where(Document.id == entry.document_id))
+        ).scalar_one_or_none()
+        sign = movement_sign(document_type)
+
         product_ids = {it.product_id for it in (entry.items or [])}
-        for pid in product_ids:
-            await adjust_stock_quantity(
-                db=db,
+        stock_deltas: dict[tuple, Decimal] = {}
+        movements: list[dict] = []
+        purchase_prices = await get_purchase_prices(db, entry.purchase_id) if sign > 0 else {}
+        for it in (entry.items or []):
+            qty_delta = -Decimal(str(it.quantity)) * sign
+            if not qty_delta:
+                continue  # Documento neutral: no movió inventario, no hay nada que revertir
+            key = (it.product_id, entry.warehouse_id)
+            stock_deltas[key] = stock_deltas.get(key, Decimal("0")) + qty_delta
+            movements.append(kardex_movement(
+                product_id=it.product_id,
                 warehouse_id=entry.warehouse_id,
-                product_id=pid,
-                delta=Decimal("0"),  # ignorado por la nueva impl; mantiene la firma
+                quantity=qty_delta,
+                movement_type="ENTRY_CANCEL",
+                unit_cost=purchase_prices.get(str(it.product_id)) or item_unit_cost(it.quantity, it.subtotal),
+                entry_id=entry.id,
+                document_id=entry.document_id,
+                document_number=entry.entry_number,
+                document_date=entry.created_at,
                 user_id=user_id,
-                reason=f"RECALC_AFTER_ENTRY_CANCEL | ref={entry.id}",
-            )
+            ))
+        stocks = await adjust_stock_quantities(
+            db,
+            deltas=stock_deltas,
+            user_id=user_id,
+            reason=f"REVERSE_ENTRY_CANCEL | ref={entry.id}",
+            # Entrada anulada: sale a su costo de ingreso. Salida anulada: reingresa al promedio.
+            unit_costs=movement_unit_costs(movements) if sign > 0 else None,
+        )
+        if sign < 0:
+            cost_outflows_at_average(movements, stocks)
+        await record_kardex_movements(db, movements, {k: s.quantity for k, s in stocks.items()})
 
         # 5) Auditoría
         audit_level = await get_audit_level(db)
         log_dict: Optional[dict] = None
         if audit_level >= 1 and user_id:
             description = (
-                "Entrada cancelada. Stock recalculado por producto (Entradas - Salidas). "
+                "Entrada cancelada. Stock revertido por producto. "
                 f"Productos afectados: {len(product_ids)}"
             )
             log = await log_action(
@@ -477,7 +571,11 @@ async def deactivate_entry_and_return_stock(
     except HTTPException:
         await db.rollback()
         raise
+    except ValueError as ve:
+        # Stock insuficiente para revertir (ya consumido o comprometido por apartados): conflicto
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(ve)) from ve
     except Exception as e:
         await db.rollback()
         logger.exception("[deactivate_entry] Error inesperado", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
\ No newline at end of file
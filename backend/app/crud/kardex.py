@@ -0,0 +1,76 @@
+# app/crud/kardex.py
+from __future__ import annotations
+
+from typing import Optional, List, Tuple
+from uuid import UUID
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models.kardex import KardexMovement
+from app.utils.audit import log_action
+from app.utils.audit_level import get_audit_level
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# KARDEX DE UN PAR (producto, bodega)
+# =========================
+async def get_kardex(
+    db: AsyncSession,
+    *,
+    product_id: UUID,
+    warehouse_id: UUID,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+    user_id: Optional[UUID] = None,  # para auditar lecturas si nivel > 2
+) -> Tuple[List[KardexMovement], int]:
+    """
+    Movimientos de un par en orden cronológico (occurred_at, seq), con su saldo
+    corrido ya materializado: un range scan sobre `ix_kardex_pair_occurred`,
+    sin recorrer el histórico de entradas.
+    """
+    try:
+        filters = [
+            KardexMovement.product_id == product_id,
+            KardexMovement.warehouse_id == warehouse_id,
+        ]
+        if date_from is not None:
+            filters.append(KardexMovement.occurred_at >= date_from)
+        if date_to is not None:
+            filters.append(KardexMovement.occurred_at <= date_to)
+
+        total = (await db.execute(select(func.count()).select_from(KardexMovement).where(*filters))).scalar_one()
+        res = await db.execute(
+            select(KardexMovement)
+            .where(*filters)
+            .order_by(KardexMovement.occurred_at, KardexMovement.seq)
+            .offset(skip)
+            .limit(limit)
+        )
+        items = list(res.scalars().all())
+
+        audit_level = await get_audit_level(db)
+        if audit_level > 2 and user_id:
+            await log_action(
+                db,
+                action="GETALL",
+                entity="Kardex",
+                description=f"Consulta de kardex product={product_id}, warehouse={warehouse_id} - skip={skip}, limit={limit}",
+                user_id=user_id,
+            )
+            await db.flush()  # sin commit en GET
+
+        return items, total
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("[get_kardex] Error SQLAlchemy: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al consultar el kardex")
@@ -2,9 +2,45 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from app.models.setting import Setting
 from app.crud.catalog_crud import CatalogCRUD
+from app.db.notify import notify
+from app.utils.settings_cache import SETTINGS_CHANNEL, mark_settings_changed
+
+
+class SettingCRUD(CatalogCRUD):
+    """
+    CatalogCRUD que avisa los cambios de settings: la caché local se invalida
+    al confirmar y los demás workers reciben un NOTIFY en la misma transacción.
+    """
+    async def _changed(self, db: AsyncSession, key) -> None:
+        await notify(db, SETTINGS_CHANNEL, str(key or ""))
+
+    async def create(self, db: AsyncSession, payload: dict, user_id: UUID):
+        mark_settings_changed(db)
+        obj = await super().create(db, payload, user_id)
+        await self._changed(db, obj.key)
+        return obj
+
+    async def update(self, db: AsyncSession, obj_id: UUID, payload: dict, user_id: UUID):
+        mark_settings_changed(db)
+        obj = await super().update(db, obj_id, payload, user_id)
+        await self._changed(db, obj.key)
+        return obj
+
+    async def patch(self, db: AsyncSession, obj_id: UUID, patch: dict, user_id: UUID):
+        mark_settings_changed(db)
+        obj = await super().patch(db, obj_id, patch, user_id)
+        await self._changed(db, obj.key)
+        return obj
+
+    async def delete(self, db: AsyncSession, obj_id: UUID, user_id: UUID):
+        mark_settings_changed(db)
+        result = await super().delete(db, obj_id, user_id)
+        await self._changed(db, obj_id)
+        return result
+
 
 # Unicidad por "key" en lugar de "code"
-_crud = CatalogCRUD(Setting, table_name="settings", unique_fields=("key",), search_fields=("key","description"), order_field="key", active_field="active")
+_crud = SettingCRUD(Setting, table_name="settings", unique_fields=("key",), search_fields=("key","description"), order_field="key", active_field="active")
 
 async def create_setting(db: AsyncSession, data: dict, user_id: UUID): return await _crud.create(db, data, user_id)
 async def get_settings(db: AsyncSession, skip=0, limit=100, search=None, active=None, user_id: UUID | None = None): return await _crud.list(db, skip, limit, search, active, user_id)
@@ -4,6 +4,7 @@ from __future__ import annotations
 from typing import Optional, List, Tuple
 from uuid import UUID
 from datetime import datetime
+from decimal import Decimal
 
 from fastapi import HTTPException, status
 from sqlalchemy import select, func
@@ -16,6 +17,12 @@ from app.models.audit_log import AuditLog  # por si log_action lo usa
 from app.schemas.stock import StockCreate, StockUpdate, StockPatch
 from app.utils.audit import log_action
 from app.utils.audit_level import get_audit_level
+from app.helper.stock_snapshot import get_stock_as_of as _stock_as_of
+from app.helper.stock_alert import evaluate_stock_alerts
+from app.helper.stock_cache import invalidate_stock_cache
+from app.helper.valuation import get_inventory_valuation as _inventory_valuation
+from app.helper.stock import stock_key, _to_dec
+from app.helper.kardex import kardex_movement, record_kardex_movements
 
 import logging
 logger = logging.getLogger(__name__)
@@ -58,6 +65,8 @@ async def create_stock(db: AsyncSession, stock_in: StockCreate, user_id: UUID) -
                 user_id=user_id,
             )
 
+        await evaluate_stock_alerts(db, [stock])
+        invalidate_stock_cache(db, [stock.product_id])
         await db.commit()
         await db.refresh(stock)
         return stock, log
@@ -125,14 +134,15 @@ async def get_stocks(
         # Auditoría (opcional)
         audit_level = await get_audit_level(db)
         if audit_level > 2 and user_id:
-            await log_action(
+            log = await log_action(
                 db,
                 action="GETALL",
                 entity="Stock",
                 description=f"Consulta stock - product_id={product_id}, warehouse_id={warehouse_id}, active={active}, skip={skip}, limit={limit}",
                 user_id=user_id,
             )
-            await db.commit()  # persistir log
+            if log in db:
+                await db.commit()  # persistir log (ruta transaccional; la diferida no toca la sesión)
 
         return {"total": total, "items": items}
 
@@ -146,6 +156,92 @@ async def get_stocks(
         raise HTTPException(status_code=500, detail=f"Error interno: {e}")
 
 
+# =========================
+# GET STOCK A UNA FECHA (point-in-time)
+# =========================
+async def get_stock_as_of(
+    db: AsyncSession,
+    as_of: datetime,
+    product_id: Optional[UUID] = None,
+    warehouse_id: Optional[UUID] = None,
+    user_id: Optional[UUID] = None,
+) -> dict:
+    """
+    Stock a la fecha `as_of` para un producto, una bodega o un par.
+    Parte del cierre de periodo anterior y suma sólo los movimientos posteriores.
+    """
+    if product_id is None and warehouse_id is None:
+        raise HTTPException(status_code=400, detail="Indique product_id y/o warehouse_id.")
+    try:
+        period_end, quantities = await _stock_as_of(
+            db, as_of=as_of, product_id=product_id, warehouse_id=warehouse_id
+        )
+        items = [
+            {"product_id": p, "warehouse_id": w, "quantity": q}
+            for (p, w), q in sorted(quantities.items(), key=lambda kv: (str(kv[0][1]), str(kv[0][0])))
+        ]
+
+        # Auditoría (opcional)
+        audit_level = await get_audit_level(db)
+        if audit_level > 2 and user_id:
+            log = await log_action(
+                db,
+                action="GETALL",
+                entity="Stock",
+                description=f"Consulta stock a fecha {as_of.isoformat()} - product_id={product_id}, warehouse_id={warehouse_id}",
+                user_id=user_id,
+            )
+            if log in db:
+                await db.commit()  # persistir log (ruta transaccional; la diferida no toca la sesión)
+
+        return {"as_of": as_of, "period_end": period_end, "total": len(items), "items": items}
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("[get_stock_as_of] Error SQLAlchemy: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error en la base de datos")
+
+
+# =========================
+# VALORIZACIÓN DE INVENTARIO
+# =========================
+async def get_inventory_valuation(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    warehouse_id: Optional[UUID] = None,
+    product_id: Optional[UUID] = None,
+    user_id: Optional[UUID] = None,
+) -> dict:
+    """
+    Reporte de valorización (costo promedio ponderado) con totales por bodega.
+    Lee `avg_cost` / `total_value` mantenidos en cada movimiento.
+    """
+    try:
+        report = await _inventory_valuation(
+            db, warehouse_id=warehouse_id, product_id=product_id, skip=skip, limit=limit
+        )
+
+        audit_level = await get_audit_level(db)
+        if audit_level > 2 and user_id:
+            log = await log_action(
+                db,
+                action="GETALL",
+                entity="Stock",
+                description=f"Consulta valorización - warehouse_id={warehouse_id}, product_id={product_id}, skip={skip}, limit={limit}",
+                user_id=user_id,
+            )
+            if log in db:
+                await db.commit()  # persistir log (ruta transaccional; la diferida no toca la sesión)
+
+        return report
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("[get_inventory_valuation] Error SQLAlchemy: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error en la base de datos")
+
+
 # =========================
 # GET BY ID
 # =========================
@@ -166,7 +262,7 @@ async def get_stock_by_id(
 
         audit_level = await get_audit_level(db)
         if audit_level > 2 and user_id:
-            await log_action(
+            log = await log_action(
                 db,
                 action="GETID",
                 entity="Stock",
@@ -174,7 +270,8 @@ async def get_stock_by_id(
                 description=f"Consultó stock: product={stock.product_id}, warehouse={stock.warehouse_id}",
                 user_id=user_id,
             )
-            await db.commit()  # persistir log
+            if log in db:
+                await db.commit()  # persistir log (ruta transaccional; la diferida no toca la sesión)
 
         return stock
 
@@ -190,6 +287,36 @@ async def get_stock_by_id(
         raise HTTPException(status_code=500, detail=f"Error interno: {e}")
 
 
+async def _record_manual_adjustment(db: AsyncSession, stock: Stock, old_pair: tuple, old_qty, user_id) -> None:
+    """
+    Kardex de un cambio manual de stock (misma transacción): un ADJUST por la
+    diferencia, o, si cambió el par, la salida total del par anterior y la
+    entrada total del nuevo. Así el saldo corrido sigue coincidiendo con `stocks`.
+    """
+    new_pair = stock_key(stock.product_id, stock.warehouse_id)
+    old_pair = stock_key(*old_pair)
+    new_qty, old_qty = _to_dec(stock.quantity), _to_dec(old_qty)
+    unit_cost = _to_dec(stock.avg_cost)
+    if old_pair == new_pair:
+        changes = [(new_pair, new_qty - old_qty)]
+        balances = {new_pair: new_qty}
+    else:
+        changes = [(old_pair, -old_qty), (new_pair, new_qty)]
+        balances = {old_pair: Decimal("0"), new_pair: new_qty}
+    movements = [
+        kardex_movement(
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            quantity=qty,
+            movement_type="ADJUST",
+            unit_cost=unit_cost,
+            user_id=user_id,
+        )
+        for (product_id, warehouse_id), qty in changes
+    ]
+    await record_kardex_movements(db, movements, balances)
+
+
 # =========================
 # UPDATE (PUT / total)
 # =========================
@@ -214,13 +341,16 @@ async def update_stock(
         print("****************************************************************")
         print("**********************user_id:*******************************",user_id)
         print("****************************************************************")
-        res = await db.execute(select(Stock).where(Stock.id == stock_id))
+        # FOR UPDATE: el cambio manual y su kardex no se cruzan con movimientos concurrentes
+        res = await db.execute(select(Stock).where(Stock.id == stock_id).with_for_update())
         stock = res.scalars().first()
         if not stock:
             logger.info(f"[update_stock] Stock {stock_id} no encontrado.")
             return None, None
 
         cambios: List[str] = []
+        old_product_id = stock.product_id
+        old_pair, old_qty = (stock.product_id, stock.warehouse_id), stock.quantity
 
         def _set(attr: str, new_val):
             old_val = getattr(stock, attr)
@@ -273,6 +403,9 @@ async def update_stock(
             )
 
         await db.flush()
+        await _record_manual_adjustment(db, stock, old_pair, old_qty, user_id)
+        await evaluate_stock_alerts(db, [stock])  # cambios de cantidad o de umbrales
+        invalidate_stock_cache(db, {old_product_id, stock.product_id})
         await db.commit()
         await db.refresh(stock)
         return stock, log
@@ -308,7 +441,8 @@ async def patch_stock(
     product_id o warehouse_id. Registra auditoría.
     """
     try:
-        res = await db.execute(select(Stock).where(Stock.id == stock_id))
+        # FOR UPDATE: el cambio manual y su kardex no se cruzan con movimientos concurrentes
+        res = await db.execute(select(Stock).where(Stock.id == stock_id).with_for_update())
         stock = res.scalars().first()
         if not stock:
             logger.info(f"[patch_stock] Stock {stock_id} no encontrado.")
@@ -316,6 +450,8 @@ async def patch_stock(
 
         data = stock_in.model_dump(exclude_unset=True)
         cambios: List[str] = []
+        old_product_id = stock.product_id
+        old_pair, old_qty = (stock.product_id, stock.warehouse_id), stock.quantity
 
         # Efectivos (para validar unicidad con posibles cambios en el payload)
         new_product_id = data.get("product_id", stock.product_id)
@@ -361,6 +497,9 @@ async def patch_stock(
             )
 
         await db.flush()
+        await _record_manual_adjustment(db, stock, old_pair, old_qty, user_id)
+        await evaluate_stock_alerts(db, [stock])  # cambios de cantidad o de umbrales
+        invalidate_stock_cache(db, {old_product_id, stock.product_id})
         await db.commit()
         await db.refresh(stock)
         return stock, log
@@ -0,0 +1,75 @@
+# app/crud/stock_alert.py
+from __future__ import annotations
+
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models.stock_alert import StockAlert
+from app.utils.audit import log_action
+from app.utils.audit_level import get_audit_level
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# GET LIST (paginado + filtros)
+# =========================
+async def get_stock_alerts(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = "OPEN",
+    alert_type: Optional[str] = None,
+    warehouse_id: Optional[UUID] = None,
+    product_id: Optional[UUID] = None,
+    user_id: Optional[UUID] = None,
+) -> dict:
+    """
+    Lista alertas (por defecto las abiertas) desde la tabla de estado:
+    no evalúa `stocks`, así el costo no depende de la cantidad de SKUs.
+    """
+    try:
+        filters = []
+        if status:
+            filters.append(StockAlert.status == status)
+        if alert_type:
+            filters.append(StockAlert.alert_type == alert_type)
+        if warehouse_id:
+            filters.append(StockAlert.warehouse_id == warehouse_id)
+        if product_id:
+            filters.append(StockAlert.product_id == product_id)
+
+        total = (await db.execute(select(func.count(StockAlert.id)).where(*filters))).scalar_one()
+        res = await db.execute(
+            select(StockAlert)
+            .where(*filters)
+            .order_by(StockAlert.opened_at.desc(), StockAlert.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        items = list(res.scalars().all())
+
+        audit_level = await get_audit_level(db)
+        if audit_level > 2 and user_id:
+            log = await log_action(
+                db,
+                action="GETALL",
+                entity="StockAlert",
+                description=f"Consulta alertas de stock - status={status}, type={alert_type}, warehouse_id={warehouse_id}, skip={skip}, limit={limit}",
+                user_id=user_id,
+            )
+            if log in db:
+                await db.commit()  # persistir log (ruta transaccional; la diferida no toca la sesión)
+
+        return {"total": total, "items": items}
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("[get_stock_alerts] Error SQLAlchemy: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error en la base de datos")
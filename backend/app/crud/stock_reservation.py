@@ -0,0 +1,94 @@
+# app/crud/stock_reservation.py
+from __future__ import annotations
+
+from typing import Optional, List
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models.stock_reservation import StockReservation
+from app.schemas.stock_reservation import StockReservationCreate
+from app.helper.stock_reservation import reserve_stock, release_reservation
+from app.utils.audit import log_action
+from app.utils.audit_level import get_audit_level
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+async def _audit(db: AsyncSession, *, action: str, reservation: StockReservation, description: str, user_id) -> None:
+    """Los apartados son de alta frecuencia (POS): se auditan desde el nivel 2."""
+    audit_level = await get_audit_level(db)
+    if audit_level > 1 and user_id:
+        await log_action(
+            db,
+            action=action,
+            entity="StockReservation",
+            entity_id=reservation.id,
+            description=description,
+            user_id=user_id,
+        )
+
+
+# =========================
+# RESERVAR
+# =========================
+async def create_reservations(db: AsyncSession, data: StockReservationCreate, user_id: Optional[UUID]) -> List[StockReservation]:
+    try:
+        reservations = await reserve_stock(
+            db,
+            lines=[(ln.product_id, ln.warehouse_id, ln.quantity) for ln in data.lines],
+            ttl_seconds=data.ttl_seconds,
+            reference=data.reference,
+            user_id=user_id,
+        )
+        for r in reservations:
+            await _audit(
+                db,
+                action="RESERVE",
+                reservation=r,
+                description=f"Apartado {r.quantity} product={r.product_id} warehouse={r.warehouse_id} hasta {r.expires_at.isoformat()} ref={r.reference}",
+                user_id=user_id,
+            )
+        await db.commit()
+        return reservations
+    except HTTPException:
+        await db.rollback()
+        raise
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("[create_reservations] Error SQLAlchemy: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error en la base de datos al apartar stock")
+
+
+# =========================
+# LIBERAR
+# =========================
+# La confirmación no tiene endpoint propio: ocurre al crear la salida de
+# inventario con `reservation_ids` (ver `create_entry`), en su transacción.
+async def release_reservation_by_id(
+    db: AsyncSession,
+    reservation_id: UUID,
+    *,
+    user_id: Optional[UUID] = None,
+) -> StockReservation:
+    try:
+        reservation = await release_reservation(db, reservation_id)
+        await _audit(
+            db,
+            action="RELEASE",
+            reservation=reservation,
+            description=f"Apartado liberado: {reservation.quantity} product={reservation.product_id} warehouse={reservation.warehouse_id}",
+            user_id=user_id,
+        )
+        await db.commit()
+        return reservation
+    except HTTPException:
+        await db.rollback()
+        raise
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("[release_reservation] Error SQLAlchemy: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error en la base de datos al liberar el apartado")
@@ -0,0 +1,45 @@
+# ===========================================================
+# after_commit.py
+# Callbacks que se ejecutan sólo si la transacción se confirma
+# ===========================================================
+# Útil para avisar a otros componentes (streams, cachés) de un cambio sin
+# publicar nada que luego se revierta: los callbacks se guardan en
+# `session.info` y se disparan en `after_commit`; un rollback los descarta.
+import logging
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_KEY = "after_commit_callbacks"
+
+
+def on_commit(db: AsyncSession | Session, key: str, callback: Callable[[], None]) -> None:
+    """
+    Registra `callback` para después del commit. `key` deduplica: varios
+    registros con la misma clave en una transacción ejecutan el último.
+    El callback es síncrono y corre en el hilo del event loop.
+    """
+    session = db.sync_session if isinstance(db, AsyncSession) else db
+    session.info.setdefault(_KEY, {})[key] = callback
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    callbacks = session.info.pop(_KEY, None)
+    if not callbacks:
+        return
+    for callback in callbacks.values():
+        try:
+            callback()
+        except Exception:
+            logger.exception("Error en callback after_commit")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:  # sólo la transacción externa; un SAVEPOINT no descarta
+        session.info.pop(_KEY, None)
@@ -11,6 +11,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, Asyn
 
 # Importa la configuración del archivo `config.py` (donde está la URL de conexión a la base de datos)
 from app.core.config import settings
+from app.db.engine import engine_kwargs
 
 from typing import AsyncGenerator  # ✅ Importa esto para el tipo de retorno
 
@@ -18,10 +19,12 @@ from typing import AsyncGenerator  # ✅ Importa esto para el tipo de retorno
 # CREACIÓN DEL MOTOR DE BASE DE DATOS ASINCRÓNICO
 # ===========================================================
 # Este motor es responsable de administrar la conexión a la base de datos.
+# Pool, echo, pre-ping, caché de sentencias y statement_timeout salen del
+# perfil configurado (DB_PROFILE / DB_*), ver app/db/engine.py.
 async_engine = create_async_engine(
     settings.async_database_url,  # URL de conexión cargada desde el archivo .env
-    echo=True,                    # Si es True, muestra las consultas SQL en la consola (útil para depurar)
-    future=True                   # Usa la API 2.0 de SQLAlchemy (recomendado)
+    future=True,                  # Usa la API 2.0 de SQLAlchemy (recomendado)
+    **engine_kwargs()
 )
 
 # ===========================================================
@@ -0,0 +1,187 @@
+# ===========================================================
+# engine.py
+# Perfiles del motor de base de datos y métricas del pool
+# ===========================================================
+# - DB_PROFILE elige un perfil base (dev, prod, bench); si está vacío se
+#   deduce de APP_ENV ("production" -> prod, el resto -> dev). Cada DB_* que
+#   venga definido en el entorno pisa el valor del perfil.
+# - statement_timeout y application_name se envían como parámetros de sesión
+#   al abrir cada conexión asyncpg (sin SET por petición).
+# - El pool registra cuánto espera cada checkout (incluida la apertura de una
+#   conexión nueva): con esas cifras se dimensiona pool_size/max_overflow
+#   contra la latencia medida, no a ojo.
+import bisect
+import time
+from typing import Any, Optional
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+
+ENGINE_PROFILES: dict[str, dict[str, Any]] = {
+    # Desarrollo local: SQL en consola, pool chico
+    "dev": {
+        "echo": True,
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 30.0,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_cache_size": 100,
+        "statement_timeout_ms": 0,
+    },
+    # Producción: sin echo, checkout con timeout corto y consultas acotadas
+    "prod": {
+        "echo": False,
+        "pool_size": 10,
+        "max_overflow": 10,
+        "pool_timeout": 10.0,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_cache_size": 500,
+        "statement_timeout_ms": 30000,
+    },
+    # Benchmarks: pool fijo (sin overflow) y sin pre-ping para medir sólo la carga
+    "bench": {
+        "echo": False,
+        "pool_size": 20,
+        "max_overflow": 0,
+        "pool_timeout": 30.0,
+        "pool_recycle": -1,
+        "pool_pre_ping": False,
+        "statement_cache_size": 1000,
+        "statement_timeout_ms": 0,
+    },
+}
+
+# Pisadas opcionales desde Settings (None = usar el perfil)
+_OVERRIDES = {
+    "echo": "DB_ECHO",
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_timeout": "DB_POOL_TIMEOUT_SECONDS",
+    "pool_recycle": "DB_POOL_RECYCLE_SECONDS",
+    "pool_pre_ping": "DB_POOL_PRE_PING",
+    "statement_cache_size": "DB_STATEMENT_CACHE_SIZE",
+    "statement_timeout_ms": "DB_STATEMENT_TIMEOUT_MS",
+}
+
+
+def engine_profile_name() -> str:
+    name = (settings.DB_PROFILE or "").strip().lower()
+    if not name:
+        name = "prod" if settings.APP_ENV == "production" else "dev"
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"DB_PROFILE inválido: {name!r} (opciones: {', '.join(ENGINE_PROFILES)})")
+    return name
+
+
+def engine_profile() -> dict[str, Any]:
+    """Perfil efectivo: el base más las pisadas DB_* definidas."""
+    profile = dict(ENGINE_PROFILES[engine_profile_name()])
+    for option, attr in _OVERRIDES.items():
+        value = getattr(settings, attr)
+        if value is not None:
+            profile[option] = value
+    return profile
+
+
+def engine_kwargs(profile: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+    """Argumentos de `create_async_engine` para el perfil."""
+    p = profile or engine_profile()
+    server_settings = {"application_name": settings.DB_APPLICATION_NAME}
+    if p["statement_timeout_ms"]:
+        server_settings["statement_timeout"] = str(int(p["statement_timeout_ms"]))
+    return {
+        "echo": p["echo"],
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": p["pool_size"],
+        "max_overflow": p["max_overflow"],
+        "pool_timeout": p["pool_timeout"],
+        "pool_recycle": p["pool_recycle"],
+        "pool_pre_ping": p["pool_pre_ping"],
+        "connect_args": {
+            # Caché de sentencias preparadas del adaptador asyncpg de SQLAlchemy (0 = desactivada)
+            "prepared_statement_cache_size": p["statement_cache_size"],
+            "server_settings": server_settings,
+        },
+    }
+
+
+# ===========================================================
+# MÉTRICAS DE CHECKOUT
+# ===========================================================
+class PoolWaitMetrics:
+    # Límites superiores de los buckets del histograma, en milisegundos
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+        self.histogram[bisect.bisect_left(self.BUCKETS_MS, seconds * 1000)] += 1
+
+    def _quantile_ms(self, q: float) -> Optional[float]:
+        """Cota superior del bucket que contiene el cuantil `q` (aproximado)."""
+        if not self.checkouts:
+            return None
+        rank = q * self.checkouts
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank:
+                return float(self.BUCKETS_MS[i]) if i < len(self.BUCKETS_MS) else round(self.max_wait * 1000, 3)
+        return round(self.max_wait * 1000, 3)
+
+    def snapshot(self) -> dict:
+        labels = [f"le_{b}ms" for b in self.BUCKETS_MS] + ["gt_5000ms"]
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else None,
+            "p95_wait_ms": self._quantile_ms(0.95),
+            "p99_wait_ms": self._quantile_ms(0.99),
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+pool_wait_metrics = PoolWaitMetrics()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool que mide la espera de cada checkout."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            pool_wait_metrics.timeouts += 1
+            raise
+        pool_wait_metrics.observe(time.perf_counter() - started)
+        return conn
+
+
+def pool_metrics(engine) -> dict:
+    """Estado actual del pool del motor + esperas de checkout acumuladas en este worker."""
+    pool = engine.pool
+    return {
+        "profile": engine_profile_name(),
+        "pool_size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "wait": pool_wait_metrics.snapshot(),
+    }
@@ -0,0 +1,173 @@
+# ===========================================================
+# instrumentation.py
+# Conteo de SQL por petición y detector de N+1
+# ===========================================================
+# - Hooks before/after_cursor_execute en los motores: cada sentencia suma
+#   1 al contador, su duración y sus filas a las estadísticas de la petición
+#   en curso (ContextVar; fuera de una petición no se registra nada).
+# - "Forma" de una sentencia = SQL normalizado (parámetros y listas de
+#   VALUES/IN colapsados). Si la misma forma se ejecuta más de
+#   SQL_N_PLUS_ONE_THRESHOLD veces en una petición se registra un warning con
+#   la sentencia (una vez por forma y petición): típico de bucles por ítem.
+# - SQLInstrumentationMiddleware crea las estadísticas, agrega el header
+#   `Server-Timing` y acumula métricas por ruta (ver /api/system/sql).
+#   En respuestas en streaming sólo cuenta lo ejecutado antes de empezar a
+#   enviar el cuerpo.
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PARAM_RE = re.compile(r"\$\d+|%\(\w+\)s|\?")
+_VALUES_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL sin parámetros ni listas variables: misma forma = misma consulta en un bucle."""
+    shape = _PARAM_RE.sub("?", statement)
+    shape = _VALUES_RE.sub("(...)", shape)
+    shape = _LIST_RE.sub("...", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+@dataclass
+class RequestSQLStats:
+    statements: int = 0
+    db_time: float = 0.0
+    rows: int = 0
+    shapes: Counter = field(default_factory=Counter)
+    flagged: set = field(default_factory=set)
+    path: str = ""
+
+
+_current: ContextVar[Optional[RequestSQLStats]] = ContextVar("request_sql_stats", default=None)
+
+
+def current_sql_stats() -> Optional[RequestSQLStats]:
+    return _current.get()
+
+
+def _rows_of(cursor) -> int:
+    rowcount = getattr(cursor, "rowcount", -1) or 0
+    if rowcount >= 0:
+        return rowcount
+    # El cursor del adaptador asyncpg deja rowcount=-1 en SELECT; las filas ya están en memoria
+    rows = getattr(cursor, "_rows", None)
+    return len(rows) if rows is not None else 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Los EXPLAIN del registro de lentas (app/db/slow_queries.py) no cuentan
+    if _current.get() is not None and not conn.info.get("slow_explaining"):
+        conn.info.setdefault("sql_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None or conn.info.get("slow_explaining"):
+        return
+    started = conn.info.get("sql_started")
+    if not started:
+        return
+    stats.db_time += time.perf_counter() - started.pop()
+    stats.statements += 1
+    stats.rows += _rows_of(cursor)
+
+    shape = statement_shape(statement)
+    stats.shapes[shape] += 1
+    count = stats.shapes[shape]
+    if count > settings.SQL_N_PLUS_ONE_THRESHOLD and shape not in stats.flagged:
+        stats.flagged.add(shape)
+        logger.warning(
+            "Posible N+1 en %s: la misma consulta se ejecutó %d veces: %s",
+            stats.path, count, statement[:1000],
+        )
+
+
+def _handle_error(exception_context) -> None:
+    # Una sentencia fallida no pasa por after_cursor_execute: se descarta su inicio
+    conn = exception_context.connection
+    if conn is not None and not conn.info.get("slow_explaining") and conn.info.get("sql_started"):
+        conn.info["sql_started"].pop()
+
+
+def install_sql_instrumentation(engine) -> None:
+    """Registra los hooks en un AsyncEngine (o Engine). Idempotente."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# ===========================================================
+# MÉTRICAS POR RUTA
+# ===========================================================
+class SQLRouteMetrics:
+    def __init__(self) -> None:
+        self.routes: dict[str, dict] = {}
+
+    def observe(self, route: str, stats: RequestSQLStats) -> None:
+        m = self.routes.setdefault(route, {
+            "requests": 0, "statements": 0, "max_statements": 0,
+            "db_time_ms": 0.0, "rows": 0, "n_plus_one": 0,
+        })
+        m["requests"] += 1
+        m["statements"] += stats.statements
+        m["max_statements"] = max(m["max_statements"], stats.statements)
+        m["db_time_ms"] += stats.db_time * 1000
+        m["rows"] += stats.rows
+        m["n_plus_one"] += len(stats.flagged)
+
+    def snapshot(self) -> list[dict]:
+        out = []
+        for route, m in self.routes.items():
+            n = m["requests"]
+            out.append({
+                "route": route,
+                **m,
+                "db_time_ms": round(m["db_time_ms"], 3),
+                "avg_statements": round(m["statements"] / n, 2),
+                "avg_db_time_ms": round(m["db_time_ms"] / n, 3),
+            })
+        return sorted(out, key=lambda r: r["db_time_ms"], reverse=True)
+
+    def reset(self) -> None:
+        self.routes.clear()
+
+
+sql_route_metrics = SQLRouteMetrics()
+
+
+class SQLInstrumentationMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        stats = RequestSQLStats(path=f"{request.method} {request.url.path}")
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            resp = await call_next(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        route = request.scope.get("route")
+        sql_route_metrics.observe(f"{request.method} {getattr(route, 'path', request.url.path)}", stats)
+        if settings.SQL_SERVER_TIMING_HEADER:
+            resp.headers["Server-Timing"] = (
+                f'db;dur={stats.db_time * 1000:.2f};desc="{stats.statements} queries, {stats.rows} rows", '
+                f"app;dur={total_ms:.2f}"
+            )
+        return resp
@@ -0,0 +1,78 @@
+# ===========================================================
+# notify.py
+# Avisos entre workers con LISTEN/NOTIFY de PostgreSQL
+# ===========================================================
+# - `notify` encola el aviso dentro de la transacción actual: PostgreSQL lo
+#   entrega sólo al confirmarse (un rollback lo descarta), igual que los
+#   callbacks de `after_commit`.
+# - `run_listener` mantiene UNA conexión asyncpg dedicada por worker (fuera
+#   del pool) escuchando los canales registrados. Al conectar y al reconectar
+#   llama a cada handler con `None`: los avisos perdidos mientras no había
+#   conexión se tratan como "invalidar todo".
+import asyncio
+import logging
+from typing import Callable, Mapping, Optional
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Optional[str]], None]
+
+
+async def notify(db: AsyncSession, channel: str, payload: str = "") -> None:
+    """Aviso en `channel`, entregado a todos los workers cuando `db` confirma. No hace commit."""
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+
+
+def _dsn() -> str:
+    return make_url(settings.async_database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def _dispatch(handler: Handler, payload: Optional[str]) -> None:
+    try:
+        handler(payload)
+    except Exception:
+        logger.exception("Error en handler de LISTEN/NOTIFY")
+
+
+async def run_listener(handlers: Mapping[str, Handler], stop: asyncio.Event) -> None:
+    """Escucha `handlers` ({canal: handler}) hasta `stop`, reconectando con backoff."""
+    backoff = 1.0
+    while not stop.is_set():
+        conn: Optional[asyncpg.Connection] = None
+        lost = asyncio.Event()
+        try:
+            conn = await asyncpg.connect(_dsn())
+            conn.add_termination_listener(lambda _conn: lost.set())
+            for channel, handler in handlers.items():
+                await conn.add_listener(
+                    channel, lambda _conn, _pid, _channel, payload, h=handler: _dispatch(h, payload)
+                )
+                _dispatch(handler, None)  # pudo haber cambios mientras no escuchábamos
+            backoff = 1.0
+            waiters = [asyncio.create_task(stop.wait()), asyncio.create_task(lost.wait())]
+            try:
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for w in waiters:
+                    w.cancel()
+            if lost.is_set() and not stop.is_set():
+                logger.warning("Conexión LISTEN perdida; reconectando")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error en la conexión LISTEN; reintento en %.0fs", backoff)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, 30.0)
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
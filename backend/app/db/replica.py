@@ -0,0 +1,178 @@
+# ===========================================================
+# replica.py
+# Réplica de lectura opcional para listados y reportes (GET)
+# ===========================================================
+# - Con REPLICA_DATABASE_URL vacío todo sigue yendo al primario y
+#   `get_read_db` es equivalente a `get_async_db`.
+# - `get_read_db` entrega una sesión que lee de la réplica y escribe en el
+#   primario: los INSERT/UPDATE/DELETE (p. ej. la auditoría de lecturas que
+#   se hace con flush) y cualquier SQL textual van al primario, y desde la
+#   primera escritura toda la sesión sigue en el primario.
+# - Se usa el primario (sesión normal) cuando:
+#     * el usuario escribió hace menos de REPLICA_READ_YOUR_WRITES_SECONDS
+#       (lo marca ReadYourWritesMiddleware y se avisa a los demás workers
+#       por LISTEN/NOTIFY en PRIMARY_READS_CHANNEL),
+#     * el retraso medido de la réplica supera REPLICA_MAX_LAG_SECONDS o no
+#       se pudo medir.
+import asyncio
+import logging
+import time
+from typing import AsyncGenerator, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+from app.core.config import settings
+from app.db.async_session import AsyncSessionLocal, async_engine
+from app.db.engine import engine_kwargs
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_READS_CHANNEL = "primary_reads"
+_PRIMARY_KEY = "routing_primary"
+
+# Mismo perfil que el primario, pero sin mezclar sus métricas de checkout
+replica_engine = (
+    create_async_engine(
+        settings.REPLICA_DATABASE_URL,
+        future=True,
+        **{**engine_kwargs(), "poolclass": AsyncAdaptedQueuePool},
+    )
+    if settings.REPLICA_DATABASE_URL
+    else None
+)
+
+
+def _is_write(clause) -> bool:
+    # SQL textual: no se puede saber si escribe (pg_notify, advisory locks...) => primario
+    return (
+        isinstance(clause, (UpdateBase, TextClause))
+        or getattr(clause, "_for_update_arg", None) is not None
+    )
+
+
+class RoutingSession(Session):
+    """Session que lee de la réplica y manda escrituras (y lo que siga) al primario."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get(_PRIMARY_KEY) or self._flushing or _is_write(clause):
+            self.info[_PRIMARY_KEY] = True
+            return async_engine.sync_engine
+        return replica_engine.sync_engine
+
+
+ReadSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    expire_on_commit=False,
+)
+
+
+# ===========================================================
+# RETRASO DE LA RÉPLICA
+# ===========================================================
+_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReplicaRouter:
+    def __init__(self) -> None:
+        self.lag: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._recent_writers: dict[str, float] = {}
+        self._all_primary_until = 0.0
+        self.replica_sessions = 0
+        self.primary_sessions = 0
+        self.lag_fallbacks = 0
+        self.read_your_writes = 0
+
+    async def lag_seconds(self) -> Optional[float]:
+        """Retraso de la réplica (s), medido a lo sumo cada REPLICA_LAG_CHECK_SECONDS. None = desconocido."""
+        if time.monotonic() - self._checked_at < settings.REPLICA_LAG_CHECK_SECONDS:
+            return self.lag
+        async with self._lock:
+            if time.monotonic() - self._checked_at < settings.REPLICA_LAG_CHECK_SECONDS:
+                return self.lag
+            try:
+                async with replica_engine.connect() as conn:
+                    lag = (await conn.execute(_LAG_SQL)).scalar()
+                self.lag = float(lag) if lag is not None else None
+            except Exception:
+                logger.warning("No se pudo medir el retraso de la réplica", exc_info=True)
+                self.lag = None
+            self._checked_at = time.monotonic()
+        return self.lag
+
+    def mark_recent_write(self, user_id: Optional[str]) -> None:
+        """El usuario lee del primario durante la ventana de read-your-writes. None = todos."""
+        until = time.monotonic() + settings.REPLICA_READ_YOUR_WRITES_SECONDS
+        if not user_id:
+            self._all_primary_until = until
+            return
+        self._recent_writers[str(user_id)] = until
+        if len(self._recent_writers) > 10000:
+            now = time.monotonic()
+            self._recent_writers = {k: v for k, v in self._recent_writers.items() if v > now}
+
+    def wrote_recently(self, user_id: Optional[str]) -> bool:
+        now = time.monotonic()
+        if self._all_primary_until > now:
+            return True
+        return bool(user_id) and self._recent_writers.get(str(user_id), 0.0) > now
+
+    async def use_replica(self, user_id: Optional[str]) -> bool:
+        if replica_engine is None:
+            return False
+        if self.wrote_recently(user_id):
+            self.read_your_writes += 1
+            return False
+        lag = await self.lag_seconds()
+        if lag is None or lag > settings.REPLICA_MAX_LAG_SECONDS:
+            self.lag_fallbacks += 1
+            return False
+        return True
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": replica_engine is not None,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": settings.REPLICA_MAX_LAG_SECONDS,
+            "replica_sessions": self.replica_sessions,
+            "primary_sessions": self.primary_sessions,
+            "lag_fallbacks": self.lag_fallbacks,
+            "read_your_writes": self.read_your_writes,
+        }
+
+
+replica_router = ReplicaRouter()
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependencia para GET de listados y reportes: réplica si está sana y el
+    usuario no acaba de escribir; si no, la sesión normal del primario.
+    """
+    if await replica_router.use_replica(getattr(request.state, "user_id", None)):
+        replica_router.replica_sessions += 1
+        factory = ReadSessionLocal
+    else:
+        replica_router.primary_sessions += 1
+        factory = AsyncSessionLocal
+    async with factory() as session:
+        yield session
+
+
+def on_primary_reads_notification(payload: Optional[str]) -> None:
+    """Handler de PRIMARY_READS_CHANNEL (payload = user_id). None (reconexión) = todos al primario."""
+    replica_router.mark_recent_write(payload or None)
@@ -0,0 +1,174 @@
+# ===========================================================
+# slow_queries.py
+# Registro de sentencias lentas con su plan (EXPLAIN)
+# ===========================================================
+# - Hook en los motores: toda sentencia que tarde más de
+#   SLOW_QUERY_THRESHOLD_MS es candidata; se muestrea (SLOW_QUERY_SAMPLE_RATE)
+#   y se limita a SLOW_QUERY_MAX_PER_MINUTE capturas por worker.
+# - Cada captura guarda el SQL, la forma de los parámetros (tipos, nunca los
+#   valores) y el plan de `EXPLAIN (FORMAT JSON)` sin ANALYZE: no vuelve a
+#   ejecutar la sentencia. El EXPLAIN corre en la misma conexión (mismos
+#   parámetros y estado de sesión) dentro de un SAVEPOINT, así un error no
+#   aborta la transacción de la petición. El plan se reutiliza para la misma
+#   forma de consulta durante SLOW_QUERY_PLAN_TTL_SECONDS.
+# - Las capturas quedan en un buffer circular (SLOW_QUERY_BUFFER_SIZE) que se
+#   consulta en /api/system/slow-queries.
+import json
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db.instrumentation import current_sql_stats, statement_shape
+
+logger = logging.getLogger(__name__)
+
+_EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+_MAX_SQL_CHARS = 4000
+
+
+def _param_shape(parameters) -> Any:
+    """Tipos de los parámetros (listas largas resumidas): sin valores, sin datos personales."""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    types = [type(p).__name__ for p in parameters]
+    if len(types) > 20:
+        return types[:20] + [f"... ({len(types)} parámetros)"]
+    return types
+
+
+class SlowQueryRecorder:
+    def __init__(self) -> None:
+        self.entries: deque = deque(maxlen=settings.SLOW_QUERY_BUFFER_SIZE)
+        self._captures: deque = deque()      # instantes de las capturas del último minuto
+        self._plans: dict[str, tuple[float, Any]] = {}
+        self.slow = 0
+        self.captured = 0
+        self.rate_limited = 0
+        self.explain_errors = 0
+
+    def _allow(self) -> bool:
+        if random.random() >= settings.SLOW_QUERY_SAMPLE_RATE:
+            return False
+        now = time.monotonic()
+        while self._captures and now - self._captures[0] > 60:
+            self._captures.popleft()
+        if len(self._captures) >= settings.SLOW_QUERY_MAX_PER_MINUTE:
+            self.rate_limited += 1
+            return False
+        self._captures.append(now)
+        return True
+
+    def _explain(self, conn, shape: str, statement: str, parameters) -> tuple[Any, bool, Optional[str]]:
+        """(plan, reutilizado, error)."""
+        cached = self._plans.get(shape)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1], True, None
+        conn.info["slow_explaining"] = True
+        try:
+            conn.exec_driver_sql("SAVEPOINT slow_query_explain")
+            try:
+                raw = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+                conn.exec_driver_sql("RELEASE SAVEPOINT slow_query_explain")
+            except Exception:
+                conn.exec_driver_sql("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+            plan = json.loads(raw) if isinstance(raw, str) else raw
+            if len(self._plans) > 1000:
+                self._plans.clear()
+            self._plans[shape] = (time.monotonic() + settings.SLOW_QUERY_PLAN_TTL_SECONDS, plan)
+            return plan, False, None
+        except Exception as e:
+            self.explain_errors += 1
+            return None, False, str(e)[:500]
+        finally:
+            conn.info.pop("slow_explaining", None)
+
+    def observe(self, conn, statement: str, parameters, executemany: bool, seconds: float) -> None:
+        self.slow += 1
+        if not self._allow():
+            return
+        shape = statement_shape(statement)
+        plan, reused, error = None, False, None
+        if (
+            settings.SLOW_QUERY_EXPLAIN
+            and not executemany
+            and statement.lstrip().lower().startswith(_EXPLAINABLE)
+        ):
+            plan, reused, error = self._explain(conn, shape, statement, parameters)
+
+        stats = current_sql_stats()
+        self.captured += 1
+        self.entries.append({
+            "at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(seconds * 1000, 3),
+            "request": stats.path if stats is not None else None,
+            "statement": statement[:_MAX_SQL_CHARS],
+            "parameters": _param_shape(parameters if not executemany else (parameters or [None])[0]),
+            "executemany": executemany,
+            "plan": plan,
+            "plan_reused": reused,
+            "explain_error": error,
+        })
+        logger.warning("Sentencia lenta (%.0f ms): %s", seconds * 1000, statement[:500])
+
+    def snapshot(self, limit: int = 50) -> dict:
+        items = list(self.entries)[-limit:][::-1]
+        return {
+            "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+            "slow": self.slow,
+            "captured": self.captured,
+            "rate_limited": self.rate_limited,
+            "explain_errors": self.explain_errors,
+            "items": items,
+        }
+
+    def reset(self) -> None:
+        self.entries.clear()
+        self._plans.clear()
+        self.slow = self.captured = self.rate_limited = self.explain_errors = 0
+
+
+slow_query_recorder = SlowQueryRecorder()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not conn.info.get("slow_explaining"):
+        conn.info.setdefault("slow_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if conn.info.get("slow_explaining"):
+        return
+    started = conn.info.get("slow_started")
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    if seconds * 1000 < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+    try:
+        slow_query_recorder.observe(conn, statement, parameters, executemany, seconds)
+    except Exception:
+        logger.exception("Error registrando sentencia lenta")
+
+
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    if conn is not None and not conn.info.get("slow_explaining") and conn.info.get("slow_started"):
+        conn.info["slow_started"].pop()
+
+
+def install_slow_query_log(engine) -> None:
+    """Registra los hooks en un AsyncEngine (o Engine). Idempotente."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
@@ -0,0 +1,86 @@
+# =============================================================================
+# KARDEX: libro de movimientos de stock con saldo corrido
+# =============================================================================
+# - Se escribe dentro de la misma transacción que el ajuste de stock, después
+#   de que `adjust_stock_quantities` / `rebuild_stock_quantities` dejan el
+#   saldo final de cada par bloqueado con FOR UPDATE.
+# - El saldo de cada fila se obtiene recorriendo los movimientos del lote hacia
+#   atrás desde el saldo final, así el último movimiento coincide con `stocks`.
+# - Inserción en una sola sentencia (executemany) sin importar el tamaño del lote.
+# =============================================================================
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Mapping, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.kardex import KardexMovement
+from app.helper.stock import stock_key, _to_dec
+
+
+def item_unit_cost(quantity, subtotal, price=None) -> Decimal:
+    """Costo unitario del ítem: precio explícito o subtotal / cantidad."""
+    if price is not None:
+        return _to_dec(price)
+    qty = _to_dec(quantity)
+    if not qty:
+        return Decimal("0")
+    return (_to_dec(subtotal) / qty).quantize(Decimal("0.0001"))
+
+
+def kardex_movement(
+    *,
+    product_id,
+    warehouse_id,
+    quantity: Decimal,                 # con signo
+    movement_type: str,                # ENTRY | ENTRY_CANCEL | IMPORT | ADJUST | RECONCILE
+    unit_cost: Decimal = Decimal("0"),
+    entry_id=None,
+    document_id=None,
+    document_number: Optional[str] = None,
+    document_date: Optional[datetime] = None,
+    user_id=None,
+) -> dict:
+    """Arma un movimiento pendiente de registrar (el saldo se calcula al registrar)."""
+    product_id, warehouse_id = stock_key(product_id, warehouse_id)
+    return {
+        "product_id": product_id,
+        "warehouse_id": warehouse_id,
+        "quantity": _to_dec(quantity),
+        "movement_type": movement_type,
+        "unit_cost": _to_dec(unit_cost),
+        "entry_id": entry_id,
+        "document_id": document_id,
+        "document_number": document_number,
+        "document_date": document_date,
+        "user_id": user_id,
+    }
+
+
+async def record_kardex_movements(
+    db: AsyncSession,
+    movements: list[dict],
+    balances: Mapping[tuple, Decimal],   # saldo FINAL por par tras aplicar todos los movimientos
+) -> None:
+    """
+    Inserta los movimientos (en el orden recibido) con su saldo corrido.
+    No hace commit ni flush adicional: usa la transacción del caller.
+    """
+    movements = [m for m in movements if m["quantity"]]
+    if not movements:
+        return
+
+    running = {stock_key(*k): _to_dec(v) for k, v in balances.items()}
+    occurred_at = datetime.utcnow()
+    rows: list[dict] = [None] * len(movements)  # type: ignore[list-item]
+    for i in range(len(movements) - 1, -1, -1):
+        m = movements[i]
+        key = (m["product_id"], m["warehouse_id"])
+        balance = running.get(key, Decimal("0"))
+        rows[i] = {**m, "balance": balance, "occurred_at": occurred_at}
+        running[key] = balance - m["quantity"]
+
+    await db.execute(insert(KardexMovement), rows)
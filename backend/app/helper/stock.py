@@ -1,133 +1,391 @@
 # =============================================================================
 # IMPORTACIONES
 # =============================================================================
+import uuid
 from decimal import Decimal
 from datetime import datetime
+from typing import Iterable, Mapping, Optional
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, case, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.stock import Stock
 from app.models.entry import Entry, EntryItem
-from app.models.document import Document
+from app.models.document import Document, DocumentTypeEnum
+from app.utils.audit import log_actions
 from app.utils.audit_level import get_audit_level
-from app.utils.audit import log_action
+from app.helper.stock_snapshot import get_last_period_end, get_snapshot_quantities
+from app.helper.stock_alert import evaluate_stock_alerts
+from app.helper.stock_cache import invalidate_stock_cache
+
+# Par lógico de stock: (product_id, warehouse_id)
+StockKey = tuple[uuid.UUID, uuid.UUID]
+
+# Precisión de la valorización (misma escala que las columnas de `stocks`)
+_COST_Q = Decimal("0.0001")
+_VALUE_Q = Decimal("0.01")
 
 
 # =============================================================================
-# FUNCIÓN PRINCIPAL (misma firma)
+# UTILIDADES
 # =============================================================================
+def _to_dec(v) -> Decimal:
+    """Asegura un Decimal exacto (evita errores binarios de float)."""
+    if isinstance(v, Decimal):
+        return v
+    return Decimal(str(v or "0"))
+
+
+def _to_uuid(v) -> uuid.UUID:
+    """Normaliza ids recibidos como str (p.ej. desde CSV) a UUID."""
+    return v if isinstance(v, uuid.UUID) else uuid.UUID(str(v).strip())
+
+
+def stock_key(product_id, warehouse_id) -> StockKey:
+    """Clave normalizada (product_id, warehouse_id) usada por las APIs por lote."""
+    return _to_uuid(product_id), _to_uuid(warehouse_id)
+
+
+def apply_valuation(stock: Stock, delta: Decimal, unit_cost: Optional[Decimal] = None) -> None:
+    """
+    Costo promedio ponderado móvil del par, actualizado en O(1) por movimiento
+    (debe llamarse ANTES de actualizar `stock.quantity`):
+      - delta > 0 con costo: valor += delta * costo; promedio = valor / cantidad.
+      - delta > 0 sin costo: ingresa al promedio vigente.
+      - delta < 0: sale al promedio vigente (el promedio no cambia); si trae
+        costo (p.ej. anulación de una entrada) sale a ese costo.
+    Si la cantidad queda en 0 el valor vuelve a 0 y se conserva el último promedio.
+    """
+    old_qty = _to_dec(stock.quantity or 0)
+    old_value = _to_dec(stock.total_value or 0)
+    avg = _to_dec(stock.avg_cost or 0)
+    new_qty = old_qty + delta
+    if new_qty <= 0:
+        stock.total_value = Decimal("0")
+        return
+    cost = _to_dec(unit_cost) if unit_cost is not None else avg
+    new_value = max(old_value + delta * cost, Decimal("0"))
+    stock.total_value = new_value.quantize(_VALUE_Q)
+    if delta > 0 or unit_cost is not None:
+        stock.avg_cost = (new_value / new_qty).quantize(_COST_Q)
+
+
+def movement_sign(document_type) -> Decimal:
+    """
+    Signo del movimiento según el tipo de documento:
+      - 'E' (Entrada) →  1  (aumenta inventario)
+      - 'S' (Salida)  → -1  (disminuye inventario)
+      - 'N' (Neutral) →  0  (no mueve inventario)
+    Acepta el enum (`DocumentTypeEnum`) o su nombre como string.
+    """
+    name = getattr(document_type, "name", document_type)
+    if name == DocumentTypeEnum.E.name:
+        return Decimal("1")
+    if name == DocumentTypeEnum.S.name:
+        return Decimal("-1")
+    return Decimal("0")
+
+
+async def _lock_or_create_stocks(db: AsyncSession, keys: Iterable[StockKey], *, user_id=None) -> dict[StockKey, Stock]:
+    """
+    Asegura y bloquea las filas de Stock de los pares indicados en dos
+    sentencias, siempre en el mismo orden (product_id, warehouse_id):
+      1) INSERT ... ON CONFLICT DO NOTHING de todos los pares (alta en 0 de
+         los que falten; la restricción única evita duplicados concurrentes),
+      2) SELECT ... ORDER BY product_id, warehouse_id FOR UPDATE.
+    Como todas las transacciones toman los bloqueos en orden global, dos
+    movimientos con productos en común no pueden quedar en deadlock.
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return {}
+
+    await db.execute(
+        pg_insert(Stock)
+        .values([
+            {
+                "id": uuid.uuid4(),
+                "product_id": product_id,
+                "warehouse_id": warehouse_id,
+                "quantity": Decimal("0"),
+                "min_stock": Decimal("0"),
+                "max_stock": Decimal("0"),
+                "reserved": Decimal("0"),
+                "active": True,
+                "user_id": user_id,
+            }
+            for product_id, warehouse_id in keys
+        ])
+        .on_conflict_do_nothing(index_elements=[Stock.product_id, Stock.warehouse_id])
+    )
+
+    stmt_lock = (
+        select(Stock)
+        .where(tuple_(Stock.product_id, Stock.warehouse_id).in_(keys))
+        .order_by(Stock.product_id, Stock.warehouse_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)  # saldo vigente tras obtener el bloqueo
+    )
+    return {(s.product_id, s.warehouse_id): s for s in (await db.execute(stmt_lock)).scalars()}
+
+
+async def _audit_stock_changes(db: AsyncSession, descriptions: Mapping[StockKey, str], stocks: Mapping[StockKey, Stock], *, user_id, reason: str) -> None:
+    """Un log por par ajustado, según el nivel configurado (sin flush; clase "stock" de auditoría)."""
+    if not user_id or not descriptions:
+        return
+    audit_level = await get_audit_level(db)
+    if audit_level < 1:
+        return
+    suffix = f" - {reason}" if reason else ""
+    await log_actions(db, [
+        {
+            "action": "STOCK_ADJUST",
+            "entity": "Stock",
+            "entity_id": stocks[key].id,
+            "description": desc + suffix,
+            "user_id": user_id,
+        }
+        for key, desc in descriptions.items()
+    ])
+
+
+# =============================================================================
+# AJUSTE INCREMENTAL (ruta normal)
+# =============================================================================
+async def adjust_stock_quantities(
+    db: AsyncSession,
+    *,
+    deltas: Mapping[tuple, Decimal],   # {(product_id, warehouse_id): delta CON SIGNO}
+    user_id=None,
+    reason: str = "",
+    unit_costs: Optional[Mapping[tuple, Decimal]] = None,  # costo unitario del delta (valorización)
+    released: Optional[Mapping[tuple, Decimal]] = None,    # apartados confirmados por este movimiento
+) -> dict[StockKey, Stock]:
+    """
+    Versión por lote de `adjust_stock_quantity`: aplica varios deltas con
+    signo en un número constante de viajes a la base de datos:
+      1) un INSERT ... ON CONFLICT (altas en 0) y un SELECT ... FOR UPDATE
+         ordenado con todos los pares,
+      2) una consulta del nivel de auditoría,
+      3) un único flush (updates y logs).
+
+    Además actualiza el costo promedio ponderado y el valor del inventario de
+    cada par (ver `apply_valuation`), usando `unit_costs` cuando se indique.
+
+    Apartados: una salida sólo puede consumir lo disponible
+    (`quantity - reserved`) más lo que liberan sus propios apartados
+    (`released`, ya confirmados por el caller en esta transacción); esa
+    cantidad se descuenta de `reserved` bajo el mismo bloqueo.
+
+    Si algún par quedara negativo o por debajo de lo apartado levanta
+    ValueError listando todos los pares afectados. No hace commit; el caller
+    controla commit/rollback.
+    """
+    costs = {stock_key(p, w): _to_dec(c) for (p, w), c in (unit_costs or {}).items() if c is not None}
+    releases: dict[StockKey, Decimal] = {}
+    for (product_id, warehouse_id), qty in (released or {}).items():
+        key = stock_key(product_id, warehouse_id)
+        releases[key] = releases.get(key, Decimal("0")) + _to_dec(qty)
+    signed: dict[StockKey, Decimal] = {}
+    for (product_id, warehouse_id), delta in deltas.items():
+        key = stock_key(product_id, warehouse_id)
+        signed[key] = signed.get(key, Decimal("0")) + _to_dec(delta)
+    signed = {k: d for k, d in signed.items() if d or releases.get(k)}
+    if not signed:
+        return {}
+
+    stocks = await _lock_or_create_stocks(db, signed.keys(), user_id=user_id)
+
+    now = datetime.utcnow()
+    negatives: list[str] = []
+    descriptions: dict[StockKey, str] = {}
+    for key, delta in signed.items():
+        stock = stocks[key]
+        old_qty = _to_dec(stock.quantity or 0)
+        new_qty = old_qty + delta
+        reserved = _to_dec(stock.reserved or 0)
+        new_reserved = max(reserved - releases.get(key, Decimal("0")), Decimal("0"))
+        if new_qty < 0:
+            negatives.append(
+                f"product={key[0]} en warehouse={key[1]} "
+                f"({old_qty} {'+' if delta >= 0 else '-'} {abs(delta)} = {new_qty})"
+            )
+            continue
+        if delta < 0 and new_qty < new_reserved:
+            negatives.append(
+                f"product={key[0]} en warehouse={key[1]} "
+                f"(disponible={old_qty - reserved}, salida={abs(delta)}, "
+                f"apartado propio={reserved - new_reserved})"
+            )
+            continue
+        apply_valuation(stock, delta, costs.get(key))
+        stock.quantity = new_qty
+        stock.reserved = new_reserved
+        stock.updated_at = now
+        descriptions[key] = f"Stock ajustado {old_qty} → {new_qty} (delta={delta})"
+
+    if negatives:
+        raise ValueError("Stock insuficiente o apartado para " + "; ".join(negatives) + ".")
+
+    await _audit_stock_changes(db, descriptions, stocks, user_id=user_id, reason=reason)
+    await db.flush()
+    await evaluate_stock_alerts(db, stocks.values())  # alertas sólo de las filas tocadas
+    invalidate_stock_cache(db, (product_id for product_id, _ in stocks))
+    return stocks
+
+
 async def adjust_stock_quantity(
     db: AsyncSession,
     *,
     product_id,
     warehouse_id,
-    delta: Decimal,          # <-- se conserva por compatibilidad, no se usa
+    delta: Decimal,          # delta CON SIGNO: + entradas, - salidas/anulaciones
     user_id=None,
     reason: str = "",
+    unit_cost: Optional[Decimal] = None,
 ) -> Stock:
     """
-    Recalcula y establece el stock como:
-        stock = SUM(Items.quantity en Entradas activas) - SUM(Items.quantity en Salidas activas)
+    Aplica un delta con signo sobre la existencia actual:
+        stock = stock_actual + delta
 
-    - Si no existe (product_id, warehouse_id) en Stock, lo crea con cantidad inicial 0 y luego lo ajusta.
+    - Si no existe (product_id, warehouse_id) en Stock, lo crea con cantidad inicial 0.
     - Bloquea la fila de Stock con FOR UPDATE para evitar carreras.
+    - Costo constante: no recorre el histórico de entradas/salidas.
     - Si el resultado fuese negativo, levanta ValueError (misma política que antes).
     - Registra auditoría según nivel configurado.
     - No hace commit (sólo flush); el caller controla commit/rollback.
-    """
 
-    # 1) Bloqueo/obtención de la fila de stock (o crearla si no existe)
-    stmt_lock = (
-        select(Stock)
-        .where(Stock.product_id == product_id, Stock.warehouse_id == warehouse_id)
-        .with_for_update()
+    Para reconstruir el saldo desde el histórico usar `rebuild_stock_quantity`.
+    """
+    key = stock_key(product_id, warehouse_id)
+    stocks = await adjust_stock_quantities(
+        db, deltas={key: delta}, user_id=user_id, reason=reason,
+        unit_costs={key: unit_cost} if unit_cost is not None else None,
     )
-    res_stock = await db.execute(stmt_lock)
-    stock = res_stock.scalar_one_or_none()
-
-    if stock is None:
-        stock = Stock(
-            product_id=product_id,
-            warehouse_id=warehouse_id,
-            quantity=Decimal("0"),
-            active=True,
-            user_id=user_id,
-        )
-        db.add(stock)
-        await db.flush()
+    if key in stocks:
+        return stocks[key]
+    # delta = 0: no hay cambios, pero el contrato devuelve la fila (creándola si falta)
+    stocks = await _lock_or_create_stocks(db, [key], user_id=user_id)
+    return stocks[key]
+
 
-    # 2) Calcular SUM(entradas) y SUM(salidas) sobre documentos ACTIVOS
+# =============================================================================
+# RECONSTRUCCIÓN COMPLETA (ruta explícita "rebuild")
+# =============================================================================
+async def rebuild_stock_quantities(
+    db: AsyncSession,
+    *,
+    keys: Iterable[tuple],   # pares (product_id, warehouse_id)
+    user_id=None,
+    reason: str = "",
+    inflows: Optional[Mapping[tuple, Decimal]] = None,     # entradas del mismo lote (ya incluidas en el histórico)
+    unit_costs: Optional[Mapping[tuple, Decimal]] = None,  # costo unitario de esas entradas
+) -> dict[StockKey, Stock]:
+    """
+    Recalcula y establece, para cada par, el stock como:
+        stock = saldo del último cierre
+              + SUM(Items.quantity en Entradas activas posteriores al cierre)
+              - SUM(Items.quantity en Salidas activas posteriores al cierre)
+
+    Es la ruta de reparación, usada en importaciones masivas y reconciliaciones.
+    Gracias a los cierres de periodo (`stock_snapshots`) sólo recorre los
+    movimientos recientes. Para N pares emplea un bloqueo, la lectura del
+    cierre, un único `GROUP BY` de entradas/salidas y un flush.
+
+    Valorización: si el caller acaba de insertar entradas (importación), las
+    indica en `inflows` con su costo en `unit_costs` y entran al promedio
+    ponderado (`apply_valuation`); el resto de la diferencia (salidas y
+    correcciones) se valoriza al promedio vigente.
+    """
+    keys = list(dict.fromkeys(stock_key(p, w) for p, w in keys))
+    inbound = {stock_key(p, w): _to_dec(q) for (p, w), q in (inflows or {}).items() if q}
+    costs = {stock_key(p, w): _to_dec(c) for (p, w), c in (unit_costs or {}).items() if c is not None}
+    if not keys:
+        return {}
+
+    stocks = await _lock_or_create_stocks(db, keys, user_id=user_id)
+
+    # Punto de partida: último cierre de periodo (si existe)
+    last_end = await get_last_period_end(db)
+    opening = await get_snapshot_quantities(db, last_end, keys) if last_end else {}
+
+    # Entradas y salidas por par sobre documentos ACTIVOS posteriores al cierre
     #    Document.document_type: 'E' (Entrada), 'S' (Salida)
-    sum_in_stmt = (
-        select(func.coalesce(func.sum(EntryItem.quantity), 0))
-        .select_from(EntryItem)
-        .join(Entry, EntryItem.entry_id == Entry.id)
-        .join(Document, Entry.document_id == Document.id)
-        .where(
-            EntryItem.product_id == product_id,
-            Entry.warehouse_id == warehouse_id,
-            Entry.active.is_(True),
-            Document.document_type == "E",
+    totals_stmt = (
+        select(
+            EntryItem.product_id,
+            Entry.warehouse_id,
+            func.coalesce(func.sum(case((Document.document_type == "E", EntryItem.quantity), else_=0)), 0),
+            func.coalesce(func.sum(case((Document.document_type == "S", EntryItem.quantity), else_=0)), 0),
         )
-    )
-    sum_out_stmt = (
-        select(func.coalesce(func.sum(EntryItem.quantity), 0))
         .select_from(EntryItem)
         .join(Entry, EntryItem.entry_id == Entry.id)
         .join(Document, Entry.document_id == Document.id)
         .where(
-            EntryItem.product_id == product_id,
-            Entry.warehouse_id == warehouse_id,
+            tuple_(EntryItem.product_id, Entry.warehouse_id).in_(keys),
             Entry.active.is_(True),
-            Document.document_type == "S",
         )
+        .group_by(EntryItem.product_id, Entry.warehouse_id)
     )
+    if last_end is not None:
+        totals_stmt = totals_stmt.where(Entry.created_at > last_end)
+    totals = {
+        (product_id, warehouse_id): (_to_dec(total_in), _to_dec(total_out))
+        for product_id, warehouse_id, total_in, total_out in (await db.execute(totals_stmt)).all()
+    }
 
-    res_in = await db.execute(sum_in_stmt)
-    res_out = await db.execute(sum_out_stmt)
-
-    # Asegurar Decimal exacto
-    def _to_dec(v) -> Decimal:
-        if isinstance(v, Decimal):
-            return v
-        return Decimal(str(v or "0"))
-
-    total_in = _to_dec(res_in.scalar_one())
-    total_out = _to_dec(res_out.scalar_one())
-
-    # 3) Nuevo stock = entradas - salidas (política: no permitir negativo)
-    old_qty = _to_dec(stock.quantity or 0)
-    new_qty = total_in - total_out
-    if new_qty < 0:
-        raise ValueError(
-            f"Stock resultante negativo para product={product_id} en warehouse={warehouse_id} "
-            f"(Entradas={total_in} - Salidas={total_out} = {new_qty})."
-        )
-
-    stock.quantity = new_qty
-    stock.updated_at = datetime.utcnow()
-
-    # 4) Auditoría (mantiene misma acción/estilo que la versión anterior)
-    audit_level = await get_audit_level(db)
-    if audit_level >= 1 and user_id:
-        desc = (
+    now = datetime.utcnow()
+    negatives: list[str] = []
+    descriptions: dict[StockKey, str] = {}
+    for key in keys:
+        stock = stocks[key]
+        total_in, total_out = totals.get(key, (Decimal("0"), Decimal("0")))
+        base = opening.get(key, Decimal("0"))
+        old_qty = _to_dec(stock.quantity or 0)
+        new_qty = base + total_in - total_out
+        # Política: no permitir negativo
+        if new_qty < 0:
+            negatives.append(
+                f"product={key[0]} en warehouse={key[1]} "
+                f"(Cierre={base} + Entradas={total_in} - Salidas={total_out} = {new_qty})"
+            )
+            continue
+        inflow = inbound.get(key)
+        if inflow:
+            # Valorización: las entradas del lote ingresan a su costo; el resto sale/entra al promedio
+            apply_valuation(stock, inflow, costs.get(key))
+            stock.quantity = old_qty + inflow
+            apply_valuation(stock, new_qty - old_qty - inflow)
+        else:
+            # Valorización: la cantidad reconstruida conserva el costo promedio vigente
+            stock.total_value = (new_qty * _to_dec(stock.avg_cost or 0)).quantize(_VALUE_Q)
+        stock.quantity = new_qty
+        stock.updated_at = now
+        descriptions[key] = (
             f"Stock recalculado {old_qty} → {new_qty} "
-            f"(Entradas={total_in} - Salidas={total_out})"
-        )
-        if reason:
-            desc += f" - {reason}"
-
-        await log_action(
-            db,
-            action="STOCK_ADJUST",
-            entity="Stock",
-            entity_id=stock.id,
-            description=desc,
-            user_id=user_id,
+            f"(Cierre={base} + Entradas={total_in} - Salidas={total_out})"
         )
 
-    # 5) Persistir en la transacción (sin commit)
+    if negatives:
+        raise ValueError("Stock resultante negativo para " + "; ".join(negatives) + ".")
+
+    await _audit_stock_changes(db, descriptions, stocks, user_id=user_id, reason=reason)
     await db.flush()
+    await evaluate_stock_alerts(db, stocks.values())  # alertas sólo de las filas tocadas
+    invalidate_stock_cache(db, (product_id for product_id, _ in stocks))
+    return stocks
 
-    return stock
+
+async def rebuild_stock_quantity(
+    db: AsyncSession,
+    *,
+    product_id,
+    warehouse_id,
+    user_id=None,
+    reason: str = "",
+) -> Stock:
+    """Reconstrucción completa de un único par; ver `rebuild_stock_quantities`."""
+    key = stock_key(product_id, warehouse_id)
+    stocks = await rebuild_stock_quantities(db, keys=[key], user_id=user_id, reason=reason)
+    return stocks[key]
@@ -0,0 +1,184 @@
+# =============================================================================
+# ALERTAS DE STOCK (mínimo / máximo)
+# =============================================================================
+# - Se evalúan sólo las filas de `stocks` tocadas por cada movimiento, dentro
+#   de la misma transacción: nada de barridos periódicos sobre toda la tabla.
+# - Costo por movimiento: un SELECT de alertas abiertas de los pares tocados
+#   (índice único parcial) y, sólo si el estado cambia, un UPDATE y/o INSERT.
+# - Tras el commit se despierta a los streams abiertos en este worker; los
+#   demás workers lo detectan en su siguiente sondeo por `change_seq`.
+# =============================================================================
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from decimal import Decimal
+from typing import AsyncIterator, Iterable, Optional
+
+from sqlalchemy import select, update, func, tuple_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.after_commit import on_commit
+from app.models.stock import Stock
+from app.models.stock_alert import StockAlert, stock_alert_change_seq
+
+ALERT_LOW = "LOW"     # quantity <= min_stock
+ALERT_OVER = "OVER"   # quantity >  max_stock
+ALERT_OPEN = "OPEN"
+ALERT_RESOLVED = "RESOLVED"
+
+
+class _AlertNotifier:
+    """Difusión en proceso: cada `notify` despierta a todos los que esperan."""
+
+    def __init__(self) -> None:
+        self._event: Optional[asyncio.Event] = None
+
+    def _current(self) -> asyncio.Event:
+        if self._event is None:
+            self._event = asyncio.Event()
+        return self._event
+
+    def notify(self) -> None:
+        event, self._event = self._event, None
+        if event is not None:
+            event.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """True si hubo aviso; False si venció el `timeout`."""
+        try:
+            await asyncio.wait_for(self._current().wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+alert_notifier = _AlertNotifier()
+
+
+def _dec(v) -> Decimal:
+    return v if isinstance(v, Decimal) else Decimal(str(v or "0"))
+
+
+def desired_alerts(stock: Stock) -> dict[str, Decimal]:
+    """Alertas que deberían estar abiertas para la fila: {tipo: umbral}."""
+    if not stock.active:
+        return {}
+    qty, min_stock, max_stock = _dec(stock.quantity), _dec(stock.min_stock), _dec(stock.max_stock)
+    out: dict[str, Decimal] = {}
+    if min_stock > 0 and qty <= min_stock:
+        out[ALERT_LOW] = min_stock
+    if max_stock > 0 and qty > max_stock:
+        out[ALERT_OVER] = max_stock
+    return out
+
+
+async def evaluate_stock_alerts(db: AsyncSession, stocks: Iterable[Stock]) -> None:
+    """
+    Abre o resuelve alertas de las filas indicadas según sus umbrales.
+    No hace commit ni flush explícito (usa la transacción del caller).
+    """
+    stocks = {(s.product_id, s.warehouse_id): s for s in stocks}
+    if not stocks:
+        return
+
+    open_rows = await db.execute(
+        select(StockAlert.id, StockAlert.product_id, StockAlert.warehouse_id, StockAlert.alert_type).where(
+            tuple_(StockAlert.product_id, StockAlert.warehouse_id).in_(list(stocks)),
+            StockAlert.status == ALERT_OPEN,
+        )
+    )
+    current: dict[tuple, uuid.UUID] = {(p, w, t): i for i, p, w, t in open_rows.all()}
+
+    to_open: list[dict] = []
+    wanted: set[tuple] = set()
+    for (product_id, warehouse_id), stock in stocks.items():
+        for alert_type, threshold in desired_alerts(stock).items():
+            wanted.add((product_id, warehouse_id, alert_type))
+            if (product_id, warehouse_id, alert_type) not in current:
+                to_open.append({
+                    "product_id": product_id,
+                    "warehouse_id": warehouse_id,
+                    "alert_type": alert_type,
+                    "status": ALERT_OPEN,
+                    "quantity": _dec(stock.quantity),
+                    "threshold": threshold,
+                })
+    to_resolve = [alert_id for key, alert_id in current.items() if key not in wanted]
+    if not to_resolve and not to_open:
+        return
+
+    # Serializa los cambios de alertas hasta el commit: así `change_seq` se
+    # asigna en orden de commit y el stream no salta cambios aún no visibles.
+    # Es raro (sólo al cruzar un umbral) y se toma después de los bloqueos de stock.
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('stock_alerts'))"))
+
+    if to_resolve:
+        await db.execute(
+            update(StockAlert)
+            .where(StockAlert.id.in_(to_resolve), StockAlert.status == ALERT_OPEN)
+            .values(status=ALERT_RESOLVED, resolved_at=func.now(), change_seq=stock_alert_change_seq.next_value())
+            .execution_options(synchronize_session=False)
+        )
+    if to_open:
+        await db.execute(
+            pg_insert(StockAlert)
+            .values(to_open)
+            .on_conflict_do_nothing(
+                index_elements=[StockAlert.product_id, StockAlert.warehouse_id, StockAlert.alert_type],
+                index_where=text("status = 'OPEN'"),
+            )
+        )
+    on_commit(db, "stock_alerts", alert_notifier.notify)
+
+
+# =============================================================================
+# STREAM DE CAMBIOS (Server-Sent Events)
+# =============================================================================
+def _alert_payload(a: StockAlert) -> dict:
+    return {
+        "id": str(a.id),
+        "product_id": str(a.product_id),
+        "warehouse_id": str(a.warehouse_id),
+        "alert_type": a.alert_type,
+        "status": a.status,
+        "quantity": str(a.quantity),
+        "threshold": str(a.threshold),
+        "change_seq": a.change_seq,
+        "opened_at": a.opened_at.isoformat() if a.opened_at else None,
+        "resolved_at": a.resolved_at.isoformat() if a.resolved_at else None,
+    }
+
+
+async def stream_alert_changes(
+    session_factory,
+    *,
+    since: Optional[int] = None,
+    warehouse_id=None,
+    batch_size: int = 500,
+    heartbeat_seconds: float = 15.0,
+) -> AsyncIterator[str]:
+    """
+    Genera eventos SSE con cada apertura/resolución posterior a `since`
+    (`change_seq`). Sin `since` parte del estado actual (sólo cambios nuevos).
+    Cada sondeo usa una sesión corta: el stream no retiene conexiones del pool.
+    """
+    if since is None:
+        async with session_factory() as db:
+            since = (await db.execute(select(func.coalesce(func.max(StockAlert.change_seq), 0)))).scalar_one()
+
+    while True:
+        async with session_factory() as db:
+            stmt = select(StockAlert).where(StockAlert.change_seq > since)
+            if warehouse_id is not None:
+                stmt = stmt.where(StockAlert.warehouse_id == warehouse_id)
+            alerts = (await db.execute(stmt.order_by(StockAlert.change_seq).limit(batch_size))).scalars().all()
+
+        for a in alerts:
+            since = a.change_seq
+            yield f"id: {a.change_seq}\nevent: stock_alert\ndata: {json.dumps(_alert_payload(a))}\n\n"
+
+        if len(alerts) < batch_size and not await alert_notifier.wait(heartbeat_seconds):
+            yield ": keep-alive\n\n"  # mantiene viva la conexión (proxies) y detecta clientes caídos
@@ -0,0 +1,242 @@
+# =============================================================================
+# CACHÉ EN PROCESO DE DISPONIBILIDAD (consultas POS por línea escaneada)
+# =============================================================================
+# - Una entrada por producto con todas sus bodegas {warehouse_id: (quantity,
+#   reserved)} y el total entre bodegas: la consulta por par y la consulta
+#   "en todas las bodegas" se resuelven con la misma entrada y una sola
+#   lectura (índice único product_id, warehouse_id) en caso de fallo.
+# - Invalidación exacta por producto DESPUÉS del commit de cada movimiento,
+#   anulación, apartado o cambio manual de stock (`invalidate_stock_cache`);
+#   un rollback no invalida nada. En este worker vía after_commit y en los
+#   demás vía NOTIFY en STOCK_CHANNEL (payload = product_ids separados por
+#   coma), emitido en la misma transacción: sólo se entrega si confirma.
+# - Una lectura que empezó antes de una invalidación no guarda su resultado
+#   (marca de generación por producto), así no se re-cachea un valor viejo.
+#   Las marcas sólo se conservan mientras haya lecturas en curso que puedan
+#   necesitarlas: se descartan las anteriores a la lectura más antigua.
+# - El TTL es sólo la red de seguridad: sin listener (PG_LISTENER_ENABLED) o
+#   ante cambios hechos fuera de la aplicación.
+# =============================================================================
+from __future__ import annotations
+
+import time
+import uuid
+from collections import Counter, OrderedDict
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.after_commit import on_commit
+from app.models.stock import Stock
+
+STOCK_CHANNEL = "stock_changed"
+_PENDING_KEY = "stock_cache_pending"
+_NOTIFIED_KEY = "stock_cache_notified"
+_NOTIFY_CHUNK = 200  # ids por aviso: el payload de NOTIFY admite < 8000 bytes
+
+
+def _to_dec(v) -> Decimal:
+    return v if isinstance(v, Decimal) else Decimal(str(v or "0"))
+
+
+def _to_uuid(v) -> uuid.UUID:
+    return v if isinstance(v, uuid.UUID) else uuid.UUID(str(v))
+
+
+class _ProductEntry:
+    __slots__ = ("expires_at", "warehouses", "quantity", "reserved")
+
+    def __init__(self, expires_at: float, warehouses: dict) -> None:
+        self.expires_at = expires_at
+        self.warehouses = warehouses  # {warehouse_id: (quantity, reserved)}
+        self.quantity = sum((q for q, _ in warehouses.values()), Decimal("0"))
+        self.reserved = sum((r for _, r in warehouses.values()), Decimal("0"))
+
+
+class StockCache:
+    """Caché read-through por producto, LRU acotado, con métricas de aciertos."""
+
+    def __init__(self, *, ttl_seconds: float, max_products: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_products = max_products
+        self._entries: "OrderedDict[uuid.UUID, _ProductEntry]" = OrderedDict()
+        self._generation = 0
+        self._invalidated_at: dict[uuid.UUID, int] = {}
+        self._cleared_at = 0  # generación del último vaciado total (afecta a toda lectura en curso)
+        self._reads: Counter = Counter()  # lecturas en curso por generación de inicio
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _get(self, product_id: uuid.UUID) -> Optional[_ProductEntry]:
+        entry = self._entries.get(product_id)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[product_id]
+            return None
+        self._entries.move_to_end(product_id)
+        return entry
+
+    def _put(self, product_id: uuid.UUID, warehouses: dict, generation: int) -> _ProductEntry:
+        entry = _ProductEntry(time.monotonic() + self.ttl_seconds, warehouses)
+        # Si hubo una invalidación mientras se leía, el resultado puede ser viejo: no se guarda.
+        if max(self._invalidated_at.get(product_id, 0), self._cleared_at) > generation:
+            return entry
+        self._entries[product_id] = entry
+        self._entries.move_to_end(product_id)
+        while len(self._entries) > self.max_products:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    async def get_product(self, db: AsyncSession, product_id) -> _ProductEntry:
+        """
+        Disponibilidad del producto en todas sus bodegas. Usar con sesiones sin
+        cambios pendientes: lo leído en un fallo queda cacheado para todos.
+        """
+        product_id = _to_uuid(product_id)
+        entry = self._get(product_id) if settings.STOCK_CACHE_ENABLED else None
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        generation = self._generation
+        self._reads[generation] += 1
+        try:
+            rows = await db.execute(
+                select(Stock.warehouse_id, Stock.quantity, Stock.reserved).where(
+                    Stock.product_id == product_id,
+                    Stock.active.is_(True),
+                )
+            )
+            warehouses = {w: (_to_dec(q), _to_dec(r)) for w, q, r in rows.all()}
+            if not settings.STOCK_CACHE_ENABLED:
+                return _ProductEntry(0.0, warehouses)
+            return self._put(product_id, warehouses, generation)
+        finally:
+            self._end_read(generation)
+
+    def _end_read(self, generation: int) -> None:
+        """Descarta las marcas de invalidación que ya ninguna lectura en curso puede necesitar."""
+        self._reads[generation] -= 1
+        if self._reads[generation] <= 0:
+            del self._reads[generation]
+        if not self._reads:
+            self._invalidated_at.clear()
+        elif len(self._invalidated_at) > self.max_products:
+            # Carga sostenida sin momentos libres: poda por la lectura más antigua
+            oldest = min(self._reads)
+            self._invalidated_at = {p: g for p, g in self._invalidated_at.items() if g > oldest}
+
+    def invalidate(self, product_ids: Iterable) -> None:
+        self._generation += 1
+        for product_id in product_ids:
+            if self._reads:  # sin lecturas en curso no hace falta recordar la invalidación
+                self._invalidated_at[product_id] = self._generation
+            if self._entries.pop(product_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self.invalidate(list(self._entries))
+        self._cleared_at = self._generation
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.STOCK_CACHE_ENABLED,
+            "size": len(self._entries),
+            "max_products": self.max_products,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+
+stock_cache = StockCache(
+    ttl_seconds=settings.STOCK_CACHE_TTL_SECONDS,
+    max_products=settings.STOCK_CACHE_MAX_PRODUCTS,
+)
+
+
+def invalidate_stock_cache(db: AsyncSession | Session, product_ids: Iterable) -> None:
+    """
+    Marca productos para invalidar cuando la transacción de `db` se confirme.
+    No hace flush ni commit; llamarlo en cada operación que cambie
+    `stocks.quantity`, `stocks.reserved` o `stocks.active`.
+    """
+    session = db.sync_session if isinstance(db, AsyncSession) else db
+    pending: set = session.info.setdefault(_PENDING_KEY, set())
+    pending.update(_to_uuid(p) for p in product_ids)
+
+    def _after_commit() -> None:
+        session.info.pop(_NOTIFIED_KEY, None)
+        stock_cache.invalidate(session.info.pop(_PENDING_KEY, ()))
+
+    on_commit(db, "stock_cache", _after_commit)
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_stock_changes(session: Session) -> None:
+    """Avisa a los demás workers dentro de la transacción (un rollback descarta el aviso)."""
+    if not settings.PG_LISTENER_ENABLED:
+        return
+    pending = session.info.get(_PENDING_KEY)
+    if not pending:
+        return
+    notified: set = session.info.setdefault(_NOTIFIED_KEY, set())
+    new = sorted(str(p) for p in pending - notified)
+    if not new:
+        return
+    conn = session.connection()
+    for i in range(0, len(new), _NOTIFY_CHUNK):
+        conn.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": STOCK_CHANNEL, "payload": ",".join(new[i:i + _NOTIFY_CHUNK])},
+        )
+    notified.update(pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_stock_changes(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+        session.info.pop(_NOTIFIED_KEY, None)
+
+
+def on_stock_notification(payload: Optional[str]) -> None:
+    """Handler de STOCK_CHANNEL (payload = product_ids; None al (re)conectar = invalidar todo)."""
+    if payload is None:
+        stock_cache.clear()
+        return
+    stock_cache.invalidate(_to_uuid(p) for p in payload.split(",") if p)
+
+
+async def get_availability(db: AsyncSession, *, product_id, warehouse_id=None) -> dict:
+    """Disponible (quantity - reserved) por bodega y total del producto, desde la caché."""
+    entry = await stock_cache.get_product(db, product_id)
+    if warehouse_id is None:
+        pairs, quantity, reserved = entry.warehouses, entry.quantity, entry.reserved
+    else:
+        warehouse_id = _to_uuid(warehouse_id)
+        quantity, reserved = entry.warehouses.get(warehouse_id, (Decimal("0"), Decimal("0")))
+        pairs = {warehouse_id: (quantity, reserved)}
+    return {
+        "product_id": _to_uuid(product_id),
+        "quantity": quantity,
+        "reserved": reserved,
+        "available": quantity - reserved,
+        "warehouses": [
+            {"warehouse_id": w, "quantity": q, "reserved": r, "available": q - r}
+            for w, (q, r) in sorted(pairs.items(), key=lambda kv: str(kv[0]))
+        ],
+    }
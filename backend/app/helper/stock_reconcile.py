@@ -0,0 +1,225 @@
+# =============================================================================
+# CONCILIACIÓN DE STOCK (stocks.quantity vs. entradas - salidas)
+# =============================================================================
+# - El saldo esperado de cada par es el del último cierre de periodo más los
+#   movimientos activos posteriores (misma regla que `rebuild_stock_quantities`).
+# - Se calcula con UNA sentencia por bodega (conjuntos, sin bucles por par) y
+#   las bodegas se procesan en paralelo, cada una en su propia conexión.
+# - El reporte se emite en streaming a medida que cada bodega termina.
+# - Con `fix=True` los pares descuadrados se corrigen por lotes con
+#   `rebuild_stock_quantities`, que vuelve a calcular bajo FOR UPDATE: si un
+#   movimiento concurrente cambió el par entre la lectura y la corrección, el
+#   valor final sigue siendo el correcto. Cada par corregido deja un
+#   movimiento RECONCILE en el kardex por la diferencia, en la misma
+#   transacción del lote, para que el saldo corrido no quede cortado.
+# =============================================================================
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from decimal import Decimal
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import select, text
+
+from app.models.warehouse import Warehouse
+from app.helper.stock import rebuild_stock_quantities, _lock_or_create_stocks, _to_dec
+from app.helper.kardex import kardex_movement, record_kardex_movements
+from app.helper.stock_snapshot import get_last_period_end
+
+logger = logging.getLogger(__name__)
+
+# Descuadres de una bodega: FULL JOIN entre `stocks` y el saldo esperado.
+# `stock_id` NULL = falta la fila de stock; `expected` 0 sin movimientos.
+_DRIFT_SQL = text("""
+    WITH base AS (
+        SELECT product_id, quantity
+        FROM stock_snapshots
+        WHERE period_end = :last_end AND warehouse_id = :warehouse_id
+    ),
+    mv AS (
+        SELECT ei.product_id,
+               SUM(CASE d.document_type WHEN 'E' THEN ei.quantity
+                                        WHEN 'S' THEN -ei.quantity
+                                        ELSE 0 END) AS qty
+        FROM entry_items ei
+        JOIN entries e   ON e.id = ei.entry_id
+        JOIN documents d ON d.id = e.document_id
+        WHERE e.active
+          AND e.warehouse_id = :warehouse_id
+          AND (CAST(:last_end AS timestamp) IS NULL OR e.created_at > :last_end)
+        GROUP BY ei.product_id
+    ),
+    expected AS (
+        SELECT COALESCE(base.product_id, mv.product_id) AS product_id,
+               COALESCE(base.quantity, 0) + COALESCE(mv.qty, 0) AS quantity
+        FROM base
+        FULL OUTER JOIN mv ON mv.product_id = base.product_id
+    ),
+    cur AS (
+        SELECT id, product_id, quantity
+        FROM stocks
+        WHERE warehouse_id = :warehouse_id
+    )
+    SELECT COALESCE(c.product_id, x.product_id) AS product_id,
+           c.id                                 AS stock_id,
+           COALESCE(c.quantity, 0)              AS actual,
+           COALESCE(x.quantity, 0)              AS expected
+    FROM cur c
+    FULL OUTER JOIN expected x ON x.product_id = c.product_id
+    WHERE COALESCE(c.quantity, 0) <> COALESCE(x.quantity, 0)
+    ORDER BY 1
+""")
+
+
+async def _fix_pairs(session_factory, warehouse_id, product_ids: list, *, batch_size: int, user_id) -> tuple[int, list[str]]:
+    """Corrige por lotes (una transacción corta por lote). Devuelve (corregidos, errores)."""
+    fixed, errors = 0, []
+    for i in range(0, len(product_ids), batch_size):
+        keys = [(p, warehouse_id) for p in product_ids[i:i + batch_size]]
+        async with session_factory() as db:
+            try:
+                # Saldo previo bajo el mismo bloqueo que toma el rebuild (idempotente en la transacción)
+                locked = await _lock_or_create_stocks(db, keys, user_id=user_id)
+                before = {k: _to_dec(stock.quantity) for k, stock in locked.items()}
+                stocks = await rebuild_stock_quantities(db, keys=keys, user_id=user_id, reason="RECONCILE_FIX")
+                movements = [
+                    kardex_movement(
+                        product_id=product_id,
+                        warehouse_id=wh_id,
+                        quantity=_to_dec(stock.quantity) - before.get((product_id, wh_id), Decimal("0")),
+                        movement_type="RECONCILE",
+                        unit_cost=_to_dec(stock.avg_cost),
+                        user_id=user_id,
+                    )
+                    for (product_id, wh_id), stock in stocks.items()
+                ]
+                await record_kardex_movements(db, movements, {k: stock.quantity for k, stock in stocks.items()})
+                await db.commit()
+                fixed += len(keys)
+            except Exception as e:
+                await db.rollback()
+                errors.append(f"warehouse={warehouse_id} lote {i // batch_size + 1}: {e}")
+    return fixed, errors
+
+
+async def _reconcile_warehouse(
+    session_factory,
+    warehouse_id,
+    last_end,
+    out: asyncio.Queue,
+    *,
+    fix: bool,
+    batch_size: int,
+    user_id,
+) -> None:
+    t0 = time.perf_counter()
+    async with session_factory() as db:
+        rows = (await db.execute(_DRIFT_SQL, {"warehouse_id": warehouse_id, "last_end": last_end})).all()
+
+    fixable: list = []
+    for product_id, stock_id, actual, expected in rows:
+        actual, expected = Decimal(str(actual)), Decimal(str(expected))
+        await out.put({
+            "type": "drift",
+            "warehouse_id": str(warehouse_id),
+            "product_id": str(product_id),
+            "stock_id": str(stock_id) if stock_id else None,
+            "actual": str(actual),
+            "expected": str(expected),
+            "difference": str(actual - expected),
+        })
+        if expected >= 0:  # un esperado negativo requiere revisión manual de los movimientos
+            fixable.append(product_id)
+
+    result = {
+        "type": "warehouse",
+        "warehouse_id": str(warehouse_id),
+        "drifted": len(rows),
+        "fixed": 0,
+        "errors": [],
+    }
+    if fix and fixable:
+        result["fixed"], result["errors"] = await _fix_pairs(
+            session_factory, warehouse_id, fixable, batch_size=batch_size, user_id=user_id
+        )
+    result["seconds"] = round(time.perf_counter() - t0, 3)
+    await out.put(result)
+
+
+async def reconcile_stock(
+    session_factory,
+    *,
+    warehouse_ids: Optional[list] = None,
+    concurrency: int = 4,
+    fix: bool = False,
+    batch_size: int = 500,
+    user_id=None,
+) -> AsyncIterator[dict]:
+    """
+    Concilia todas las bodegas (o las indicadas) con `concurrency` conexiones
+    en paralelo y emite el reporte en streaming:
+      - {"type": "drift", ...}     un registro por par descuadrado,
+      - {"type": "warehouse", ...} resumen (y corrección) por bodega,
+      - {"type": "summary", ...}   totales al final.
+    """
+    if fix and not user_id:
+        raise ValueError("La corrección requiere user_id (autor de los ajustes de stock).")
+
+    async with session_factory() as db:
+        last_end = await get_last_period_end(db)
+        if warehouse_ids is None:
+            warehouse_ids = list((await db.execute(select(Warehouse.id).order_by(Warehouse.id))).scalars())
+
+    out: asyncio.Queue = asyncio.Queue(maxsize=10_000)  # contrapresión si el consumidor es lento
+    sem = asyncio.Semaphore(max(1, concurrency))
+    t0 = time.perf_counter()
+
+    async def _run(warehouse_id) -> None:
+        async with sem:
+            try:
+                await _reconcile_warehouse(
+                    session_factory, warehouse_id, last_end, out,
+                    fix=fix, batch_size=batch_size, user_id=user_id,
+                )
+            except Exception as e:
+                logger.exception("Error conciliando bodega %s", warehouse_id)
+                await out.put({"type": "warehouse", "warehouse_id": str(warehouse_id), "error": str(e)})
+
+    tasks = [asyncio.create_task(_run(w)) for w in warehouse_ids]
+    done = asyncio.ensure_future(asyncio.gather(*tasks))
+
+    drifted = fixed = failed = 0
+    try:
+        while True:
+            if done.done():
+                if out.empty():
+                    break
+                item = out.get_nowait()
+            else:
+                getter = asyncio.create_task(out.get())
+                finished, _ = await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in finished:
+                    getter.cancel()
+                    continue
+                item = getter.result()
+            if item["type"] == "warehouse":
+                drifted += item.get("drifted", 0)
+                fixed += item.get("fixed", 0)
+                failed += len(item.get("errors", [])) + (1 if "error" in item else 0)
+            yield item
+    finally:
+        for t in tasks:
+            t.cancel()
+
+    yield {
+        "type": "summary",
+        "warehouses": len(warehouse_ids),
+        "drifted": drifted,
+        "fixed": fixed,
+        "errors": failed,
+        "fix": fix,
+        "last_period_end": last_end.isoformat() if last_end else None,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
@@ -0,0 +1,231 @@
+# =============================================================================
+# APARTADOS DE STOCK (reservas con TTL para carritos POS / compras pendientes)
+# =============================================================================
+# - `stocks.reserved` es el total de apartados ACTIVOS del par; cada operación
+#   lo ajusta con un único UPDATE condicional (O(1), sin recorrer apartados).
+# - Reservar sólo procede si `quantity - reserved >= cantidad`: la condición y
+#   el incremento van en la misma sentencia, así dos terminales no pueden
+#   apartar la misma unidad.
+# - Un apartado sale de ACTIVE una sola vez (liberado, confirmado o vencido);
+#   la transición es un UPDATE ... WHERE status = 'ACTIVE' RETURNING, por lo
+#   que liberar dos veces no descuenta dos veces.
+# - Confirmar un apartado sólo ocurre al crear su salida de inventario
+#   (`create_entry` con `reservation_ids`): en la misma transacción se marca
+#   COMMITTED y `adjust_stock_quantities` descuenta `quantity` y `reserved`
+#   juntos bajo el bloqueo de la fila. Una salida sin apartado no puede
+#   consumir lo apartado por otros.
+# - El barrido de vencidos procesa lotes con FOR UPDATE SKIP LOCKED, de modo
+#   que varios workers pueden correrlo a la vez sin pisarse.
+# =============================================================================
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.stock_reservation import StockReservation
+from app.helper.stock import stock_key, _to_dec
+from app.helper.stock_cache import invalidate_stock_cache
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_ACTIVE = "ACTIVE"
+RESERVATION_COMMITTED = "COMMITTED"
+RESERVATION_RELEASED = "RELEASED"
+RESERVATION_EXPIRED = "EXPIRED"
+
+
+_RESERVE_SQL = text("""
+    UPDATE stocks
+    SET reserved = reserved + :qty, updated_at = now()
+    WHERE product_id = :product_id
+      AND warehouse_id = :warehouse_id
+      AND active
+      AND quantity - reserved >= :qty
+    RETURNING id
+""")
+
+_UNRESERVE_SQL = text("""
+    UPDATE stocks
+    SET reserved = GREATEST(reserved - :qty, 0), updated_at = now()
+    WHERE product_id = :product_id AND warehouse_id = :warehouse_id
+""")
+
+_CLOSE_RESERVATION_SQL = text("""
+    UPDATE stock_reservations
+    SET status = :status, entry_id = COALESCE(:entry_id, entry_id), updated_at = now()
+    WHERE id = :id AND status = 'ACTIVE'
+    RETURNING product_id, warehouse_id, quantity
+""")
+
+# Vence un lote de apartados y descuenta su total agregado por par.
+# Las filas de `stocks` se bloquean en orden (product_id, warehouse_id), igual
+# que los movimientos de stock, para no introducir deadlocks.
+_EXPIRE_BATCH_SQL = text("""
+    WITH due AS (
+        SELECT id
+        FROM stock_reservations
+        WHERE status = 'ACTIVE' AND expires_at < :now
+        ORDER BY expires_at
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    expired AS (
+        UPDATE stock_reservations r
+        SET status = 'EXPIRED', updated_at = now()
+        FROM due
+        WHERE r.id = due.id
+        RETURNING r.product_id, r.warehouse_id, r.quantity
+    ),
+    agg AS (
+        SELECT product_id, warehouse_id, SUM(quantity) AS qty
+        FROM expired
+        GROUP BY product_id, warehouse_id
+    ),
+    locked AS (
+        SELECT s.id, agg.qty
+        FROM stocks s
+        JOIN agg ON agg.product_id = s.product_id AND agg.warehouse_id = s.warehouse_id
+        ORDER BY s.product_id, s.warehouse_id
+        FOR UPDATE OF s
+    ),
+    upd AS (
+        UPDATE stocks s
+        SET reserved = GREATEST(s.reserved - locked.qty, 0), updated_at = now()
+        FROM locked
+        WHERE s.id = locked.id
+        RETURNING s.product_id
+    )
+    SELECT (SELECT count(*) FROM expired) AS expired, (SELECT array_agg(DISTINCT product_id) FROM upd) AS products
+""")
+
+
+async def reserve_stock(
+    db: AsyncSession,
+    *,
+    lines: Iterable[tuple],                 # (product_id, warehouse_id, quantity)
+    ttl_seconds: Optional[int] = None,
+    reference: Optional[str] = None,
+    user_id=None,
+) -> list[StockReservation]:
+    """
+    Aparta cantidad de uno o varios pares (todo o nada).
+    Los pares se procesan en orden (product_id, warehouse_id); si alguno no
+    tiene disponible suficiente levanta 409 y el caller debe hacer rollback.
+    No hace commit.
+    """
+    ttl = ttl_seconds if ttl_seconds is not None else settings.RESERVATION_TTL_SECONDS
+    if ttl <= 0:
+        raise HTTPException(status_code=400, detail="El TTL del apartado debe ser positivo.")
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+
+    requested: dict[tuple, Decimal] = {}
+    for product_id, warehouse_id, quantity in lines:
+        qty = _to_dec(quantity)
+        if qty <= 0:
+            raise HTTPException(status_code=400, detail="La cantidad a apartar debe ser positiva.")
+        key = stock_key(product_id, warehouse_id)
+        requested[key] = requested.get(key, Decimal("0")) + qty
+    if not requested:
+        raise HTTPException(status_code=400, detail="No hay líneas para apartar.")
+
+    short: list[str] = []
+    for (product_id, warehouse_id), qty in sorted(requested.items()):
+        res = await db.execute(_RESERVE_SQL, {"product_id": product_id, "warehouse_id": warehouse_id, "qty": qty})
+        if res.first() is None:
+            short.append(f"product={product_id} en warehouse={warehouse_id} (solicitado={qty})")
+    if short:
+        raise HTTPException(status_code=409, detail="Stock disponible insuficiente para " + "; ".join(short) + ".")
+    invalidate_stock_cache(db, (product_id for product_id, _ in requested))
+
+    reservations = [
+        StockReservation(
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            quantity=qty,
+            status=RESERVATION_ACTIVE,
+            reference=reference,
+            expires_at=expires_at,
+            user_id=user_id,
+        )
+        for (product_id, warehouse_id), qty in sorted(requested.items())
+    ]
+    db.add_all(reservations)
+    await db.flush()
+    return reservations
+
+
+async def _close_reservation(db: AsyncSession, reservation_id, *, status: str, entry_id=None) -> tuple:
+    """Saca el apartado de ACTIVE; devuelve (product_id, warehouse_id, quantity). 404 si no está activo."""
+    row = (await db.execute(
+        _CLOSE_RESERVATION_SQL, {"id": reservation_id, "status": status, "entry_id": entry_id}
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Apartado {reservation_id} no encontrado o ya no está activo.")
+    return tuple(row)
+
+
+async def release_reservation(db: AsyncSession, reservation_id) -> StockReservation:
+    """Libera un apartado activo (carrito cancelado). No hace commit."""
+    product_id, warehouse_id, quantity = await _close_reservation(db, reservation_id, status=RESERVATION_RELEASED)
+    await db.execute(_UNRESERVE_SQL, {"product_id": product_id, "warehouse_id": warehouse_id, "qty": quantity})
+    invalidate_stock_cache(db, [product_id])
+    return await db.get(StockReservation, reservation_id, populate_existing=True)
+
+
+async def commit_reservations(db: AsyncSession, reservation_ids: Iterable, *, entry_id) -> dict[tuple, Decimal]:
+    """
+    Confirma los apartados que consume la salida `entry_id` y devuelve la
+    cantidad que libera cada par. NO toca `stocks.reserved`: el caller pasa
+    el resultado como `released` a `adjust_stock_quantities`, que lo descuenta
+    junto con la salida. Debe llamarse en la transacción que crea la salida.
+    No hace commit.
+    """
+    released: dict[tuple, Decimal] = {}
+    for reservation_id in dict.fromkeys(reservation_ids):
+        product_id, warehouse_id, quantity = await _close_reservation(
+            db, reservation_id, status=RESERVATION_COMMITTED, entry_id=entry_id
+        )
+        key = stock_key(product_id, warehouse_id)
+        released[key] = released.get(key, Decimal("0")) + _to_dec(quantity)
+    return released
+
+
+async def expire_reservations(db: AsyncSession, *, batch_size: int = 500) -> int:
+    """Vence un lote de apartados con TTL cumplido. Devuelve cuántos venció. No hace commit."""
+    row = (await db.execute(_EXPIRE_BATCH_SQL, {"now": datetime.utcnow(), "batch_size": batch_size})).one()
+    if row.products:
+        invalidate_stock_cache(db, row.products)
+    return int(row.expired)
+
+
+async def run_reservation_sweeper(session_factory, stop: asyncio.Event) -> None:
+    """
+    Bucle en segundo plano: vence apartados por lotes (un commit por lote)
+    hasta vaciar los pendientes y luego espera el siguiente intervalo.
+    """
+    interval = settings.RESERVATION_SWEEP_INTERVAL_SECONDS
+    batch_size = settings.RESERVATION_SWEEP_BATCH_SIZE
+    while not stop.is_set():
+        try:
+            while True:
+                async with session_factory() as db:
+                    expired = await expire_reservations(db, batch_size=batch_size)
+                    await db.commit()
+                if expired:
+                    logger.info("Apartados vencidos: %d", expired)
+                if expired < batch_size:
+                    break
+        except Exception:
+            logger.exception("Error en el barrido de apartados vencidos")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
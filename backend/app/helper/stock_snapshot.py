@@ -0,0 +1,193 @@
+# =============================================================================
+# CIERRES DE PERIODO DE STOCK (snapshots / checkpoints)
+# =============================================================================
+# - Un cierre escribe, para todos los pares (producto, bodega), el saldo a una
+#   fecha de corte en `stock_snapshots` con un único INSERT ... SELECT.
+# - El recálculo de stock parte del último cierre y sólo suma los movimientos
+#   posteriores (ver `rebuild_stock_quantities`).
+# - Los periodos cerrados son inmutables: no se aceptan movimientos ni
+#   anulaciones con fecha dentro de un periodo cerrado.
+# =============================================================================
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, func, case, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.stock_snapshot import StockSnapshot
+from app.models.entry import Entry, EntryItem
+from app.models.document import Document
+
+
+def _as_naive_utc(dt: datetime) -> datetime:
+    """`entries.created_at` y `period_end` se guardan en UTC sin zona."""
+    if dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+async def get_last_period_end(db: AsyncSession) -> Optional[datetime]:
+    """Fecha del último cierre (None si nunca se ha cerrado un periodo)."""
+    return (await db.execute(select(func.max(StockSnapshot.period_end)))).scalar_one_or_none()
+
+
+def check_period_open(occurred_at: Optional[datetime], last_period_end: Optional[datetime]) -> None:
+    """Versión sin consulta de `ensure_period_open` (para lotes con el cierre ya leído)."""
+    if occurred_at is None or last_period_end is None:
+        return
+    if _as_naive_utc(occurred_at) <= last_period_end:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El periodo está cerrado hasta {last_period_end.isoformat()}; "
+                   f"no se admiten movimientos con fecha {occurred_at.isoformat()}.",
+        )
+
+
+async def ensure_period_open(db: AsyncSession, occurred_at: Optional[datetime]) -> None:
+    """Levanta 400 si `occurred_at` cae dentro de un periodo ya cerrado."""
+    check_period_open(occurred_at, await get_last_period_end(db))
+
+
+async def get_snapshot_quantities(db: AsyncSession, period_end: datetime, keys: Iterable[tuple]) -> dict[tuple, Decimal]:
+    """Saldos del cierre `period_end` para los pares indicados."""
+    keys = list(keys)
+    if not keys:
+        return {}
+    rows = await db.execute(
+        select(StockSnapshot.product_id, StockSnapshot.warehouse_id, StockSnapshot.quantity).where(
+            StockSnapshot.period_end == period_end,
+            tuple_(StockSnapshot.product_id, StockSnapshot.warehouse_id).in_(keys),
+        )
+    )
+    return {(p, w): Decimal(str(q)) for p, w, q in rows.all()}
+
+
+# Saldo al cierre = saldo del cierre anterior + movimientos activos del periodo.
+# Los cierres son globales (todos los pares a la misma fecha), por lo que el
+# periodo de cada par empieza en el último `period_end` existente.
+_CLOSE_PERIOD_SQL = text("""
+    WITH prev AS (
+        SELECT product_id, warehouse_id, quantity
+        FROM stock_snapshots
+        WHERE period_end = :last_end
+    ),
+    mv AS (
+        SELECT ei.product_id, e.warehouse_id,
+               SUM(CASE d.document_type WHEN 'E' THEN ei.quantity
+                                        WHEN 'S' THEN -ei.quantity
+                                        ELSE 0 END) AS qty
+        FROM entry_items ei
+        JOIN entries e   ON e.id = ei.entry_id
+        JOIN documents d ON d.id = e.document_id
+        WHERE e.active
+          AND e.created_at <= :period_end
+          AND (CAST(:last_end AS timestamp) IS NULL OR e.created_at > :last_end)
+        GROUP BY ei.product_id, e.warehouse_id
+    )
+    INSERT INTO stock_snapshots (id, product_id, warehouse_id, period_end, quantity, user_id, created_at)
+    SELECT gen_random_uuid(),
+           COALESCE(prev.product_id, mv.product_id),
+           COALESCE(prev.warehouse_id, mv.warehouse_id),
+           :period_end,
+           COALESCE(prev.quantity, 0) + COALESCE(mv.qty, 0),
+           :user_id,
+           now()
+    FROM prev
+    FULL OUTER JOIN mv ON mv.product_id = prev.product_id AND mv.warehouse_id = prev.warehouse_id
+""")
+
+
+async def close_stock_period(db: AsyncSession, *, period_end: datetime, user_id=None) -> int:
+    """
+    Cierra el periodo hasta `period_end` escribiendo los snapshots en bloque.
+
+    - `period_end` debe ser posterior al último cierre y anterior a ahora.
+    - Bloquea `entries` en modo SHARE mientras calcula: espera a las
+      transacciones de entradas en curso y frena nuevas escrituras hasta el
+      commit, de modo que ningún movimiento del periodo quede fuera.
+    - No hace commit; devuelve la cantidad de snapshots escritos.
+    """
+    period_end = _as_naive_utc(period_end)
+    if period_end >= datetime.utcnow():
+        raise HTTPException(status_code=400, detail="La fecha de cierre debe estar en el pasado.")
+
+    await db.execute(text("LOCK TABLE entries IN SHARE MODE"))
+
+    last_end = await get_last_period_end(db)
+    if last_end is not None and period_end <= last_end:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Ya existe un cierre en {last_end.isoformat()}; el nuevo cierre debe ser posterior.",
+        )
+
+    res = await db.execute(_CLOSE_PERIOD_SQL, {"period_end": period_end, "last_end": last_end, "user_id": user_id})
+    return res.rowcount or 0
+
+
+async def get_stock_as_of(
+    db: AsyncSession,
+    *,
+    as_of: datetime,
+    product_id=None,
+    warehouse_id=None,
+) -> tuple[Optional[datetime], dict[tuple, Decimal]]:
+    """
+    Saldo por par (producto, bodega) a la fecha `as_of`:
+        saldo del último cierre <= as_of
+      + movimientos activos con fecha en (cierre, as_of]
+
+    Los periodos cerrados son inmutables, así que el trabajo queda acotado a
+    los movimientos de un periodo abierto (índices `ix_entries_warehouse_created`
+    / `ix_entries_created_at`) sin importar el tamaño del histórico.
+    Filtra por producto, bodega o ambos.
+    Devuelve (fecha del cierre usado o None, {(product_id, warehouse_id): cantidad}).
+    """
+    as_of = _as_naive_utc(as_of)
+
+    base_end = (await db.execute(
+        select(func.max(StockSnapshot.period_end)).where(StockSnapshot.period_end <= as_of)
+    )).scalar_one_or_none()
+
+    quantities: dict[tuple, Decimal] = {}
+    if base_end is not None:
+        snap_stmt = select(StockSnapshot.product_id, StockSnapshot.warehouse_id, StockSnapshot.quantity).where(
+            StockSnapshot.period_end == base_end
+        )
+        if product_id is not None:
+            snap_stmt = snap_stmt.where(StockSnapshot.product_id == product_id)
+        if warehouse_id is not None:
+            snap_stmt = snap_stmt.where(StockSnapshot.warehouse_id == warehouse_id)
+        for p, w, q in (await db.execute(snap_stmt)).all():
+            quantities[(p, w)] = Decimal(str(q))
+
+    # Document.document_type: 'E' (Entrada) suma, 'S' (Salida) resta
+    mv_stmt = (
+        select(
+            EntryItem.product_id,
+            Entry.warehouse_id,
+            func.sum(case(
+                (Document.document_type == "E", EntryItem.quantity),
+                (Document.document_type == "S", -EntryItem.quantity),
+                else_=0,
+            )),
+        )
+        .select_from(EntryItem)
+        .join(Entry, EntryItem.entry_id == Entry.id)
+        .join(Document, Entry.document_id == Document.id)
+        .where(Entry.active.is_(True), Entry.created_at <= as_of)
+        .group_by(EntryItem.product_id, Entry.warehouse_id)
+    )
+    if base_end is not None:
+        mv_stmt = mv_stmt.where(Entry.created_at > base_end)
+    if product_id is not None:
+        mv_stmt = mv_stmt.where(EntryItem.product_id == product_id)
+    if warehouse_id is not None:
+        mv_stmt = mv_stmt.where(Entry.warehouse_id == warehouse_id)
+    for p, w, q in (await db.execute(mv_stmt)).all():
+        quantities[(p, w)] = quantities.get((p, w), Decimal("0")) + Decimal(str(q or 0))
+
+    return base_end, quantities
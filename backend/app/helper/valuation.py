@@ -0,0 +1,113 @@
+# =============================================================================
+# VALORIZACIÓN DE INVENTARIO (costo promedio ponderado)
+# =============================================================================
+# - El costo promedio y el valor por par viven en `stocks` (avg_cost,
+#   total_value) y se actualizan en cada movimiento (`apply_valuation`).
+# - Aquí: costo unitario de entrada de los ítems (precio de la compra origen
+#   o subtotal / cantidad) y el reporte de valorización, que lee los valores
+#   mantenidos sin recorrer compras ni movimientos.
+# =============================================================================
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.purchase import PurchaseItem
+from app.models.stock import Stock
+from app.helper.stock import stock_key, _to_dec, _COST_Q
+
+
+async def get_purchase_prices(db: AsyncSession, purchase_id) -> dict:
+    """Precio unitario por producto de la compra origen ({} si no hay compra)."""
+    if not purchase_id:
+        return {}
+    rows = await db.execute(
+        select(PurchaseItem.product_id, PurchaseItem.price).where(PurchaseItem.purchase_id == purchase_id)
+    )
+    return {str(product_id): _to_dec(price) for product_id, price in rows.all()}
+
+
+def weighted_unit_costs(lines: Iterable[tuple]) -> dict:
+    """
+    Costo unitario ponderado por par a partir de líneas
+    (product_id, warehouse_id, cantidad, costo_unitario).
+    """
+    totals: dict = {}
+    for product_id, warehouse_id, quantity, unit_cost in lines:
+        qty = abs(_to_dec(quantity))
+        if not qty:
+            continue
+        key = stock_key(product_id, warehouse_id)
+        q, v = totals.get(key, (Decimal("0"), Decimal("0")))
+        totals[key] = (q + qty, v + qty * _to_dec(unit_cost))
+    return {k: (v / q).quantize(_COST_Q) for k, (q, v) in totals.items()}
+
+
+def movement_unit_costs(movements: Iterable[dict]) -> dict:
+    """Costo unitario ponderado por par de los movimientos de kardex de un documento."""
+    return weighted_unit_costs(
+        (m["product_id"], m["warehouse_id"], m["quantity"], m["unit_cost"]) for m in movements
+    )
+
+
+def cost_outflows_at_average(movements: Iterable[dict], stocks) -> None:
+    """Las salidas se valorizan al costo promedio vigente del par (no cambia al salir)."""
+    for m in movements:
+        stock = stocks.get((m["product_id"], m["warehouse_id"]))
+        if stock is not None:
+            m["unit_cost"] = _to_dec(stock.avg_cost)
+
+
+async def get_inventory_valuation(
+    db: AsyncSession,
+    *,
+    warehouse_id=None,
+    product_id=None,
+    skip: int = 0,
+    limit: int = 100,
+) -> dict:
+    """
+    Reporte de valorización: detalle por par y totales por bodega, leídos
+    directamente de `stocks` (sin re-cálculo).
+    """
+    filters = [Stock.active.is_(True)]
+    if warehouse_id is not None:
+        filters.append(Stock.warehouse_id == warehouse_id)
+    if product_id is not None:
+        filters.append(Stock.product_id == product_id)
+
+    totals = (await db.execute(
+        select(
+            Stock.warehouse_id,
+            func.count(Stock.id),
+            func.coalesce(func.sum(Stock.quantity), 0),
+            func.coalesce(func.sum(Stock.total_value), 0),
+        )
+        .where(*filters)
+        .group_by(Stock.warehouse_id)
+        .order_by(Stock.warehouse_id)
+    )).all()
+
+    rows = (await db.execute(
+        select(Stock.product_id, Stock.warehouse_id, Stock.quantity, Stock.avg_cost, Stock.total_value)
+        .where(*filters)
+        .order_by(Stock.total_value.desc(), Stock.product_id, Stock.warehouse_id)
+        .offset(skip)
+        .limit(limit)
+    )).all()
+
+    return {
+        "total": sum(int(n) for _, n, _, _ in totals),
+        "total_value": sum((_to_dec(v) for _, _, _, v in totals), Decimal("0")),
+        "warehouses": [
+            {"warehouse_id": w, "items": int(n), "quantity": _to_dec(q), "total_value": _to_dec(v)}
+            for w, n, q, v in totals
+        ],
+        "items": [
+            {"product_id": p, "warehouse_id": w, "quantity": _to_dec(q), "avg_cost": _to_dec(c), "total_value": _to_dec(v)}
+            for p, w, q, c, v in rows
+        ],
+    }
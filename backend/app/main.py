@@ -1,7 +1,9 @@
 # app/main.py
 from __future__ import annotations
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi.errors import RateLimitExceeded
@@ -13,16 +15,62 @@ from app.core.errors import install_exception_handlers
 from app.core.logging import setup_logging
 
 from app.middleware.security_headers import SecurityHeadersMiddleware
+from app.middleware.read_your_writes import ReadYourWritesMiddleware
 from app.security.rate_limiting import limiter
 from app.security.authentication import JWTAuthMiddleware
 from app.security.input_validation import BodySanitizationMiddleware  # alias InputValidationMiddleware disponible
 
+from app.db.async_session import AsyncSessionLocal, async_engine
+from app.db.instrumentation import SQLInstrumentationMiddleware, install_sql_instrumentation
+from app.db.slow_queries import install_slow_query_log
+from app.helper.stock_reservation import run_reservation_sweeper
+from app.helper.stock_cache import STOCK_CHANNEL, on_stock_notification
+from app.db.notify import run_listener
+from app.db.replica import PRIMARY_READS_CHANNEL, on_primary_reads_notification, replica_engine
+from app.utils.audit_buffer import audit_buffer
+from app.utils.audit_partitions import run_audit_partition_maintenance
+from app.utils.audit_rollup import read_audit_aggregator
+from app.utils.settings_cache import SETTINGS_CHANNEL, on_settings_notification, settings_cache
+from app.security.principal_cache import PRINCIPALS_CHANNEL, on_principals_notification
+from app.security.permissions import ROLES_CHANNEL, on_roles_notification, permission_registry
+
 # --------------------------------------------------------------------
 # Logging
 # --------------------------------------------------------------------
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# --------------------------------------------------------------------
+# Ciclo de vida (tareas en segundo plano)
+# --------------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stop = asyncio.Event()
+    tasks: list[asyncio.Task] = []
+    await settings_cache.reload(AsyncSessionLocal)  # todos los settings en una consulta
+    await permission_registry.reload(AsyncSessionLocal)  # roles compilados a bitsets
+    if settings.RESERVATION_SWEEPER_ENABLED:
+        tasks.append(asyncio.create_task(run_reservation_sweeper(AsyncSessionLocal, stop)))
+    if settings.AUDIT_BUFFER_ENABLED:
+        tasks.append(asyncio.create_task(audit_buffer.run(AsyncSessionLocal, stop)))
+    if settings.AUDIT_READ_MODE == "rollup":
+        tasks.append(asyncio.create_task(read_audit_aggregator.run(AsyncSessionLocal, stop)))
+    if settings.AUDIT_PARTITION_MAINTENANCE_ENABLED:
+        tasks.append(asyncio.create_task(run_audit_partition_maintenance(AsyncSessionLocal, stop)))
+    if settings.PG_LISTENER_ENABLED:
+        tasks.append(asyncio.create_task(run_listener({
+            SETTINGS_CHANNEL: on_settings_notification,
+            PRIMARY_READS_CHANNEL: on_primary_reads_notification,
+            PRINCIPALS_CHANNEL: on_principals_notification,
+            ROLES_CHANNEL: on_roles_notification,
+            STOCK_CHANNEL: on_stock_notification,
+        }, stop)))
+    try:
+        yield
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
 # --------------------------------------------------------------------
 # App
 # --------------------------------------------------------------------
@@ -32,6 +80,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs" if settings.APP_ENV == "development" else None,
     redoc_url=None,
+    lifespan=lifespan,
 )
 
 # --------------------------------------------------------------------
@@ -68,9 +117,23 @@ app.add_middleware(
     skip_paths={"/api/auth/token", "/api/auth/login"},
 )
 
+app.add_middleware(ReadYourWritesMiddleware)   # dentro de JWT: usa request.state.user_id
 app.add_middleware(JWTAuthMiddleware)          # auth JWT
 app.add_middleware(SlowAPIMiddleware)          # rate limiting
 
+# Conteo de SQL por petición + Server-Timing (envuelve a los middlewares anteriores)
+if settings.SQL_INSTRUMENTATION_ENABLED:
+    for engine in (async_engine, replica_engine):
+        if engine is not None:
+            install_sql_instrumentation(engine)
+    app.add_middleware(SQLInstrumentationMiddleware)
+
+# Sentencias lentas con su plan (después de la instrumentación: sus EXPLAIN no cuentan)
+if settings.SLOW_QUERY_LOG_ENABLED:
+    for engine in (async_engine, replica_engine):
+        if engine is not None:
+            install_slow_query_log(engine)
+
 # SlowAPI setup
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, lambda r, e: e.response)
@@ -85,6 +148,7 @@ from app.routers import (
     auth, user, brand, setting, category, subcategory, group, subgroup,
     unit, account, concept, document, country, division, municipality,
     product, warehouse, third_party, entry, purchase, payment_term, role,
+    kardex, stock, audit_log, system,
 )
 
 routers_config = [
@@ -110,6 +174,10 @@ routers_config = [
     (purchase.router, "/api/purchases", "Purchases"),
     (payment_term.router, "/api", "PaymentTerms"),
     (role.router, "/api", "Roles"),
+    (kardex.router, "/api/kardex", "Kardex"),
+    (stock.router, "/api/stocks", "Stocks"),
+    (audit_log.router, "/api/audit-logs", "AuditLogs"),
+    (system.router, "/api/system", "System"),
 ]
 
 for router, prefix, tags in routers_config:
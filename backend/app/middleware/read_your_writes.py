@@ -0,0 +1,42 @@
+# ===========================================================
+# read_your_writes.py
+# Tras una escritura exitosa, el usuario lee del primario un rato
+# ===========================================================
+# Marca al usuario en este worker y avisa a los demás (NOTIFY en
+# PRIMARY_READS_CHANNEL) para que `get_read_db` no lo mande a una réplica
+# que todavía no tiene su cambio. Sin réplica configurada no hace nada.
+import logging
+
+from fastapi import Request
+from sqlalchemy import text
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.config import settings
+from app.db.async_session import async_engine
+from app.db.replica import PRIMARY_READS_CHANNEL, replica_engine, replica_router
+
+logger = logging.getLogger(__name__)
+
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        resp = await call_next(request)
+
+        user_id = getattr(request.state, "user_id", None)
+        if replica_engine is None or request.method in _SAFE_METHODS or not user_id or resp.status_code >= 400:
+            return resp
+
+        replica_router.mark_recent_write(user_id)
+        if settings.PG_LISTENER_ENABLED:
+            try:
+                async with async_engine.connect() as conn:
+                    await conn.execute(
+                        text("SELECT pg_notify(:channel, :payload)"),
+                        {"channel": PRIMARY_READS_CHANNEL, "payload": str(user_id)},
+                    )
+                    await conn.commit()
+            except Exception:
+                logger.warning("No se pudo avisar read-your-writes a los demás workers", exc_info=True)
+        return resp
@@ -2,6 +2,7 @@
 from .user import User
 from .role import Role, RoleTypeEnum
 from .audit_log import AuditLog
+from .audit_read_rollup import AuditReadRollup
 from .account import Account
 from .brand import Brand
 from .category import Category
@@ -9,14 +10,19 @@ from .concept import Concept
 from .country import Country
 from .division import Division
 from .document import Document
+from .document_sequence import DocumentSequence
 from .entry import Entry
 from .group import Group
+from .kardex import KardexMovement
 from .municipality import Municipality
 from .payment_term import PaymentTerm
 from .product import Product
 from .purchase import Purchase
 from .setting import Setting
 from .stock import Stock
+from .stock_alert import StockAlert
+from .stock_reservation import StockReservation
+from .stock_snapshot import StockSnapshot
 from .subcategory import SubCategory
 from .subgroup import SubGroup
 from .third_party import ThirdParty
@@ -25,9 +31,9 @@ from .warehouse import Warehouse
 
 __all__ = [
     "User", "Role", "RoleType",
-    "AuditLog", "OAuth2Client", "Account", "Brand", "Category",
-    "Concept", "Country", "Division", "Document", "Entry",
-    "Group", "Municipality", "PaymentTerm", "Product", "Purchase",
-    "Setting", "Stock", "SubCategory", "SubGroup", "ThirdParty",
+    "AuditLog", "AuditReadRollup", "OAuth2Client", "Account", "Brand", "Category",
+    "Concept", "Country", "Division", "Document", "DocumentSequence", "Entry",
+    "Group", "KardexMovement", "Municipality", "PaymentTerm", "Product", "Purchase",
+    "Setting", "Stock", "StockAlert", "StockReservation", "StockSnapshot", "SubCategory", "SubGroup", "ThirdParty",
     "Unit", "Warehouse"
 ]
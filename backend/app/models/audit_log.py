@@ -2,12 +2,15 @@
 # MODELO: AuditLog
 # Descripción: Registra eventos importantes en la base de datos.
 # Ejemplos de eventos: LOGIN, CREATE, UPDATE, DELETE, LOGOUT, etc.
+# Tabla particionada por mes (RANGE sobre created_at): las particiones
+# `audit_logs_pAAAAMM` las crean la migración y el mantenimiento periódico
+# (app/utils/audit_partitions.py); la retención las archiva y elimina.
 # ========================================================
 from typing import Optional, TYPE_CHECKING
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 
-from sqlalchemy import String, DateTime, ForeignKey, Text
+from sqlalchemy import String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
@@ -19,6 +22,14 @@ if TYPE_CHECKING:
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"  # Nombre real de la tabla en PostgreSQL
+    __table_args__ = (
+        # Consultas de auditoría: cada filtro + orden (created_at, id) para paginar por cursor
+        Index("ix_audit_logs_created_id", "created_at", "id"),
+        Index("ix_audit_logs_user_created", "user_id", "created_at", "id"),
+        Index("ix_audit_logs_entity_created", "entity", "entity_id", "created_at", "id"),
+        Index("ix_audit_logs_action_created", "action", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     # UUID autogenerado como clave primaria
     id: Mapped[uuid.UUID] = mapped_column(
@@ -44,9 +55,12 @@ class AuditLog(Base):
         ForeignKey("users.id"), nullable=True
     )
 
-    # Fecha y hora de creación automática (UTC)
+    # Fecha y hora de creación automática (UTC). Es la clave de partición, por
+    # eso forma parte de la PK y se asigna también en Python (identidad ORM).
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
+        default=lambda: datetime.now(timezone.utc),
         server_default=func.now(),
         nullable=False
     )
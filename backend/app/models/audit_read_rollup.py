@@ -0,0 +1,31 @@
+# ========================================================
+# MODELO: AuditReadRollup
+# Descripción: conteo de lecturas auditadas por (minuto, usuario, entidad,
+# acción). Reemplaza una fila de `audit_logs` por cada GET en modo "rollup":
+# responde "quién consultó qué y cuántas veces, cuándo" con una fila por
+# minuto en lugar de una por petición.
+# ========================================================
+import uuid
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, String
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class AuditReadRollup(Base):
+    __tablename__ = "audit_read_rollups"
+    __table_args__ = (
+        Index("ix_audit_read_rollups_entity_bucket", "entity", "bucket"),
+    )
+
+    # Inicio del minuto (UTC) en que ocurrieron las lecturas
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    entity: Mapped[str] = mapped_column(String(50), primary_key=True)
+    action: Mapped[str] = mapped_column(String(50), primary_key=True)
+    reads: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
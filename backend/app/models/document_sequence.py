@@ -0,0 +1,26 @@
+# ============================================================
+# MODELO DE LA TABLA 'document_sequences' (consecutivos)
+# ============================================================
+# Último consecutivo asignado por (tabla, tipo de documento, año). La
+# numeración toma el siguiente valor con un único UPSERT ... RETURNING sobre
+# esta fila, en lugar de bloquear `documents` y calcular MAX() sobre la tabla.
+import uuid
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Integer, String
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class DocumentSequence(Base):
+    __tablename__ = "document_sequences"
+
+    # Tabla numerada ('entries', 'purchases'): cada una conserva su propia serie
+    scope: Mapped[str] = mapped_column(String(50), primary_key=True)
+    document_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("documents.id"), primary_key=True)
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    last_value: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
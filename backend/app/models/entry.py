@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Boolean, Numeric, DateTime, String, ForeignKey, UniqueConstraint
+from sqlalchemy import Boolean, Numeric, DateTime, String, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base  # Base declarativa asincrónica
@@ -10,6 +10,11 @@ from app.db.base import Base  # Base declarativa asincrónica
 # =============================
 class Entry(Base):
     __tablename__ = "entries"
+    __table_args__ = (
+        # Consultas por bodega y fecha (stock a una fecha, cierres de periodo)
+        Index("ix_entries_warehouse_created", "warehouse_id", "created_at"),
+        Index("ix_entries_created_at", "created_at"),
+    )
 
     # ID principal tipo UUID
     id: Mapped[uuid.UUID] = mapped_column(
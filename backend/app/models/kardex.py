@@ -0,0 +1,48 @@
+# ============================================================
+# MODELO DE LA TABLA 'kardex_movements' (libro de movimientos)
+# ============================================================
+# Una fila por movimiento de stock (entrada, salida, anulación, importación, ajuste manual o conciliación)
+# con la cantidad con signo, el costo unitario y el saldo resultante del par
+# (producto, bodega). Se escribe en la misma transacción que el movimiento.
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import String, DateTime, ForeignKey, Numeric, BigInteger, Identity, Index
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class KardexMovement(Base):
+    __tablename__ = "kardex_movements"
+    __table_args__ = (
+        # Kardex / historial de saldos de un par = un único range scan por este índice
+        Index("ix_kardex_pair_occurred", "product_id", "warehouse_id", "occurred_at", "seq"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    # Orden de registro: desempata movimientos con el mismo `occurred_at`
+    seq: Mapped[int] = mapped_column(BigInteger, Identity(always=False), nullable=False, unique=True)
+
+    product_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("products.id"), nullable=False)
+    warehouse_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("warehouses.id"), nullable=False)
+
+    # Documento origen
+    entry_id: Mapped[uuid.UUID | None] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("entries.id"), nullable=True)
+    document_id: Mapped[uuid.UUID | None] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("documents.id"), nullable=True)
+    document_number: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    document_date: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    # ENTRY | ENTRY_CANCEL | IMPORT | ADJUST | RECONCILE
+    movement_type: Mapped[str] = mapped_column(String(20), nullable=False)
+
+    quantity: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)       # con signo
+    unit_cost: Mapped[Decimal] = mapped_column(Numeric(14, 4), nullable=False, default=0)
+    balance: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)        # saldo tras el movimiento
+
+    # Momento de registro (UTC sin zona, misma convención que `entries.created_at`)
+    occurred_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    user_id: Mapped[uuid.UUID | None] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
@@ -3,7 +3,7 @@
 # ============================================================
 # Tipos de columna: String, Boolean para texto y verdadero/falso
 # DateTime para fechas y ForeignKey para claves foráneas
-from sqlalchemy import String, Boolean, DateTime, ForeignKey, Numeric
+from sqlalchemy import String, Boolean, DateTime, ForeignKey, Numeric, UniqueConstraint
 from sqlalchemy.sql import func  # Para usar funciones como "func.now()"
 
 # Tipado ORM moderno con Mapped y mapped_column
@@ -22,6 +22,10 @@ from sqlalchemy.dialects.postgresql import UUID
 # ============================================================
 class Stock(Base):
     __tablename__ = "stocks"  # Nombre real de la tabla
+    __table_args__ = (
+        # Una sola fila por par: permite el alta concurrente con INSERT ... ON CONFLICT
+        UniqueConstraint("product_id", "warehouse_id", name="uq_stocks_product_warehouse"),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     warehouse_id:Mapped[UUID] = mapped_column(ForeignKey("warehouses.id"), nullable=False)
@@ -30,6 +34,9 @@ class Stock(Base):
     min_stock: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
     max_stock: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
     reserved: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
+    # Valorización: costo promedio ponderado móvil y valor del inventario del par
+    avg_cost: Mapped[float] = mapped_column(Numeric(14, 4), nullable=False, default=0, server_default="0")
+    total_value: Mapped[float] = mapped_column(Numeric(16, 2), nullable=False, default=0, server_default="0")
     active: Mapped[bool] = mapped_column(Boolean, default=True)
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,53 @@
+# ============================================================
+# MODELO DE LA TABLA 'stock_alerts' (alertas de mínimo / máximo)
+# ============================================================
+# Estado de alertas por par (producto, bodega): a lo sumo una alerta ABIERTA
+# por tipo (LOW: quantity <= min_stock, OVER: quantity > max_stock). Se
+# evalúa sólo para las filas de stock tocadas por cada movimiento.
+# `change_seq` crece en cada apertura/cierre y sirve de cursor al stream.
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import String, DateTime, ForeignKey, Numeric, BigInteger, Sequence, Index, text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+stock_alert_change_seq = Sequence("stock_alerts_change_seq")
+
+
+class StockAlert(Base):
+    __tablename__ = "stock_alerts"
+    __table_args__ = (
+        # Una sola alerta abierta por par y tipo (destino del ON CONFLICT)
+        Index(
+            "uq_stock_alerts_open_pair_type", "product_id", "warehouse_id", "alert_type",
+            unique=True, postgresql_where=text("status = 'OPEN'"),
+        ),
+        # Listado paginado de abiertas por bodega
+        Index("ix_stock_alerts_status_warehouse", "status", "warehouse_id", "opened_at"),
+        # Stream de cambios: WHERE change_seq > cursor ORDER BY change_seq
+        Index("ix_stock_alerts_change_seq", "change_seq", unique=True),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    product_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("products.id"), nullable=False)
+    warehouse_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("warehouses.id"), nullable=False)
+
+    # LOW | OVER
+    alert_type: Mapped[str] = mapped_column(String(10), nullable=False)
+    # OPEN | RESOLVED
+    status: Mapped[str] = mapped_column(String(10), nullable=False, default="OPEN")
+
+    # Valores al momento de abrir la alerta
+    quantity: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+    threshold: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+
+    change_seq: Mapped[int] = mapped_column(
+        BigInteger, stock_alert_change_seq, server_default=stock_alert_change_seq.next_value(), nullable=False
+    )
+    opened_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    resolved_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,47 @@
+# ============================================================
+# MODELO DE LA TABLA 'stock_reservations' (apartados con TTL)
+# ============================================================
+# Un apartado retiene cantidad de un par (producto, bodega) para un carrito
+# POS o una compra pendiente hasta `expires_at`. El total de apartados
+# ACTIVOS de cada par se mantiene agregado en `stocks.reserved`.
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import String, DateTime, ForeignKey, Numeric, Index, text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        # El barrido de vencidos sólo recorre apartados activos
+        Index("ix_stock_reservations_active_expires", "expires_at", postgresql_where=text("status = 'ACTIVE'")),
+        Index("ix_stock_reservations_reference", "reference"),
+    )
+    # created_at vuelve con RETURNING en el INSERT (la respuesta lo incluye)
+    __mapper_args__ = {"eager_defaults": True}
+
+    id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    product_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("products.id"), nullable=False)
+    warehouse_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("warehouses.id"), nullable=False)
+    quantity: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+
+    # ACTIVE → COMMITTED | RELEASED | EXPIRED (sólo se sale de ACTIVE una vez)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="ACTIVE")
+
+    # Carrito / terminal / compra que originó el apartado
+    reference: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    # Entrada (salida de inventario) que consumió el apartado al confirmarlo
+    entry_id: Mapped[uuid.UUID | None] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("entries.id"), nullable=True)
+
+    # UTC sin zona, misma convención que `entries.created_at`
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    user_id: Mapped[uuid.UUID | None] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
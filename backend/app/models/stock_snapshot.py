@@ -0,0 +1,37 @@
+# ============================================================
+# MODELO DE LA TABLA 'stock_snapshots' (cierres de periodo)
+# ============================================================
+# Guarda el saldo de cada par (producto, bodega) al cierre de un periodo.
+# El recálculo de stock parte del último cierre y sólo suma los movimientos
+# posteriores, en lugar de recorrer todo el histórico de `entry_items`.
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import DateTime, ForeignKey, Numeric, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class StockSnapshot(Base):
+    __tablename__ = "stock_snapshots"
+    __table_args__ = (
+        UniqueConstraint("product_id", "warehouse_id", "period_end", name="uq_stock_snapshots_pair_period"),
+        Index("ix_stock_snapshots_period_end", "period_end"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    product_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("products.id"), nullable=False)
+    warehouse_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("warehouses.id"), nullable=False)
+
+    # Fin del periodo cerrado (misma convención UTC sin zona que `entries.created_at`)
+    period_end: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    # Saldo al cierre = saldo del cierre anterior + movimientos del periodo
+    quantity: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+
+    user_id: Mapped[uuid.UUID | None] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
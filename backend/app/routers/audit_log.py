@@ -0,0 +1,120 @@
+# =============================================================================
+# AUDITORÍA (consulta y exportación de audit_logs, sólo administradores)
+# =============================================================================
+from uuid import UUID
+from typing import Optional
+from datetime import datetime
+import csv
+import io
+import json
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import get_async_db
+from app.db.async_session import AsyncSessionLocal
+from app.dependencies.current_user import get_current_user
+from app.models.user import User
+from app.schemas.audit_log import AuditLogPage, AuditLogRead
+from app.crud.audit_log import list_audit_logs, stream_audit_logs
+
+# RBAC
+from app.security.authorization import requires_role
+from app.models.role import RoleTypeEnum
+
+logger = logging.getLogger(__name__)
+router = APIRouter(tags=["AuditLogs"])
+
+_EXPORT_COLUMNS = ("id", "created_at", "user_id", "action", "entity", "entity_id", "description")
+_EXPORT_CHUNK_ROWS = 500
+
+
+@router.get("/", response_model=AuditLogPage, dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def read_audit_logs(
+    user_id: Optional[UUID] = Query(None),
+    entity: Optional[str] = Query(None, max_length=50),
+    entity_id: Optional[UUID] = Query(None),
+    action: Optional[str] = Query(None, max_length=50),
+    date_from: Optional[datetime] = Query(None, description="Desde (inclusive)"),
+    date_to: Optional[datetime] = Query(None, description="Hasta (exclusive)"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Eventos de auditoría del más reciente al más antiguo, paginados por cursor."""
+    try:
+        items, next_cursor = await list_audit_logs(
+            db,
+            user_id=user_id,
+            entity=entity,
+            entity_id=entity_id,
+            action=action,
+            date_from=date_from,
+            date_to=date_to,
+            cursor=cursor,
+            limit=limit,
+            audit_user_id=current_user.id,
+        )
+        await db.commit()  # persiste la auditoría de lectura, si se generó
+        return AuditLogPage(items=[AuditLogRead.model_validate(it) for it in items], next_cursor=next_cursor)
+
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception:
+        await db.rollback()
+        logger.exception("Error inesperado al consultar la auditoría")
+        raise HTTPException(status_code=500, detail="Ocurrió un error al consultar la auditoría")
+
+
+@router.get("/export", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def export_audit_logs(
+    user_id: Optional[UUID] = Query(None),
+    entity: Optional[str] = Query(None, max_length=50),
+    entity_id: Optional[UUID] = Query(None),
+    action: Optional[str] = Query(None, max_length=50),
+    date_from: Optional[datetime] = Query(None, description="Desde (inclusive)"),
+    date_to: Optional[datetime] = Query(None, description="Hasta (exclusive)"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Exporta en streaming (NDJSON o CSV) todos los eventos del filtro en orden
+    cronológico. Usa su propia sesión: la lectura dura lo que dure la descarga.
+    """
+    filters = dict(
+        user_id=user_id, entity=entity, entity_id=entity_id,
+        action=action, date_from=date_from, date_to=date_to,
+    )
+
+    async def _ndjson():
+        async with AsyncSessionLocal() as db:
+            async for row in stream_audit_logs(db, audit_user_id=current_user.id, **filters):
+                yield json.dumps(row, default=str) + "\n"
+
+    async def _csv():
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=_EXPORT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        pending = 0
+        async with AsyncSessionLocal() as db:
+            async for row in stream_audit_logs(db, audit_user_id=current_user.id, **filters):
+                writer.writerow(row)
+                pending += 1
+                if pending >= _EXPORT_CHUNK_ROWS:
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+                    pending = 0
+        yield buf.getvalue()
+
+    if format == "csv":
+        return StreamingResponse(
+            _csv(),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="audit_logs.csv"'},
+        )
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
@@ -5,6 +5,7 @@ from typing import Optional, Type
 from uuid import UUID
 
 from app.core.security import get_async_db
+from app.db.replica import get_read_db
 from app.dependencies.current_user import get_current_user
 from app.models.user import User
 from app.security.input_validation import validate_upload
@@ -41,7 +42,7 @@ def build_catalog_router(
         limit: int = Query(100, ge=1, le=1000),
         search: Optional[str] = Query(None),
         active: Optional[bool] = Query(None),
-        db: AsyncSession = Depends(get_async_db),
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user),
     ):
         data = await crud.list(db, skip, limit, search, active, current_user.id)
@@ -10,7 +10,7 @@
 #   - SQLAlchemy AsyncSession (async/await) + transacciones y SAVEPOINT por fila.
 #   - Validación estricta de document_id como UUID (formato) y existencia en DB.
 #   - Numeración por documento y año con prefijo configurable por documento.
-#   - Re-cálculo de stock "absoluto" (entradas - salidas) al final (delta=0).
+#   - Re-cálculo de stock "absoluto" (entradas - salidas) al final (rebuild).
 #   - Auditoría granular en CRUD y agregada en importación masiva.
 #
 # 📝 Convenciones:
@@ -21,7 +21,6 @@
 # ------------------------------
 # IMPORTS DEL ECOSISTEMA
 # ------------------------------
-from sqlalchemy import select, func          # select() para consultas, func.* para funciones SQL (MAX, COALESCE, DATE_PART, etc.)
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 #  - APIRouter: agrupa rutas bajo un prefijo y etiquetas.
 #  - Depends: inyección de dependencias (DB, usuario actual, etc.).
@@ -41,11 +40,12 @@ import logging                              # Logging estructurado para diagnós
 # IMPORTS DE LA APLICACIÓN
 # ------------------------------
 from app.core.security import get_async_db  # Proveedor de AsyncSession (inyección FastAPI).
+from app.db.replica import get_read_db     # Listados: réplica de lectura si está disponible.
 from app.dependencies.current_user import get_current_user  # Proveedor del usuario autenticado.
 from app.models.user import User            # Modelo de usuario (para tipos y acceso a su id).
 
 # Utilidades estándar
-import csv, json, re                        # csv: parseo de CSV; json: parseo de items; re: regex UUID.
+import csv, json                            # csv: parseo de CSV; json: parseo de items.
 from io import StringIO                     # Buffer de texto (convierte bytes -> archivo-like para csv).
 from decimal import Decimal                 # Decimal para montos exactos (evita errores de punto flotante).
 from datetime import datetime               # Timestamps (created_at, parsing ISO).
@@ -54,7 +54,8 @@ from datetime import datetime               # Timestamps (created_at, parsing IS
 from typing import Optional
 
 # Modelos de dominio
-from app.models.document import Document    # Documento (define prefijo y existencia del tipo de comprobante).
+from app.core.sequence import reserve_document_number_blocks  # Numeración por bloques (importación).
+from app.db.async_session import AsyncSessionLocal  # Sesión corta propia para reservar la numeración.
 from app.models.entry import Entry, EntryItem  # Cabecera y detalle (ítems) del movimiento.
 
 # Auditoría (nivel + registro)
@@ -62,7 +63,10 @@ from app.utils.audit_level import get_audit_level  # Determina si auditar y con
 from app.utils.audit import log_action              # Inserta eventos de auditoría.
 
 # Stock
-from app.helper.stock import adjust_stock_quantity  # Recalcula/ajusta stock (se invoca con delta=0 para recalcular absoluto).
+from app.helper.stock_snapshot import get_last_period_end, check_period_open  # Cierres de periodo de stock.
+from app.helper.stock import rebuild_stock_quantities, movement_sign  # Recalcula stock absoluto (entradas - salidas) desde el histórico.
+from app.helper.kardex import kardex_movement, item_unit_cost, record_kardex_movements  # Kardex (libro de movimientos).
+from app.helper.valuation import movement_unit_costs, cost_outflows_at_average  # Costo promedio ponderado.
 
 # Esquemas (pydantic) para entrada/salida de API
 from app.schemas.entry import (
@@ -144,7 +148,7 @@ async def create_entry_endpoint(
 async def list_entries(
     skip: int = Query(0, ge=0),                   # Paginación: índice inicial (>=0).
     limit: int = Query(100, ge=1, le=1000),       # Paginación: cantidad (1..1000).
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -256,13 +260,6 @@ async def deactivate_entry(
 # Utilidades de validación y formateo
 # ------------------------------
 
-# Regex para validar UUID estándar (8-4-4-4-12 dígitos hex).
-#   ^ y $ fuerzan coincidencia completa (no parcial).
-#   [0-9a-fA-F] permite mayúsculas o minúsculas.
-_UUID_RE = re.compile(
-    r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
-)
-
 def _parse_iso_dt(s: Optional[str]) -> datetime:
     """
     Convierte una cadena ISO-8601 a datetime.
@@ -281,16 +278,6 @@ def _parse_iso_dt(s: Optional[str]) -> datetime:
         # ⚠️ Si esperas fechas con locales (p.ej. '17/08/2025'), conviértelas antes del import.
         return datetime.utcnow()
 
-def _build_doc_number(prefix: str, year: int, sequence: int) -> str:
-    """
-    Construye el código visible de la entrada con el formato:
-      <prefix opcional terminado en '-'><año>-<secuencia 5 dígitos>
-    Ejemplo: 'FAC-2025-00042' o '2025-00042' si no hay prefijo.
-    """
-    p = (prefix or "").strip()
-    if p and not p.endswith("-"):
-        p += "-"
-    return f"{p}{year}-{sequence:05d}"
 
 
 # =============================================================================
@@ -318,73 +305,37 @@ async def import_entries(
             reader.fieldnames = [h.strip().replace("\ufeff", "") for h in reader.fieldnames]
             logger.info("Headers después de limpieza: %s", reader.fieldnames)
 
-        # 3) Estructuras de cache para eficiencia durante el bucle:
-        #    - seq_counter[(doc_id, year)] → última secuencia encontrada/usada para ese par.
-        #    - dt_prefix[doc_id] → prefijo del documento (evita reconsultar en DB).
-        seq_counter: dict[tuple[str, int], int] = {}
-        dt_prefix: dict[str, str] = {}
-
-        async def ensure_counter_for_uuid(doc_id_str: str, year: int) -> tuple[str, str]:
-            """
-            Valida y prepara el contexto de numeración para (documento, año).
-            Pasos:
-              (a) Verifica que doc_id_str tenga formato de UUID (no solo existencias).
-              (b) Hace SELECT ... FOR UPDATE del Document para:
-                  - asegurar que existe,
-                  - serializar la asignación de secuencias (evita condiciones de carrera).
-              (c) Inicializa en caché el contador de secuencia (busca MAX en DB) y el prefix.
-              (d) Devuelve (doc_id como str, prefix).
-            """
-            # (a) Validación de formato (no convierte a UUID aquí; solo regex).
-            if not _UUID_RE.match(doc_id_str):
-                # Si la fuente "siempre" entrega UUID, este error indica datos corruptos en el CSV.
-                raise HTTPException(status_code=400, detail=f"document_id no es UUID: {doc_id_str}")
-
-            # (b) Lock pesimista del Document: evita que dos procesos asignen la misma secuencia simultáneamente.
-            res = await db.execute(
-                select(Document).where(Document.id == doc_id_str).with_for_update()
-            )
-            doc = res.scalar_one_or_none()
-            if not doc:
-                # Puede ser un ID inexistente o un documento no accesible por políticas de seguridad.
-                raise HTTPException(status_code=400, detail=f"document_id inválido: {doc_id_str}")
-
-            # Normalizamos el ID a str (por si el ORM lo trae como UUID nativo).
-            doc_id = str(doc.id)
-            key = (doc_id, year)
-
-            # Reutilizamos el contador si ya se inicializó en esta corrida.
-            if key in seq_counter:
-                return doc_id, dt_prefix[doc_id]
-
-            # Cacheamos el prefijo del documento (puede ser "" si es None).
-            dt_prefix[doc_id] = doc.prefix or ""
-
-            # (c) Buscamos la secuencia máxima usada para este doc en este año:
-            #     MAX(sequence_number) WHERE document_id = doc_id AND YEAR(created_at) = year
-            max_res = await db.execute(
-                select(func.coalesce(func.max(Entry.sequence_number), 0)).where(
-                    Entry.document_id == doc_id,
-                    func.date_part("year", Entry.created_at) == year,
-                )
-            )
-            # Guardamos el máximo encontrado (o 0 si no hay registros).
-            seq_counter[key] = int(max_res.scalar_one() or 0)
-
-            return doc_id, dt_prefix[doc_id]
+        # 3) Numeración por bloques (antes del bucle):
+        #    - Se leen todas las filas y su (document_id, año) una sola vez.
+        #    - `reserve_document_number_blocks` valida los tipos de documento con una
+        #      consulta y reserva un bloque contiguo por (documento, año) con un único
+        #      UPSERT, en una transacción corta propia: la carga no bloquea `documents`
+        #      ni el contador mientras procesa el archivo.
+        #    - Si la importación se cancela, el bloque reservado queda como hueco.
+        rows = list(reader)
+        row_dates = [_parse_iso_dt((row.get("date") or row.get("created_at") or "").strip() or None) for row in rows]
+        numbering = await reserve_document_number_blocks(
+            AsyncSessionLocal,
+            scope=Entry.__tablename__,
+            keys=[((row.get("document_id") or "").strip(), dt.year) for row, dt in zip(rows, row_dates)],
+        )
+        dt_sign: dict[str, Decimal] = {}  # dt_sign[doc_id] → signo del movimiento (+1 entrada, -1 salida, 0 neutral).
 
         # 4) Métricas y acumuladores de la importación:
         imported = 0                 # Conteo de filas importadas correctamente.
         errors: list[str] = []       # Errores por fila (para devolver en respuesta y log).
         pairs_to_recalc: set[tuple[str, str]] = set()  # (warehouse_id, product_id) para recalcular stock al final.
+        movements: list[dict] = []   # Movimientos de kardex de las filas confirmadas (se registran tras el recálculo).
+        last_period_end = await get_last_period_end(db)  # Último cierre de stock (una sola lectura).
 
         # 5) Bucle principal sobre el CSV:
         #    ⚠️ Todo-o-nada:
         #       - Usamos SAVEPOINT por fila para detectar/acumular errores,
         #       - PERO si aparece cualquier error, haremos rollback global al final (no quedará nada aplicado).
-        for idx, row in enumerate(reader, start=1):
+        for idx, (row, dt) in enumerate(zip(rows, row_dates), start=1):
             # Iniciamos un SAVEPOINT (transacción anidada) para esta fila.
             sp = await db.begin_nested()
+            row_items: list[EntryItem] = []  # Ítems de la fila (para el kardex, sólo si la fila se confirma).
             try:
                 # 5.1) Validaciones y preparación de datos de cabecera
                 doc_id_str = (row.get("document_id") or "").strip()
@@ -392,21 +343,14 @@ async def import_entries(
                     # document_id es obligatorio (y exógeno al CSV).
                     raise ValueError("Falta 'document_id' (UUID).")
 
-                # Fecha para determinar el año de numeración; aceptamos 'date' o 'created_at'.
-                # Si ninguna está presente → usamos utcnow().
-                dt = _parse_iso_dt((row.get("date") or row.get("created_at") or "").strip() or None)
+                # Fecha de la fila ('date' o 'created_at'; utcnow() si falta), ya leída en el paso 3.
+                check_period_open(dt, last_period_end)  # Periodos de stock cerrados son inmutables
                 year = dt.year
 
-                # Preparamos el contador de secuencia y recuperamos el prefijo del documento.
-                doc_id, prefix = await ensure_counter_for_uuid(doc_id_str, year)
-
-                # 5.2) Cálculo de secuencia y número visible
-                # Incrementamos la última secuencia para este (doc_id, year).
-                seq_counter[(doc_id, year)] += 1
-                sequence = seq_counter[(doc_id, year)]
-
-                # Construimos el "entry_number" (ej.: FAC-2025-00001).
-                entry_number = _build_doc_number(prefix, year, sequence)
+                # 5.2) Secuencia y número visible (ej.: FAC-2025-00001) desde el bloque reservado.
+                document_id, document_type, sequence, entry_number = numbering.take(doc_id_str, year)
+                doc_id = str(document_id)
+                dt_sign[doc_id] = movement_sign(document_type)
 
                 # 5.3) Construcción del modelo Entry (cabecera)
                 entry = Entry(
@@ -440,7 +384,7 @@ async def import_entries(
                     for it in items:
                         product_id = str(it["product_id"]).strip()  # Obligatorio.
 
-                        db.add(EntryItem(
+                        item = EntryItem(
                             entry=entry,  # backref: ORM vincula con la cabecera.
                             product_id=product_id,
                             quantity=Decimal(str(it["quantity"])),
@@ -448,7 +392,9 @@ async def import_entries(
                             discount=Decimal(str(it.get("discount", 0))),
                             tax=Decimal(str(it.get("tax", 0))),
                             total=Decimal(str(it.get("total", 0))),
-                        ))
+                        )
+                        db.add(item)
+                        row_items.append(item)
 
                         # Marcamos que este (warehouse, product) necesita recálculo de stock.
                         pairs_to_recalc.add((entry.warehouse_id, product_id))
@@ -456,7 +402,7 @@ async def import_entries(
                 else:
                     # B) Fila plana: exigimos al menos 'product_id' y 'quantity'.
                     product_id = str(row["product_id"]).strip()
-                    db.add(EntryItem(
+                    item = EntryItem(
                         entry=entry,
                         product_id=product_id,
                         quantity=Decimal(str(row["quantity"])),
@@ -466,7 +412,9 @@ async def import_entries(
                         discount=Decimal(str(row.get("item_discount", row.get("discount", 0)))),
                         tax=Decimal(str(row.get("item_tax", row.get("tax", 0)))),
                         total=Decimal(str(row.get("item_total", row.get("total", 0)))),
-                    ))
+                    )
+                    db.add(item)
+                    row_items.append(item)
 
                     pairs_to_recalc.add((entry.warehouse_id, product_id))
 
@@ -479,6 +427,25 @@ async def import_entries(
                 await sp.commit()
                 imported += 1
 
+                # 5.7) Kardex: sólo entradas activas que mueven inventario.
+                sign = dt_sign[doc_id]
+                if entry.active and sign:
+                    movements.extend(
+                        kardex_movement(
+                            product_id=item.product_id,
+                            warehouse_id=entry.warehouse_id,
+                            quantity=item.quantity * sign,
+                            movement_type="IMPORT",
+                            unit_cost=item_unit_cost(item.quantity, item.subtotal),
+                            entry_id=entry.id,
+                            document_id=entry.document_id,
+                            document_number=entry.entry_number,
+                            document_date=entry.created_at,
+                            user_id=current_user.id,
+                        )
+                        for item in row_items
+                    )
+
             except Exception as row_err:
                 # Si algo falla en la fila, revertimos SOLO lo hecho por esa fila:
                 await sp.rollback()
@@ -509,18 +476,28 @@ async def import_entries(
 
         # 7) Re-cálculo de stock para todos los pares (warehouse, product) tocados.
         #    ⚠️ También TODO-O-NADA: si falla cualquier recálculo, abortamos todo.
-        for wh_id, prod_id in pairs_to_recalc:
-            try:
-                await adjust_stock_quantity(
-                    db=db,
-                    product_id=prod_id,
-                    warehouse_id=wh_id,
-                    delta=Decimal("0"),  # Señal de "recalcular absoluto".
-                    user_id=current_user.id,
-                    reason="IMPORT_RECALC_ENTRIES_MINUS_OUTPUTS",  # Ayuda a auditoría/forense.
-                )
-            except Exception as e:
-                errors.append(f"stock ({wh_id}, {prod_id}): {e}")
+        #    Un solo lote: bloqueo de todos los pares + un GROUP BY + un flush.
+        try:
+            # Valorización: las entradas importadas ingresan al promedio a su costo unitario.
+            inbound = [m for m in movements if m["quantity"] > 0]
+            inflows: dict[tuple, Decimal] = {}
+            for m in inbound:
+                key = (m["product_id"], m["warehouse_id"])
+                inflows[key] = inflows.get(key, Decimal("0")) + m["quantity"]
+            stocks = await rebuild_stock_quantities(
+                db,
+                keys=[(prod_id, wh_id) for wh_id, prod_id in pairs_to_recalc],
+                user_id=current_user.id,
+                reason="IMPORT_RECALC_ENTRIES_MINUS_OUTPUTS",  # Ayuda a auditoría/forense.
+                inflows=inflows,
+                unit_costs=movement_unit_costs(inbound),
+            )
+            # Las salidas importadas salen al promedio vigente (igual que en create_entry).
+            cost_outflows_at_average([m for m in movements if m["quantity"] < 0], stocks)
+            # Kardex de lo importado; el saldo corrido termina en el stock recalculado.
+            await record_kardex_movements(db, movements, {k: s.quantity for k, s in stocks.items()})
+        except Exception as e:
+            errors.append(f"stock: {e}")
 
         if errors:
             # Si falló algún recálculo, abortamos TODO antes de auditar/commitear.
@@ -0,0 +1,55 @@
+# =============================================================================
+# KARDEX (libro de movimientos de stock con saldo corrido)
+# =============================================================================
+from uuid import UUID
+from typing import Optional
+from datetime import datetime
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import get_async_db
+from app.db.replica import get_read_db
+from app.dependencies.current_user import get_current_user
+from app.models.user import User
+from app.schemas.kardex import KardexListResponse, KardexMovementRead
+from app.crud.kardex import get_kardex
+
+logger = logging.getLogger(__name__)
+router = APIRouter(tags=["Kardex"])
+
+
+@router.get("/", response_model=KardexListResponse)
+async def read_kardex(
+    product_id: UUID = Query(...),
+    warehouse_id: UUID = Query(...),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Kardex de un producto en una bodega, en orden cronológico y con saldo por movimiento."""
+    try:
+        items, total = await get_kardex(
+            db,
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            date_from=date_from,
+            date_to=date_to,
+            skip=skip,
+            limit=limit,
+            user_id=current_user.id,
+        )
+        await db.commit()  # persiste la auditoría de lectura, si se generó
+        return KardexListResponse(total=total, items=[KardexMovementRead.model_validate(it) for it in items])
+
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception:
+        await db.rollback()
+        logger.exception("Error inesperado al consultar el kardex")
+        raise HTTPException(status_code=500, detail="Ocurrió un error al consultar el kardex")
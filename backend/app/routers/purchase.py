@@ -21,7 +21,6 @@
 # ------------------------------
 # IMPORTS DEL ECOSISTEMA
 # ------------------------------
-from sqlalchemy import select, func          # select() para consultas, func.* para funciones SQL (MAX, COALESCE, DATE_PART, etc.)
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 #  - APIRouter: agrupa rutas bajo un prefijo y etiquetas.
 #  - Depends: inyección de dependencias (DB, usuario actual, etc.).
@@ -41,11 +40,12 @@ import logging                              # Logging estructurado para diagnós
 # IMPORTS DE LA APLICACIÓN
 # ------------------------------
 from app.core.security import get_async_db  # Proveedor de AsyncSession (inyección FastAPI).
+from app.db.replica import get_read_db     # Listados: réplica de lectura si está disponible.
 from app.dependencies.current_user import get_current_user  # Proveedor del usuario autenticado.
 from app.models.user import User            # Modelo de usuario (para tipos y acceso a su id).
 
 # Utilidades estándar
-import csv, json, re                        # csv: parseo de CSV; json: parseo de items; re: regex UUID.
+import csv, json                            # csv: parseo de CSV; json: parseo de items.
 from io import StringIO                     # Buffer de texto (convierte bytes -> archivo-like para csv).
 from decimal import Decimal                 # Decimal para montos exactos (evita errores de punto flotante).
 from datetime import datetime               # Timestamps (created_at, parsing ISO).
@@ -54,7 +54,8 @@ from datetime import datetime               # Timestamps (created_at, parsing IS
 from typing import Optional
 
 # Modelos de dominio
-from app.models.document import Document    # Documento (define prefijo y existencia del tipo de comprobante).
+from app.core.sequence import reserve_document_number_blocks  # Numeración por bloques (importación).
+from app.db.async_session import AsyncSessionLocal  # Sesión corta propia para reservar la numeración.
 from app.models.purchase import Purchase, PurchaseItem  # Cabecera y detalle (ítems) del movimiento.
 
 # Auditoría (nivel + registro)
@@ -146,7 +147,7 @@ async def create_purchase_endpoint(
 async def list_purchases(
     skip: int = Query(0, ge=0),                   # Paginación: índice inicial (>=0).
     limit: int = Query(100, ge=1, le=1000),       # Paginación: cantidad (1..1000).
-    db: AsyncSession = Depends(get_async_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -257,13 +258,6 @@ async def deactivate_purchase(
 # Utilidades de validación y formateo
 # ------------------------------
 
-# Regex para validar UUID estándar (8-4-4-4-12 dígitos hex).
-#   ^ y $ fuerzan coincidencia completa (no parcial).
-#   [0-9a-fA-F] permite mayúsculas o minúsculas.
-_UUID_RE = re.compile(
-    r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
-)
-
 def _parse_iso_dt(s: Optional[str]) -> datetime:
     """
     Convierte una cadena ISO-8601 a datetime.
@@ -282,16 +276,6 @@ def _parse_iso_dt(s: Optional[str]) -> datetime:
         # ⚠️ Si esperas fechas con locales (p.ej. '17/08/2025'), conviértelas antes del import.
         return datetime.utcnow()
 
-def _build_doc_number(prefix: str, year: int, sequence: int) -> str:
-    """
-    Construye el código visible de la compra con el formato:
-      <prefix opcional terminado en '-'><año>-<secuencia 5 dígitos>
-    Ejemplo: 'FAC-2025-00042' o '2025-00042' si no hay prefijo.
-    """
-    p = (prefix or "").strip()
-    if p and not p.endswith("-"):
-        p += "-"
-    return f"{p}{year}-{sequence:05d}"
 
 
 # =============================================================================
@@ -319,60 +303,20 @@ async def import_purchases(
             reader.fieldnames = [h.strip().replace("\ufeff", "") for h in reader.fieldnames]
             logger.info("Headers después de limpieza: %s", reader.fieldnames)
 
-        # 3) Estructuras de cache para eficiencia durante el bucle:
-        #    - seq_counter[(doc_id, year)] → última secuencia encontrada/usada para ese par.
-        #    - dt_prefix[doc_id] → prefijo del documento (evita reconsultar en DB).
-        seq_counter: dict[tuple[str, int], int] = {}
-        dt_prefix: dict[str, str] = {}
-
-        async def ensure_counter_for_uuid(doc_id_str: str, year: int) -> tuple[str, str]:
-            """
-            Valida y prepara el contexto de numeración para (documento, año).
-            Pasos:
-              (a) Verifica que doc_id_str tenga formato de UUID (no solo existencias).
-              (b) Hace SELECT ... FOR UPDATE del Document para:
-                  - asegurar que existe,
-                  - serializar la asignación de secuencias (evita condiciones de carrera).
-              (c) Inicializa en caché el contador de secuencia (busca MAX en DB) y el prefix.
-              (d) Devuelve (doc_id como str, prefix).
-            """
-            # (a) Validación de formato (no convierte a UUID aquí; solo regex).
-            if not _UUID_RE.match(doc_id_str):
-                # Si la fuente "siempre" entrega UUID, este error indica datos corruptos en el CSV.
-                raise HTTPException(status_code=400, detail=f"document_id no es UUID: {doc_id_str}")
-
-            # (b) Lock pesimista del Document: evita que dos procesos asignen la misma secuencia simultáneamente.
-            res = await db.execute(
-                select(Document).where(Document.id == doc_id_str).with_for_update()
-            )
-            doc = res.scalar_one_or_none()
-            if not doc:
-                # Puede ser un ID inexistente o un documento no accesible por políticas de seguridad.
-                raise HTTPException(status_code=400, detail=f"document_id inválido: {doc_id_str}")
-
-            # Normalizamos el ID a str (por si el ORM lo trae como UUID nativo).
-            doc_id = str(doc.id)
-            key = (doc_id, year)
-
-            # Reutilizamos el contador si ya se inicializó en esta corrida.
-            if key in seq_counter:
-                return doc_id, dt_prefix[doc_id]
-
-            # Cacheamos el prefijo del documento (puede ser "" si es None).
-            dt_prefix[doc_id] = doc.prefix or ""
-
-            # (c) Buscamos la secuencia máxima usada para este doc en este año:
-            #     MAX(sequence_number) WHERE document_id = doc_id AND YEAR(created_at) = year
-            max_res = await db.execute(
-                select(func.coalesce(func.max(Purchase.sequence_number), 0)).where(
-                    Purchase.document_id == doc_id,
-                    func.date_part("year", Purchase.created_at) == year,
-                )
-            )
-            # Guardamos el máximo encontrado (o 0 si no hay registros).
-            seq_counter[key] = int(max_res.scalar_one() or 0)
-
-            return doc_id, dt_prefix[doc_id]
+        # 3) Numeración por bloques (antes del bucle):
+        #    - Se leen todas las filas y su (document_id, año) una sola vez.
+        #    - `reserve_document_number_blocks` valida los tipos de documento con una
+        #      consulta y reserva un bloque contiguo por (documento, año) con un único
+        #      UPSERT, en una transacción corta propia: la carga no bloquea `documents`
+        #      ni el contador mientras procesa el archivo.
+        #    - Si la importación se cancela, el bloque reservado queda como hueco.
+        rows = list(reader)
+        row_dates = [_parse_iso_dt((row.get("date") or row.get("created_at") or "").strip() or None) for row in rows]
+        numbering = await reserve_document_number_blocks(
+            AsyncSessionLocal,
+            scope=Purchase.__tablename__,
+            keys=[((row.get("document_id") or "").strip(), dt.year) for row, dt in zip(rows, row_dates)],
+        )
 
         # 4) Métricas y acumuladores de la importación:
         imported = 0                 # Conteo de filas importadas correctamente.
@@ -383,7 +327,7 @@ async def import_purchases(
         #    ⚠️ Todo-o-nada:
         #       - Usamos SAVEPOINT por fila para detectar/acumular errores,
         #       - PERO si aparece cualquier error, haremos rollback global al final (no quedará nada aplicado).
-        for idx, row in enumerate(reader, start=1):
+        for idx, (row, dt) in enumerate(zip(rows, row_dates), start=1):
             # Iniciamos un SAVEPOINT (transacción anidada) para esta fila.
             sp = await db.begin_nested()
             try:
@@ -393,21 +337,12 @@ async def import_purchases(
                     # document_id es obligatorio (y exógeno al CSV).
                     raise ValueError("Falta 'document_id' (UUID).")
 
-                # Fecha para determinar el año de numeración; aceptamos 'date' o 'created_at'.
-                # Si ninguna está presente → usamos utcnow().
-                dt = _parse_iso_dt((row.get("date") or row.get("created_at") or "").strip() or None)
+                # Fecha de la fila ('date' o 'created_at'; utcnow() si falta), ya leída en el paso 3.
                 year = dt.year
 
-                # Preparamos el contador de secuencia y recuperamos el prefijo del documento.
-                doc_id, prefix = await ensure_counter_for_uuid(doc_id_str, year)
-
-                # 5.2) Cálculo de secuencia y número visible
-                # Incrementamos la última secuencia para este (doc_id, year).
-                seq_counter[(doc_id, year)] += 1
-                sequence = seq_counter[(doc_id, year)]
-
-                # Construimos el "purchase_number" (ej.: FAC-2025-00001).
-                purchase_number = _build_doc_number(prefix, year, sequence)
+                # 5.2) Secuencia y número visible (ej.: FAC-2025-00001) desde el bloque reservado.
+                document_id, document_type, sequence, purchase_number = numbering.take(doc_id_str, year)
+                doc_id = str(document_id)
 
                 # 5.3) Construcción del modelo Purchase (cabecera)
                 purchase = Purchase(
@@ -0,0 +1,205 @@
+# =============================================================================
+# STOCK (consultas de existencias)
+# =============================================================================
+from uuid import UUID
+from typing import Optional, List
+from datetime import datetime
+import json
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import get_async_db
+from app.db.replica import get_read_db
+from app.db.async_session import AsyncSessionLocal
+from app.dependencies.current_user import get_current_user
+from app.models.user import User
+from app.schemas.stock import StockAsOfResponse, StockValuationResponse, StockAvailabilityResponse, StockCacheMetrics
+from app.schemas.stock_alert import StockAlertListResponse, StockAlertRead
+from app.schemas.stock_reservation import StockReservationCreate, StockReservationRead
+from app.crud.stock import get_stock_as_of, get_inventory_valuation
+from app.crud.stock_reservation import create_reservations, release_reservation_by_id
+from app.crud.stock_alert import get_stock_alerts
+from app.helper.stock_alert import stream_alert_changes
+from app.helper.stock_cache import get_availability, stock_cache
+from app.helper.stock_reconcile import reconcile_stock
+
+# RBAC
+from app.security.authorization import requires_role
+from app.models.role import RoleTypeEnum
+
+logger = logging.getLogger(__name__)
+router = APIRouter(tags=["Stocks"])
+
+
+@router.get("/availability", response_model=StockAvailabilityResponse)
+async def read_stock_availability(
+    product_id: UUID = Query(...),
+    warehouse_id: Optional[UUID] = Query(None, description="Sin bodega: todas las bodegas del producto"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Disponible (quantity - reserved) para el POS, servido desde la caché en
+    proceso; sólo consulta la base de datos en un fallo de caché.
+    """
+    return await get_availability(db, product_id=product_id, warehouse_id=warehouse_id)
+
+
+@router.get(
+    "/availability/cache",
+    response_model=StockCacheMetrics,
+    dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))],
+)
+async def read_stock_cache_metrics():
+    """Aciertos, fallos, invalidaciones y tamaño de la caché de disponibilidad de este worker."""
+    return stock_cache.metrics()
+
+
+@router.get("/as-of", response_model=StockAsOfResponse)
+async def read_stock_as_of(
+    as_of: datetime = Query(..., description="Fecha/hora de corte (UTC si no trae zona)"),
+    product_id: Optional[UUID] = Query(None),
+    warehouse_id: Optional[UUID] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Stock a una fecha pasada para un producto, una bodega completa o un par."""
+    try:
+        return await get_stock_as_of(
+            db,
+            as_of=as_of,
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            user_id=current_user.id,
+        )
+    except HTTPException:
+        raise
+    except Exception:
+        await db.rollback()
+        logger.exception("Error inesperado al consultar stock a fecha")
+        raise HTTPException(status_code=500, detail="Ocurrió un error al consultar el stock")
+
+
+
+@router.get("/valuation", response_model=StockValuationResponse)
+async def read_inventory_valuation(
+    warehouse_id: Optional[UUID] = Query(None),
+    product_id: Optional[UUID] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Valorización del inventario a costo promedio ponderado, con totales por bodega."""
+    return await get_inventory_valuation(
+        db,
+        skip=skip,
+        limit=limit,
+        warehouse_id=warehouse_id,
+        product_id=product_id,
+        user_id=current_user.id,
+    )
+
+# =============================================================================
+# APARTADOS (reservas con TTL)
+# =============================================================================
+@router.post("/reservations", response_model=List[StockReservationRead], status_code=201)
+async def create_reservation_endpoint(
+    data: StockReservationCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Aparta stock de una o varias líneas (todo o nada); 409 si no hay disponible."""
+    reservations = await create_reservations(db, data, current_user.id)
+    return [StockReservationRead.model_validate(r) for r in reservations]
+
+
+@router.post("/reservations/{reservation_id}/release", response_model=StockReservationRead)
+async def release_reservation_endpoint(
+    reservation_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Libera un apartado activo (carrito cancelado o abandonado)."""
+    reservation = await release_reservation_by_id(db, reservation_id, user_id=current_user.id)
+    return StockReservationRead.model_validate(reservation)
+
+
+# =============================================================================
+# ALERTAS DE MÍNIMO / MÁXIMO
+# =============================================================================
+@router.get("/alerts", response_model=StockAlertListResponse)
+async def list_stock_alerts(
+    status: Optional[str] = Query("OPEN", pattern="^(OPEN|RESOLVED)$"),
+    alert_type: Optional[str] = Query(None, pattern="^(LOW|OVER)$"),
+    warehouse_id: Optional[UUID] = Query(None),
+    product_id: Optional[UUID] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Alertas de stock bajo / sobre-stock (por defecto, las abiertas)."""
+    result = await get_stock_alerts(
+        db,
+        skip=skip,
+        limit=limit,
+        status=status,
+        alert_type=alert_type,
+        warehouse_id=warehouse_id,
+        product_id=product_id,
+        user_id=current_user.id,
+    )
+    return StockAlertListResponse(
+        total=result["total"],
+        items=[StockAlertRead.model_validate(a) for a in result["items"]],
+    )
+
+
+@router.get("/alerts/stream")
+async def stream_stock_alerts(
+    since: Optional[int] = Query(None, ge=0, description="Último change_seq recibido (reanudar)"),
+    warehouse_id: Optional[UUID] = Query(None),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Stream (Server-Sent Events) de aperturas y resoluciones de alertas.
+    Para reanudar, enviar el último `id` recibido como `since`.
+    """
+    return StreamingResponse(
+        stream_alert_changes(AsyncSessionLocal, since=since, warehouse_id=warehouse_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# =============================================================================
+# CONCILIACIÓN (sólo administradores)
+# =============================================================================
+@router.post("/reconcile", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def reconcile_stock_endpoint(
+    warehouse_id: Optional[List[UUID]] = Query(None),
+    fix: bool = Query(False, description="Corrige los pares descuadrados"),
+    concurrency: int = Query(4, ge=1, le=8),
+    batch_size: int = Query(500, ge=1, le=5000),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Compara `stocks.quantity` con entradas - salidas (desde el último cierre) y
+    devuelve el reporte de descuadres en streaming (NDJSON), bodega por bodega.
+    """
+    async def _ndjson():
+        async for item in reconcile_stock(
+            AsyncSessionLocal,
+            warehouse_ids=warehouse_id,
+            concurrency=concurrency,
+            fix=fix,
+            batch_size=batch_size,
+            user_id=current_user.id,
+        ):
+            yield json.dumps(item, default=str) + "\n"
+
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
@@ -0,0 +1,82 @@
+# =============================================================================
+# SISTEMA (métricas de infraestructura, sólo administradores)
+# =============================================================================
+import logging
+
+from fastapi import APIRouter, Depends, Query
+
+from app.db.async_session import async_engine
+from app.db.engine import engine_profile, pool_metrics, pool_wait_metrics
+from app.db.instrumentation import sql_route_metrics
+from app.db.replica import replica_router
+from app.db.slow_queries import slow_query_recorder
+from app.security.permissions import permission_registry
+from app.security.principal_cache import principal_cache
+
+# RBAC
+from app.security.authorization import requires_role
+from app.models.role import RoleTypeEnum
+
+logger = logging.getLogger(__name__)
+router = APIRouter(tags=["System"])
+
+
+@router.get("/db-pool", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def read_db_pool_metrics():
+    """
+    Perfil efectivo del motor, estado del pool y esperas de checkout de este
+    worker (promedio, p95/p99 aproximados por histograma, máximo y timeouts).
+    """
+    return {**pool_metrics(async_engine), "settings": engine_profile()}
+
+
+@router.get("/replica", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def read_replica_metrics():
+    """Retraso medido de la réplica y cuántas sesiones de lectura fueron a réplica o primario."""
+    return replica_router.metrics()
+
+
+@router.post("/db-pool/reset", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def reset_db_pool_metrics():
+    """Reinicia las métricas de espera (p. ej. antes de una prueba de carga)."""
+    pool_wait_metrics.reset()
+    return {"reset": True}
+
+
+@router.get("/sql", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def read_sql_metrics():
+    """SQL por ruta en este worker: peticiones, sentencias (promedio y máximo), tiempo de BD, filas y N+1 detectados."""
+    return sql_route_metrics.snapshot()
+
+
+@router.post("/sql/reset", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def reset_sql_metrics():
+    sql_route_metrics.reset()
+    return {"reset": True}
+
+
+@router.get("/slow-queries", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def read_slow_queries(limit: int = Query(50, ge=1, le=500)):
+    """
+    Últimas sentencias lentas de este worker (más recientes primero), con la
+    forma de sus parámetros y el plan de EXPLAIN (FORMAT JSON).
+    """
+    return slow_query_recorder.snapshot(limit)
+
+
+@router.post("/slow-queries/reset", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def reset_slow_queries():
+    slow_query_recorder.reset()
+    return {"reset": True}
+
+
+@router.get("/principal-cache", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def read_principal_cache_metrics():
+    """Aciertos, fallos e invalidaciones de la caché de usuario autenticado de este worker."""
+    return principal_cache.metrics()
+
+
+@router.get("/permissions", dependencies=[Depends(requires_role(RoleTypeEnum.ADMIN))])
+async def read_permission_registry_metrics():
+    """Roles compilados, máscaras distintas y scopes internados en este worker."""
+    return permission_registry.metrics()
@@ -1,7 +1,8 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from uuid import UUID
 from pydantic import BaseModel
+from app.schemas.security_schemas import SecureBaseModel
 
 class AuditLogCreate(BaseModel):
     action: str  # Acción: CREATE, UPDATE, DELETE, etc.
@@ -12,3 +13,17 @@ class AuditLogCreate(BaseModel):
 
     # El backend decide si guarda updated_at manualmente
     updated_at: Optional[datetime] = None
+
+class AuditLogRead(SecureBaseModel):
+    id: UUID
+    action: str
+    entity: str
+    entity_id: Optional[UUID] = None
+    description: str
+    user_id: Optional[UUID] = None
+    created_at: datetime
+
+class AuditLogPage(SecureBaseModel):
+    items: List[AuditLogRead]
+    # Cursor opaco para la página siguiente (None = no hay más)
+    next_cursor: Optional[str] = None
@@ -8,7 +8,9 @@ class EntryBase(SecureBaseModel):
     # Acepta campos adicionales de tu modelo (líneas, totales, etc.)
     model_config = {"extra": "allow"}
 
-class EntryCreate(EntryBase): pass
+class EntryCreate(EntryBase):
+    # Apartados que consume esta salida: se confirman en su misma transacción
+    reservation_ids: Optional[List[UUID]] = None
 class EntryUpdate(EntryBase): pass
 
 class EntryPatch(SecureBaseModel):
@@ -0,0 +1,27 @@
+from typing import Optional, List
+from uuid import UUID
+from datetime import datetime
+from decimal import Decimal
+from app.schemas.security_schemas import SecureBaseModel
+
+class KardexMovementRead(SecureBaseModel):
+    id: UUID
+    seq: int
+    product_id: UUID
+    warehouse_id: UUID
+    entry_id: Optional[UUID] = None
+    document_id: Optional[UUID] = None
+    document_number: Optional[str] = None
+    document_date: Optional[datetime] = None
+    movement_type: str
+    quantity: Decimal
+    unit_cost: Decimal
+    balance: Decimal
+    occurred_at: datetime
+    user_id: Optional[UUID] = None
+    model_config = {"from_attributes": True}
+
+class KardexListResponse(SecureBaseModel):
+    total: int
+    items: List[KardexMovementRead]
+    class Config: from_attributes = True
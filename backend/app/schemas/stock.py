@@ -1,6 +1,7 @@
 from typing import Optional, List
 from uuid import UUID
 from datetime import datetime
+from decimal import Decimal
 from app.schemas.security_schemas import SecureBaseModel
 
 class StockBase(SecureBaseModel):
@@ -23,3 +24,57 @@ class StockListResponse(SecureBaseModel):
     total: int
     items: List[StockRead]
     class Config: from_attributes = True
+
+class StockAsOfItem(SecureBaseModel):
+    product_id: UUID
+    warehouse_id: UUID
+    quantity: Decimal
+
+class StockAsOfResponse(SecureBaseModel):
+    as_of: datetime
+    period_end: Optional[datetime] = None  # cierre de periodo usado como punto de partida
+    total: int
+    items: List[StockAsOfItem]
+
+class StockValuationItem(SecureBaseModel):
+    product_id: UUID
+    warehouse_id: UUID
+    quantity: Decimal
+    avg_cost: Decimal
+    total_value: Decimal
+
+class StockValuationWarehouse(SecureBaseModel):
+    warehouse_id: UUID
+    items: int
+    quantity: Decimal
+    total_value: Decimal
+
+class StockValuationResponse(SecureBaseModel):
+    total: int
+    total_value: Decimal
+    warehouses: List[StockValuationWarehouse]
+    items: List[StockValuationItem]
+
+class StockAvailabilityWarehouse(SecureBaseModel):
+    warehouse_id: UUID
+    quantity: Decimal
+    reserved: Decimal
+    available: Decimal
+
+class StockAvailabilityResponse(SecureBaseModel):
+    product_id: UUID
+    quantity: Decimal
+    reserved: Decimal
+    available: Decimal
+    warehouses: List[StockAvailabilityWarehouse]
+
+class StockCacheMetrics(SecureBaseModel):
+    enabled: bool
+    size: int
+    max_products: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    hit_ratio: float
+    invalidations: int
+    evictions: int
@@ -0,0 +1,23 @@
+from typing import Optional, List
+from uuid import UUID
+from datetime import datetime
+from decimal import Decimal
+from app.schemas.security_schemas import SecureBaseModel
+
+class StockAlertRead(SecureBaseModel):
+    id: UUID
+    product_id: UUID
+    warehouse_id: UUID
+    alert_type: str
+    status: str
+    quantity: Decimal
+    threshold: Decimal
+    change_seq: int
+    opened_at: datetime
+    resolved_at: Optional[datetime] = None
+    model_config = {"from_attributes": True}
+
+class StockAlertListResponse(SecureBaseModel):
+    total: int
+    items: List[StockAlertRead]
+    class Config: from_attributes = True
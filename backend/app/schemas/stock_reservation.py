@@ -0,0 +1,29 @@
+from typing import Optional, List
+from uuid import UUID
+from datetime import datetime
+from decimal import Decimal
+from pydantic import Field
+from app.schemas.security_schemas import SecureBaseModel
+
+class StockReservationLine(SecureBaseModel):
+    product_id: UUID
+    warehouse_id: UUID
+    quantity: Decimal = Field(..., gt=0)
+
+class StockReservationCreate(SecureBaseModel):
+    lines: List[StockReservationLine] = Field(..., min_length=1)
+    ttl_seconds: Optional[int] = Field(None, gt=0)   # por defecto RESERVATION_TTL_SECONDS
+    reference: Optional[str] = Field(None, max_length=100)
+
+class StockReservationRead(SecureBaseModel):
+    id: UUID
+    product_id: UUID
+    warehouse_id: UUID
+    quantity: Decimal
+    status: str
+    reference: Optional[str] = None
+    entry_id: Optional[UUID] = None
+    expires_at: datetime
+    user_id: Optional[UUID] = None
+    created_at: datetime
+    model_config = {"from_attributes": True}
@@ -6,9 +6,11 @@ from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import noload
 from app.core.jwt import decode_token
 from app.core.security import get_async_db
 from app.models.user import User
+from app.security.principal_cache import principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
@@ -56,6 +58,7 @@ class JWTAuthMiddleware(BaseHTTPMiddleware):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
 
         request.state.user_id = payload["sub"]
+        request.state.token_iat = payload.get("iat")  # versión del token para la caché de principal
         request.state.role = payload.get("role")
         scopes_raw = payload.get("scopes") or payload.get("scope") or []
         request.state.scopes = scopes_raw.split() if isinstance(scopes_raw, str) else list(scopes_raw)
@@ -64,15 +67,29 @@ class JWTAuthMiddleware(BaseHTTPMiddleware):
 
 # dependencia opcional
 async def get_current_user(request: Request, db: AsyncSession = Depends(get_async_db)) -> User:
-    from sqlalchemy import select
+    """
+    Usuario autenticado. Se sirve de la caché de principal (sin consultas) y
+    sólo en un fallo lee `users`; la sesión no abre conexión si no se usa.
+    """
     uid = getattr(request.state, "user_id", None)
+    token_version = getattr(request.state, "token_iat", None)
     if not uid:
         token = await oauth2_scheme(request)
         payload = decode_token(token, expected_type="access")
         if not payload or "sub" not in payload:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing token")
         uid = payload["sub"]
-    user = (await db.execute(select(User).where(User.id == uid))).scalar_one_or_none()
+        token_version = payload.get("iat")
+
+    user = principal_cache.get(uid, token_version)
+    if user is None:
+        generation = principal_cache.generation
+        # `created_by` (selectin) no hace falta para autenticar: evita la segunda consulta
+        user = (await db.execute(
+            select(User).where(User.id == uid).options(noload(User.created_by))
+        )).scalar_one_or_none()
+        if user is not None:
+            principal_cache.put(user, token_version, generation)
     if not user or not user.active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive or missing user")
     return user
@@ -1,31 +1,34 @@
 from __future__ import annotations
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from app.models.user import User
-from app.models.role import RoleTypeEnum, Role
+from app.models.role import RoleTypeEnum
 from app.core.security import get_async_db
 from app.security.authentication import get_current_user
+from app.security.permissions import permission_registry
+
+# Permisos resueltos en memoria (app/security/permissions.py): sin consultas por petición.
+# La sesión sólo se usa si el registro aún no se cargó (p. ej. falló la carga al arrancar).
 
 def _deny(): raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
 
 def has_permission(user: User, scope: str) -> bool:
-    if user.superuser: return True
-    if not user.role:  return False
-    scopes = user.role.scopes or []
-    return scope in scopes
+    return permission_registry.allows(user, permission_registry.compile(scope))
 
 def requires_role(*accepted: RoleTypeEnum):
+    accepted_set = frozenset(accepted)
     async def _dep(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
         if user.superuser: return
         if not user.role_id: _deny()
-        role_type = (await db.execute(select(Role.role_type).where(Role.id==user.role_id))).scalar_one_or_none()
-        if role_type not in accepted: _deny()
+        await permission_registry.ensure_loaded(db)
+        role = permission_registry.role(user.role_id)
+        if role is None or role.role_type not in accepted_set: _deny()
     return _dep
 
 def requires_scopes(*required_scopes: str):
-    async def _dep(user: User = Depends(get_current_user)):
+    required = permission_registry.compile(*required_scopes)  # máscara compilada una vez por ruta
+    async def _dep(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
         if user.superuser: return
-        for s in required_scopes:
-            if not has_permission(user, s): _deny()
+        await permission_registry.ensure_loaded(db)
+        if not permission_registry.allows(user, required): _deny()
     return _dep
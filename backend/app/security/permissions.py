@@ -0,0 +1,177 @@
+# ===========================================================
+# permissions.py
+# Registro de permisos: roles compilados a bitsets en memoria
+# ===========================================================
+# - Cada scope ("users:read", "write", ...) se interna una sola vez y recibe
+#   un bit; cada rol se compila a un entero con los bits de sus scopes.
+#   Un chequeo de permisos es `mask & requerido == requerido`: O(1), sin
+#   recorrer la lista JSON ni consultar la base de datos.
+# - `requires_scopes(...)` compila su máscara al definirse la ruta;
+#   `requires_role(...)` compara el role_type ya cargado del rol.
+# - Se carga completo al arrancar (una consulta) y se recarga cuando se
+#   confirma un cambio de roles: en este worker (after_commit) y en los demás
+#   (NOTIFY en ROLES_CHANNEL, en la misma transacción del cambio).
+import asyncio
+import logging
+from dataclasses import dataclass
+from itertools import chain
+from typing import Iterable, Optional
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.after_commit import on_commit
+from app.db.async_session import AsyncSessionLocal
+from app.models.role import Role, RoleTypeEnum
+
+logger = logging.getLogger(__name__)
+
+ROLES_CHANNEL = "roles_changed"
+_PENDING_KEY = "roles_changed"
+
+
+class ScopeInterner:
+    """scope -> bit. Los bits no se reasignan: una máscara compilada sigue siendo válida."""
+
+    def __init__(self) -> None:
+        self._bits: dict[str, int] = {}
+
+    def bit(self, scope: str) -> int:
+        scope = scope.strip()
+        bit = self._bits.get(scope)
+        if bit is None:
+            bit = self._bits[scope] = 1 << len(self._bits)
+        return bit
+
+    def mask(self, scopes: Iterable[str]) -> int:
+        mask = 0
+        for scope in scopes or ():
+            if isinstance(scope, str) and scope.strip():
+                mask |= self.bit(scope)
+        return mask
+
+    def __len__(self) -> int:
+        return len(self._bits)
+
+
+@dataclass(frozen=True)
+class CompiledRole:
+    role_type: Optional[RoleTypeEnum]
+    mask: int
+    active: bool
+
+
+class PermissionRegistry:
+    def __init__(self) -> None:
+        self.scopes = ScopeInterner()
+        self._roles: dict[str, CompiledRole] = {}
+        self._masks: dict[int, int] = {}          # máscaras internadas: roles iguales comparten el int
+        self._generation = 0
+        self._reload_task: Optional[asyncio.Task] = None
+        self._reload_again = False
+        self.loaded = False
+        self.loads = 0
+
+    def compile(self, *scopes: str) -> int:
+        return self.scopes.mask(scopes)
+
+    async def load(self, db: AsyncSession) -> None:
+        """Compila todos los roles con una consulta y reemplaza el registro de una vez."""
+        generation = self._generation
+        rows = (await db.execute(select(Role.id, Role.role_type, Role.scopes, Role.active))).all()
+        roles: dict[str, CompiledRole] = {}
+        for role_id, role_type, scopes, active in rows:
+            mask = self.scopes.mask(scopes)
+            mask = self._masks.setdefault(mask, mask)
+            roles[str(role_id)] = CompiledRole(role_type=role_type, mask=mask, active=bool(active))
+        if generation == self._generation:
+            self._roles = roles
+            self.loaded = True
+        self.loads += 1
+
+    async def reload(self, session_factory) -> None:
+        try:
+            async with session_factory() as db:
+                await self.load(db)
+        except Exception:
+            logger.exception("Error recargando el registro de permisos")
+
+    def invalidate(self) -> None:
+        self._generation += 1
+
+    def schedule_reload(self, session_factory=AsyncSessionLocal) -> None:
+        """Recarga en segundo plano (desde callbacks síncronos); sin efecto fuera de un event loop."""
+        self.invalidate()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._reload_task is not None and not self._reload_task.done():
+            self._reload_again = True  # la carga en curso puede haber leído antes del cambio
+            return
+        self._reload_task = loop.create_task(self._reload_loop(session_factory))
+
+    async def _reload_loop(self, session_factory) -> None:
+        while True:
+            self._reload_again = False
+            await self.reload(session_factory)
+            if not self._reload_again:
+                return
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if not self.loaded:
+            await self.load(db)
+
+    def role(self, role_id) -> Optional[CompiledRole]:
+        return self._roles.get(str(role_id)) if role_id else None
+
+    def allows(self, user, required: int) -> bool:
+        """¿El rol del usuario tiene todos los bits de `required`? (superusuario: siempre)."""
+        if user.superuser:
+            return True
+        role = self.role(user.role_id)
+        return role is not None and role.mask & required == required
+
+    def metrics(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "roles": len(self._roles),
+            "distinct_masks": len(set(r.mask for r in self._roles.values())),
+            "scopes": len(self.scopes),
+            "loads": self.loads,
+        }
+
+
+permission_registry = PermissionRegistry()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_role_changes(session: Session, flush_context) -> None:
+    if not any(isinstance(obj, Role) for obj in chain(session.new, session.dirty, session.deleted)):
+        return
+    if session.info.get(_PENDING_KEY):
+        return
+    session.info[_PENDING_KEY] = True
+    if settings.PG_LISTENER_ENABLED:
+        session.connection().execute(
+            text("SELECT pg_notify(:channel, '')"), {"channel": ROLES_CHANNEL}
+        )
+
+    def _after_commit() -> None:
+        session.info.pop(_PENDING_KEY, None)
+        permission_registry.schedule_reload()
+
+    on_commit(session, "permission_registry", _after_commit)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_role_changes(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+
+def on_roles_notification(payload: Optional[str]) -> None:
+    """Handler de ROLES_CHANNEL (y de la reconexión del listener): recompila todo."""
+    permission_registry.schedule_reload()
@@ -0,0 +1,128 @@
+# ===========================================================
+# principal_cache.py
+# Caché en proceso del usuario autenticado (principal)
+# ===========================================================
+# - `get_current_user` guarda aquí las columnas del usuario (sin password)
+#   por (user_id, iat del token) durante PRINCIPAL_CACHE_TTL_SECONDS: la
+#   mayoría de peticiones autenticadas no consultan la base de datos. Un
+#   token nuevo (otro iat) vuelve a validar contra la base de datos.
+# - En un acierto se entrega un `User` transitorio (fuera de la sesión) con
+#   esas columnas; los endpoints sólo usan sus atributos.
+# - Cualquier cambio ORM a un User (o a un Role: afecta a todos) invalida al
+#   confirmarse la caché local y la de los demás workers (NOTIFY en
+#   PRINCIPALS_CHANNEL, emitido en la misma transacción del cambio).
+import time
+from itertools import chain
+from typing import Any, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.after_commit import on_commit
+from app.models.role import Role
+from app.models.user import User
+
+PRINCIPALS_CHANNEL = "principals_changed"
+_PENDING_KEY = "principals_changed"
+_ALL = ""
+
+_COLUMNS = (
+    "id", "username", "email", "full_name", "active", "superuser",
+    "role_id", "user_id", "created_at", "updated_at",
+)
+
+
+class PrincipalCache:
+    def __init__(self, ttl_seconds: float, max_users: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._users: dict[str, dict[Any, tuple[float, dict]]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, user_id, token_version) -> Optional[User]:
+        entry = self._users.get(str(user_id), {}).get(token_version)
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return User(**entry[1])
+
+    def put(self, user: User, token_version, generation: int) -> None:
+        # No se guarda si hubo una invalidación mientras se leía de la base de datos
+        if generation != self._generation:
+            return
+        if len(self._users) >= self.max_users:
+            self._users.clear()
+        values = {col: getattr(user, col) for col in _COLUMNS}
+        self._users.setdefault(str(user.id), {})[token_version] = (time.monotonic() + self.ttl_seconds, values)
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        self._generation += 1
+        self.invalidations += 1
+        if user_id:
+            self._users.pop(str(user_id), None)
+        else:
+            self._users.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "users": len(self._users),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_users=settings.PRINCIPAL_CACHE_MAX_USERS,
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_principal_changes(session: Session, flush_context) -> None:
+    changed: set[str] = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Role):
+            changed = {_ALL}
+            break
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(str(obj.id))
+    if not changed:
+        return
+
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    new = changed - pending
+    pending.update(changed)
+    if settings.PG_LISTENER_ENABLED:
+        conn = session.connection()
+        for payload in sorted(new):
+            conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": PRINCIPALS_CHANNEL, "payload": payload},
+            )
+
+    def _after_commit() -> None:
+        for user_id in session.info.pop(_PENDING_KEY, set()):
+            principal_cache.invalidate(user_id or None)
+
+    on_commit(session, "principal_cache", _after_commit)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_principal_changes(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+
+def on_principals_notification(payload: Optional[str]) -> None:
+    """Handler de PRINCIPALS_CHANNEL (payload = user_id; vacío o None = todos)."""
+    principal_cache.invalidate(payload or None)
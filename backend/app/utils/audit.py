@@ -1,7 +1,55 @@
 # app/utils/audit.py
+# ---------------------------------------------------------------
+# Registro de auditoría con dos rutas ("sinks") por clase de acción:
+#   - transaccional: AuditLog en la sesión del negocio + flush (se confirma
+#     o revierte junto con la operación). Para eventos que deben ser durables.
+#   - diferida: el evento va a la cola en memoria de `audit_buffer` y se
+#     escribe por lotes en segundo plano (sin flush en la petición). Las
+#     lecturas se encolan de inmediato; el resto, sólo al confirmarse la
+#     transacción del negocio (un rollback descarta sus eventos).
+# Las clases diferidas se eligen con AUDIT_BUFFERED_CLASSES (por defecto
+# "read"); si la cola no está activa o está llena se usa la transaccional.
+# `log_actions` es la variante por lote (p. ej. un log por par de stock
+# ajustado) y respeta la misma selección por clase.
+# Además, con AUDIT_READ_MODE="rollup" las lecturas no generan fila: se
+# cuentan por (minuto, usuario, entidad, acción) en `audit_read_rollups`.
+# ---------------------------------------------------------------
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
 from app.models.audit_log import AuditLog
+from app.utils.audit_buffer import audit_buffer
+from app.utils.audit_rollup import read_audit_aggregator
 from sqlalchemy.ext.asyncio import AsyncSession
 
+# Clases de acción; lo que no está listado es "write"
+AUDIT_ACTION_CLASSES: dict[str, frozenset[str]] = {
+    "read": frozenset({"GET", "GETID", "GETALL", "LIST", "EXPORT"}),
+    "stock": frozenset({"STOCK_ADJUST", "RESERVE", "RELEASE"}),
+}
+_BUFFERED_CLASSES = frozenset(c.strip().lower() for c in settings.AUDIT_BUFFERED_CLASSES.split(",") if c.strip())
+
+
+def audit_action_class(action: str) -> str:
+    for name, actions in AUDIT_ACTION_CLASSES.items():
+        if action in actions:
+            return name
+    return "write"
+
+
+def is_buffered_action(action: str) -> bool:
+    return audit_action_class(action) in _BUFFERED_CLASSES
+
+
+async def _buffer(db: AsyncSession, action: str, event: dict) -> bool:
+    """Lecturas: a la cola ya (no hay transacción que seguir). Escrituras: al confirmar `db`."""
+    if audit_action_class(action) == "read":
+        return await audit_buffer.put(event)
+    return audit_buffer.defer(db, event)
+
+
 async def log_action(
     db: AsyncSession,
     *,
@@ -10,7 +58,8 @@ async def log_action(
     description: str,
     user_id,
     entity_id=None,
-    updated_at=None
+    updated_at=None,
+    durable: Optional[bool] = None,   # True fuerza la ruta transaccional; None = según la clase
 ):
     log_data = {
         "action": action,
@@ -23,7 +72,38 @@ async def log_action(
     if updated_at is not None:
         log_data["updated_at"] = updated_at
 
+    if (
+        durable is not True
+        and settings.AUDIT_READ_MODE == "rollup"
+        and audit_action_class(action) == "read"
+        and read_audit_aggregator.record(user_id=user_id, entity=entity, action=action)
+    ):
+        return AuditLog(**log_data)  # lectura agregada: sin fila propia ni escritura en la petición
+
+    if durable is not True and updated_at is None and is_buffered_action(action):
+        event = {**log_data, "id": uuid.uuid4(), "created_at": datetime.now(timezone.utc)}
+        if await _buffer(db, action, event):
+            return AuditLog(**event)  # no se agrega a la sesión: lo escribe la tarea de fondo
+
     log = AuditLog(**log_data)
     db.add(log)
     await db.flush()
-    return log
\ No newline at end of file
+    return log
+
+
+async def log_actions(db: AsyncSession, events: list[dict]) -> None:
+    """
+    Varios eventos de una vez (dicts con action, entity, entity_id,
+    description, user_id). Los de clases diferidas van a la cola al
+    confirmarse `db`; el resto se agrega a la sesión SIN flush: se escriben
+    con el flush del caller.
+    """
+    pending: list[AuditLog] = []
+    for log_data in events:
+        if is_buffered_action(log_data["action"]):
+            event = {**log_data, "id": uuid.uuid4(), "created_at": datetime.now(timezone.utc)}
+            if await _buffer(db, log_data["action"], event):
+                continue
+        pending.append(AuditLog(**log_data))
+    if pending:
+        db.add_all(pending)
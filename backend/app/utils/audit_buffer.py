@@ -0,0 +1,197 @@
+# ===========================================================
+# audit_buffer.py
+# Escritura diferida de auditoría (cola en memoria + INSERT multi-fila)
+# ===========================================================
+# - `log_action` encola aquí los eventos de las clases configuradas como
+#   diferidas (por defecto, lecturas): la petición no escribe ni hace flush.
+# - Una tarea de fondo junta hasta `batch_size` eventos (o lo que llegue en
+#   `flush_interval` segundos) y los inserta con un único INSERT multi-fila,
+#   en su propia transacción corta.
+# - Contrapresión: la cola es acotada; si está llena, `put` espera hasta
+#   `put_timeout` y, si no hay espacio, devuelve False para que el caller use
+#   la ruta transaccional (no se pierden eventos).
+# - Al apagar, la tarea deja de aceptar eventos y vacía la cola antes de salir.
+# - Eventos de escrituras (`defer`): se encolan sólo cuando la transacción del
+#   negocio se confirma (after_commit); un rollback los descarta. Si en ese
+#   momento la cola está llena, se escriben aparte con una sesión propia.
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import event as sa_event, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.after_commit import on_commit
+from app.models.audit_log import AuditLog
+
+logger = logging.getLogger(__name__)
+
+_DEFERRED_KEY = "audit_buffer_deferred"
+
+
+class AuditBuffer:
+    def __init__(self, *, max_events: int, batch_size: int, flush_interval: float, put_timeout: float) -> None:
+        self.max_events = max_events
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._session_factory = None
+        self._tasks: set[asyncio.Task] = set()
+        self.running = False
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.fallbacks = 0
+        self.failed = 0
+
+    async def put(self, event: dict) -> bool:
+        """Encola un evento (dict con las columnas de AuditLog). False = usar la ruta transaccional."""
+        if not self.running or self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(event), timeout=self.put_timeout)
+            except asyncio.TimeoutError:
+                self.fallbacks += 1
+                return False
+        self.enqueued += 1
+        return True
+
+    def defer(self, db: AsyncSession | Session, event: dict) -> bool:
+        """Encola `event` cuando `db` confirme (un rollback lo descarta). False = usar la ruta transaccional."""
+        if not self.running or self._queue is None:
+            return False
+        session = db.sync_session if isinstance(db, AsyncSession) else db
+        session.info.setdefault(_DEFERRED_KEY, []).append(event)
+        on_commit(session, "audit_buffer", lambda: self._enqueue_committed(session.info.pop(_DEFERRED_KEY, [])))
+        return True
+
+    def _enqueue_committed(self, events: list[dict]) -> None:
+        """after_commit: a la cola sin esperar; lo que no entra se escribe aparte (ya está confirmado)."""
+        rest: list[dict] = []
+        for i, event in enumerate(events):
+            if not self.running or self._queue is None:
+                rest = events[i:]
+                break
+            try:
+                self._queue.put_nowait(event)
+                self.enqueued += 1
+            except asyncio.QueueFull:
+                rest = events[i:]
+                break
+        if not rest:
+            return
+        self.fallbacks += len(rest)
+        task = asyncio.get_running_loop().create_task(self._write(self._session_factory, rest))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _next_batch(self, stop: asyncio.Event) -> list[dict]:
+        """Primer evento (o `stop`) y luego lo que llegue hasta llenar el lote o vencer el intervalo."""
+        queue = self._queue
+        batch: list[dict] = []
+        if queue.empty():
+            getter = asyncio.create_task(queue.get())
+            stopper = asyncio.create_task(stop.wait())
+            try:
+                await asyncio.wait({getter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                stopper.cancel()
+                if getter.done():
+                    batch.append(getter.result())
+                else:
+                    getter.cancel()
+            if not batch:
+                return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or stop.is_set():
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, session_factory, batch: list[dict]) -> None:
+        for attempt in range(3):
+            try:
+                async with session_factory() as db:
+                    await db.execute(insert(AuditLog).values(batch))
+                    await db.commit()
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception:
+                logger.warning("Error escribiendo lote de auditoría (intento %d)", attempt + 1, exc_info=True)
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        # Un evento inválido (p. ej. FK) no debe arrastrar al resto del lote
+        for event in batch:
+            try:
+                async with session_factory() as db:
+                    await db.execute(insert(AuditLog).values(event))
+                    await db.commit()
+                self.written += 1
+            except Exception:
+                self.failed += 1
+                logger.error("Evento de auditoría descartado: %s", event, exc_info=True)
+
+    async def run(self, session_factory, stop: asyncio.Event) -> None:
+        """Tarea de fondo: escribe lotes hasta `stop` y luego vacía la cola."""
+        self._queue = asyncio.Queue(maxsize=self.max_events)
+        self._session_factory = session_factory
+        self.running = True
+        try:
+            while not stop.is_set():
+                batch = await self._next_batch(stop)
+                if batch:
+                    await self._write(session_factory, batch)
+        finally:
+            self.running = False
+            pending: list[dict] = []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            for i in range(0, len(pending), self.batch_size):
+                await self._write(session_factory, pending[i:i + self.batch_size])
+            if pending:
+                logger.info("Auditoría diferida: %d eventos escritos al apagar", len(pending))
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def metrics(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_events": self.max_events,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+            "failed": self.failed,
+        }
+
+
+@sa_event.listens_for(Session, "after_soft_rollback")
+def _discard_deferred(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_DEFERRED_KEY, None)
+
+
+audit_buffer = AuditBuffer(
+    max_events=settings.AUDIT_BUFFER_MAX_EVENTS,
+    batch_size=settings.AUDIT_BUFFER_BATCH_SIZE,
+    flush_interval=settings.AUDIT_BUFFER_FLUSH_SECONDS,
+    put_timeout=settings.AUDIT_BUFFER_PUT_TIMEOUT_SECONDS,
+)
@@ -1,7 +1,5 @@
-
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from app.models.setting import Setting
+from app.utils.settings_cache import settings_cache
 
 async def get_audit_level(db: AsyncSession) -> int:
     """
@@ -12,16 +10,13 @@ async def get_audit_level(db: AsyncSession) -> int:
     - 2: medium  (cambios y creación - UPDATE, DELETE, CREATE)
     - 3: full    (todas las operaciones CRUD, incluye lecturas/consultas)
 
+    Se lee de la caché de settings (cargada completa en memoria y recargada
+    al cambiar un setting), así las llamadas no consultan la base de datos.
+
     Returns:
         int: Nivel de auditoría actual. Por defecto: 1 (basic)
     """
-    result = await db.execute(
-        select(Setting.value).where(
-            Setting.key == "audit_level",
-            Setting.active == True
-        )
-    )
-    value = result.scalar_one_or_none()
+    value = await settings_cache.get(db, "audit_level", 1)
     try:
         return int(value)
     except (TypeError, ValueError):
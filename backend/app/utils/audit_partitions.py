@@ -0,0 +1,190 @@
+# ===========================================================
+# audit_partitions.py
+# Particiones mensuales de `audit_logs` (creación y retención)
+# ===========================================================
+# - `audit_logs` está particionada por RANGE (created_at), una partición por
+#   mes en UTC: `audit_logs_pAAAAMM` = [día 1 00:00Z, día 1 del mes siguiente).
+# - `ensure_audit_partitions` crea por adelantado las de los próximos meses.
+#   Si la partición DEFAULT ya recibió filas de ese rango, las mueve a la
+#   partición nueva (PostgreSQL no permite crearla en ese caso).
+# - Retención: las particiones con todo su rango anterior a
+#   AUDIT_RETENTION_MONTHS se desacoplan ("detach": quedan como tabla suelta
+#   para que scripts/audit_archive.py las archive y elimine) o se eliminan
+#   directamente ("drop").
+# - El mantenimiento periódico usa un advisory lock: con varios workers sólo
+#   uno lo ejecuta en cada vuelta.
+import asyncio
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "audit_logs"
+DEFAULT_PARTITION = "audit_logs_default"
+_PARTITION_RE = re.compile(r"^audit_logs_p(\d{4})(\d{2})$")
+_MAINTENANCE_LOCK_ID = 0x41554454  # "AUDT"
+
+
+def month_start(value: datetime) -> datetime:
+    value = value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + (month.month - 1) + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT_TABLE}_p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[datetime]:
+    """Mes (UTC) de una partición por su nombre, o None si no sigue el patrón."""
+    m = _PARTITION_RE.match(name)
+    if not m:
+        return None
+    return datetime(int(m.group(1)), int(m.group(2)), 1, tzinfo=timezone.utc)
+
+
+def _checked(name: str) -> str:
+    # Los nombres se interpolan en DDL: sólo se aceptan los del patrón
+    if partition_month(name) is None:
+        raise ValueError(f"Nombre de partición de auditoría inválido: {name!r}")
+    return name
+
+
+async def list_audit_partitions(db: AsyncSession) -> list[str]:
+    """Particiones mensuales adjuntas a `audit_logs`, de la más antigua a la más nueva."""
+    rows = (await db.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+    """), {"parent": PARENT_TABLE})).scalars().all()
+    return sorted(name for name in rows if partition_month(name) is not None)
+
+
+async def list_detached_audit_partitions(db: AsyncSession) -> list[str]:
+    """Tablas `audit_logs_pAAAAMM` ya desacopladas (pendientes de archivar)."""
+    rows = (await db.execute(text("""
+        SELECT c.relname
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema()
+          AND c.relkind = 'r'
+          AND NOT c.relispartition
+          AND c.relname LIKE 'audit\\_logs\\_p%'
+    """))).scalars().all()
+    return sorted(name for name in rows if partition_month(name) is not None)
+
+
+async def ensure_audit_partitions(db: AsyncSession, *, months_ahead: int, now: Optional[datetime] = None) -> list[str]:
+    """Crea las particiones del mes actual y `months_ahead` siguientes. No hace commit."""
+    current = month_start(now or datetime.now(timezone.utc))
+    existing = set(await list_audit_partitions(db))
+    created: list[str] = []
+    for offset in range(months_ahead + 1):
+        lower = add_months(current, offset)
+        upper = add_months(lower, 1)
+        name = partition_name(lower)
+        if name in existing:
+            continue
+        params = {"lower": lower, "upper": upper}
+        stray = (await db.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :lower AND created_at < :upper)"
+        ), params)).scalar()
+        bounds = f"FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+        if stray:
+            # La DEFAULT tiene filas del rango: se desacopla, se mueven y se vuelve a adjuntar
+            await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+            await db.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} FOR VALUES {bounds}"))
+            await db.execute(text(f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION}
+                    WHERE created_at >= :lower AND created_at < :upper
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """), params)
+            await db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        else:
+            await db.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} FOR VALUES {bounds}"))
+        created.append(name)
+    return created
+
+
+async def expired_audit_partitions(db: AsyncSession, *, retention_months: int, now: Optional[datetime] = None) -> list[str]:
+    """Particiones adjuntas cuyo mes completo queda fuera de la ventana de retención."""
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -retention_months)
+    return [name for name in await list_audit_partitions(db) if partition_month(name) < cutoff]
+
+
+async def detach_audit_partition(db: AsyncSession, name: str) -> None:
+    """Desacopla la partición (queda como tabla suelta con sus filas). No hace commit."""
+    await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {_checked(name)}"))
+
+
+async def drop_audit_partition(db: AsyncSession, name: str) -> None:
+    """Elimina la partición (adjunta o desacoplada) y sus filas. No hace commit."""
+    await db.execute(text(f"DROP TABLE IF EXISTS {_checked(name)}"))
+
+
+async def apply_audit_retention(db: AsyncSession, *, retention_months: int, action: str) -> list[str]:
+    """Aplica la retención ("detach", "drop" o "none"). No hace commit."""
+    if action not in ("detach", "drop", "none"):
+        raise ValueError(f"AUDIT_RETENTION_ACTION inválido: {action!r}")
+    if action == "none" or retention_months <= 0:
+        return []
+    expired = await expired_audit_partitions(db, retention_months=retention_months)
+    for name in expired:
+        if action == "drop":
+            await drop_audit_partition(db, name)
+        else:
+            await detach_audit_partition(db, name)
+    return expired
+
+
+async def maintain_audit_partitions(db: AsyncSession) -> bool:
+    """Una vuelta de mantenimiento en una transacción. False si otro worker la tiene."""
+    locked = (await db.execute(
+        text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": _MAINTENANCE_LOCK_ID}
+    )).scalar()
+    if not locked:
+        await db.rollback()
+        return False
+    # El DDL toma ACCESS EXCLUSIVE sobre audit_logs: mejor fallar y reintentar que bloquear escrituras
+    await db.execute(text("SET LOCAL lock_timeout = '5s'"))
+    created = await ensure_audit_partitions(db, months_ahead=settings.AUDIT_PARTITION_MONTHS_AHEAD)
+    expired = await apply_audit_retention(
+        db,
+        retention_months=settings.AUDIT_RETENTION_MONTHS,
+        action=settings.AUDIT_RETENTION_ACTION,
+    )
+    await db.commit()
+    if created:
+        logger.info("Particiones de auditoría creadas: %s", ", ".join(created))
+    if expired:
+        logger.info("Retención de auditoría (%s): %s", settings.AUDIT_RETENTION_ACTION, ", ".join(expired))
+    return True
+
+
+async def run_audit_partition_maintenance(session_factory, stop: asyncio.Event) -> None:
+    """Tarea de fondo: mantenimiento al arrancar y luego cada AUDIT_PARTITION_MAINTENANCE_INTERVAL_SECONDS."""
+    while not stop.is_set():
+        try:
+            async with session_factory() as db:
+                await maintain_audit_partitions(db)
+        except Exception:
+            logger.exception("Error en el mantenimiento de particiones de auditoría")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.AUDIT_PARTITION_MAINTENANCE_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
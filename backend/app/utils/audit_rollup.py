@@ -0,0 +1,104 @@
+# ===========================================================
+# audit_rollup.py
+# Auditoría agregada de lecturas (conteo por minuto en memoria)
+# ===========================================================
+# - Modo opcional (por defecto AUDIT_READ_MODE="row": una fila por lectura,
+#   visible en /api/audit-logs). En modo "rollup", cada lectura auditada (clase "read")
+#   sólo suma 1 a un contador en memoria por (minuto, usuario, entidad,
+#   acción): sin INSERT ni flush por petición.
+# - Una tarea de fondo vuelca los contadores cada AUDIT_ROLLUP_FLUSH_SECONDS
+#   a `audit_read_rollups` con un único UPSERT multi-fila que suma a lo ya
+#   guardado (varios workers escriben el mismo minuto sin pisarse).
+# - Si el volcado falla, los conteos vuelven a la memoria para el siguiente
+#   intento; al apagar se hace un último volcado.
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.models.audit_read_rollup import AuditReadRollup
+
+logger = logging.getLogger(__name__)
+
+# Límite de parámetros por sentencia (asyncpg: 32767) / 5 columnas
+_MAX_ROWS_PER_STATEMENT = 5000
+
+
+class ReadAuditAggregator:
+    def __init__(self, *, flush_interval: float) -> None:
+        self.flush_interval = flush_interval
+        self._counts: Counter = Counter()
+        self.running = False
+        self.recorded = 0
+        self.flushed_rows = 0
+
+    def record(self, *, user_id, entity: str, action: str, at: Optional[datetime] = None) -> bool:
+        """Suma una lectura. False si el agregador no está activo (usar otra ruta)."""
+        if not self.running or not user_id:
+            return False
+        at = at or datetime.now(timezone.utc)
+        bucket = at.replace(second=0, microsecond=0)
+        self._counts[(bucket, user_id, entity, action)] += 1
+        self.recorded += 1
+        return True
+
+    async def flush(self, session_factory) -> int:
+        counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+        rows = [
+            {"bucket": b, "user_id": u, "entity": e, "action": a, "reads": n}
+            for (b, u, e, a), n in sorted(counts.items(), key=lambda kv: (kv[0][0], str(kv[0][1]), kv[0][2], kv[0][3]))
+        ]
+        try:
+            async with session_factory() as db:
+                for i in range(0, len(rows), _MAX_ROWS_PER_STATEMENT):
+                    ins = pg_insert(AuditReadRollup).values(rows[i:i + _MAX_ROWS_PER_STATEMENT])
+                    await db.execute(ins.on_conflict_do_update(
+                        index_elements=[
+                            AuditReadRollup.bucket, AuditReadRollup.user_id,
+                            AuditReadRollup.entity, AuditReadRollup.action,
+                        ],
+                        set_={"reads": AuditReadRollup.reads + ins.excluded.reads, "updated_at": datetime.now(timezone.utc)},
+                    ))
+                await db.commit()
+        except Exception:
+            self._counts.update(counts)  # se reintenta en el siguiente volcado
+            raise
+        self.flushed_rows += len(rows)
+        return len(rows)
+
+    async def run(self, session_factory, stop: asyncio.Event) -> None:
+        """Tarea de fondo: vuelca cada `flush_interval` segundos y una última vez al apagar."""
+        self.running = True
+        try:
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                try:
+                    await self.flush(session_factory)
+                except Exception:
+                    logger.exception("Error volcando auditoría agregada de lecturas")
+        finally:
+            self.running = False
+            try:
+                await self.flush(session_factory)
+            except Exception:
+                logger.exception("Auditoría agregada: %d contadores sin volcar al apagar", len(self._counts))
+
+    def metrics(self) -> dict:
+        return {
+            "running": self.running,
+            "pending_rows": len(self._counts),
+            "recorded": self.recorded,
+            "flushed_rows": self.flushed_rows,
+        }
+
+
+read_audit_aggregator = ReadAuditAggregator(flush_interval=settings.AUDIT_ROLLUP_FLUSH_SECONDS)
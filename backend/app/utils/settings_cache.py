@@ -0,0 +1,172 @@
+# ===========================================================
+# settings_cache.py
+# Caché en proceso de la tabla `settings` (valores ya tipados)
+# ===========================================================
+# - Se carga TODA la tabla (settings activos) con una sola consulta: al
+#   arrancar y cada vez que cambia algo. Cada valor se convierte una vez según
+#   su `type` (bool, int, float, json; el resto queda como str) y las lecturas
+#   se sirven desde memoria, sin ida y vuelta a la base de datos.
+# - Los cambios por el router de settings invalidan la caché de TODOS los
+#   workers al confirmarse (LISTEN/NOTIFY en SETTINGS_CHANNEL, que además
+#   dispara la recarga) y la del worker local de inmediato (after_commit).
+#   SETTINGS_CACHE_TTL_SECONDS es sólo la red de seguridad si no hay listener.
+# - Una sesión con cambios de settings sin confirmar lee siempre de la base
+#   de datos y no guarda nada: la caché nunca ve valores no confirmados.
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.after_commit import on_commit
+from app.db.async_session import AsyncSessionLocal
+from app.models.setting import Setting
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_CHANNEL = "settings_changed"
+_DIRTY_KEY = "settings_dirty"
+
+_TRUE_VALUES = {"true", "1", "yes", "on", "si", "sí"}
+
+
+def parse_setting_value(type_: Optional[str], value: Optional[str]) -> Any:
+    """Convierte el valor crudo según el `type` del setting. ValueError si no es válido."""
+    if value is None:
+        return None
+    kind = (type_ or "string").strip().lower()
+    if kind == "bool":
+        return value.strip().lower() in _TRUE_VALUES
+    if kind == "int":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    if kind == "json":
+        return json.loads(value)
+    return value
+
+
+def _parse_row(key: str, type_: Optional[str], value: Optional[str]) -> Any:
+    try:
+        return parse_setting_value(type_, value)
+    except ValueError:
+        # Un valor mal cargado no debe tumbar la caché: se ignora (=> default)
+        logger.warning("Setting %r con valor inválido para el tipo %r: %r", key, type_, value)
+        return None
+
+
+class SettingsCache:
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._values: Optional[dict[str, Any]] = None
+        self._expires = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._reload_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def _fresh(self) -> bool:
+        return self._values is not None and self._expires > time.monotonic()
+
+    async def load(self, db: AsyncSession) -> dict[str, Any]:
+        """Lee todos los settings activos en una consulta y los deja tipados en memoria."""
+        generation = self._generation
+        rows = (await db.execute(
+            select(Setting.key, Setting.type, Setting.value).where(Setting.active == True)
+        )).all()
+        values = {key: _parse_row(key, type_, value) for key, type_, value in rows}
+        # No se publica si hubo una invalidación durante la lectura
+        if generation == self._generation:
+            self._values = values
+            self._expires = time.monotonic() + self.ttl_seconds
+        self.loads += 1
+        return values
+
+    async def reload(self, session_factory) -> None:
+        """Recarga con una sesión propia (arranque y avisos de cambio)."""
+        try:
+            async with self._lock:
+                async with session_factory() as db:
+                    await self.load(db)
+        except Exception:
+            logger.exception("Error recargando la caché de settings")
+
+    async def get(self, db: AsyncSession, key: str, default: Any = None) -> Any:
+        """Valor tipado del setting activo `key`, o `default` si no existe o es inválido."""
+        if db.sync_session.info.get(_DIRTY_KEY, False):
+            self.misses += 1
+            row = (await db.execute(
+                select(Setting.type, Setting.value).where(Setting.key == key, Setting.active == True)
+            )).first()
+            value = _parse_row(key, *row) if row is not None else None
+            return default if value is None else value
+
+        if self._fresh():
+            self.hits += 1
+            values = self._values
+        else:
+            self.misses += 1
+            async with self._lock:
+                # Otro request pudo recargar mientras esperábamos el lock
+                values = self._values if self._fresh() else await self.load(db)
+        value = values.get(key)
+        return default if value is None else value
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        """Valor tipado desde memoria, sin sesión ni consulta (default si aún no hay carga)."""
+        value = (self._values or {}).get(key)
+        return default if value is None else value
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._expires = 0.0
+
+    def schedule_reload(self, session_factory) -> None:
+        """Recarga en segundo plano (desde callbacks síncronos); sin efecto fuera de un event loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = loop.create_task(self.reload(session_factory))
+
+    def metrics(self) -> dict:
+        return {
+            "loaded": self._values is not None,
+            "keys": len(self._values or {}),
+            "fresh": self._fresh(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+        }
+
+
+settings_cache = SettingsCache(ttl_seconds=settings.SETTINGS_CACHE_TTL_SECONDS)
+
+
+def mark_settings_changed(db: AsyncSession) -> None:
+    """
+    Llamar ANTES de modificar settings en `db`: desde ese momento la sesión no
+    usa la caché, y al confirmar se invalida la caché del worker local.
+    """
+    session = db.sync_session
+    session.info[_DIRTY_KEY] = True
+
+    def _after_commit() -> None:
+        session.info.pop(_DIRTY_KEY, None)
+        settings_cache.invalidate()
+        settings_cache.schedule_reload(AsyncSessionLocal)
+
+    on_commit(db, "settings_cache", _after_commit)
+
+
+def on_settings_notification(payload: Optional[str]) -> None:
+    """Handler de SETTINGS_CHANNEL: cualquier aviso invalida todo y recarga (son pocas claves)."""
+    settings_cache.invalidate()
+    settings_cache.schedule_reload(AsyncSessionLocal)
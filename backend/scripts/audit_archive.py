@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Archivo de auditoría: vuelca las particiones vencidas de audit_logs a
+archivos CSV comprimidos (gzip) y luego las elimina.
+
+Por cada partición fuera de la retención (más las ya desacopladas por el
+mantenimiento con AUDIT_RETENTION_ACTION="detach"):
+  1. se desacopla de audit_logs (deja de recibir lecturas y escrituras),
+  2. se copia con COPY ... TO STDOUT a <output-dir>/audit_logs_pAAAAMM.csv.gz
+     (archivo temporal + rename: nunca queda un archivo a medias),
+  3. se verifica que el número de filas copiadas coincide con la tabla,
+  4. sólo entonces se elimina la tabla.
+
+Ejecutar: python scripts/audit_archive.py [--retention-months 12] [--output-dir ./audit_archive]
+          [--mode archive|detach|drop] [--dry-run]
+  archive  desacopla, archiva y elimina (por defecto)
+  detach   sólo desacopla (el archivado se hace después)
+  drop     desacopla y elimina SIN archivar
+"""
+
+import argparse
+import asyncio
+import gzip
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import text
+
+# Agregar el directorio raíz al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.db.async_session import AsyncSessionLocal, async_engine
+from app.utils.audit_partitions import (
+    detach_audit_partition,
+    drop_audit_partition,
+    expired_audit_partitions,
+    list_detached_audit_partitions,
+)
+
+
+async def _copy_to_gzip(table: str, target: Path) -> int:
+    """COPY de la tabla a `target` (gzip). Devuelve las filas escritas."""
+    tmp = target.with_name(target.name + ".tmp")
+    async with async_engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        with gzip.open(tmp, "wb") as gz:
+            async def sink(chunk: bytes) -> None:
+                gz.write(chunk)
+
+            status = await raw.driver_connection.copy_from_table(
+                table, output=sink, format="csv", header=True
+            )
+        await conn.rollback()
+    with open(tmp, "rb") as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp, target)
+    return int(status.split()[-1])  # "COPY <n>"
+
+
+async def _count(table: str) -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(text(f"SELECT count(*) FROM {table}"))).scalar()
+
+
+async def run(retention_months: int, output_dir: Path, mode: str, dry_run: bool) -> None:
+    async with AsyncSessionLocal() as db:
+        expired = await expired_audit_partitions(db, retention_months=retention_months)
+        detached = await list_detached_audit_partitions(db)
+    pending = sorted(set(expired) | set(detached))
+    if not pending:
+        print("No hay particiones de auditoría vencidas.")
+        return
+    if dry_run:
+        for name in pending:
+            state = "adjunta" if name in expired else "desacoplada"
+            print(f"{name} ({state}): {await _count(name)} filas")
+        return
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for name in pending:
+        if name in expired:
+            async with AsyncSessionLocal() as db:
+                await detach_audit_partition(db, name)
+                await db.commit()
+            print(f"{name}: desacoplada")
+        if mode == "detach":
+            continue
+
+        if mode == "archive":
+            target = output_dir / f"{name}.csv.gz"
+            rows = await _count(name)
+            copied = await _copy_to_gzip(name, target)
+            if copied != rows:
+                raise RuntimeError(f"{name}: COPY escribió {copied} filas de {rows}; no se elimina")
+            print(f"{name}: {copied} filas archivadas en {target}")
+
+        async with AsyncSessionLocal() as db:
+            await drop_audit_partition(db, name)
+            await db.commit()
+        print(f"{name}: eliminada")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-months", type=int, default=settings.AUDIT_RETENTION_MONTHS)
+    parser.add_argument("--output-dir", type=Path, default=Path("audit_archive"))
+    parser.add_argument("--mode", choices=("archive", "detach", "drop"), default="archive")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    if args.retention_months <= 0:
+        parser.error("--retention-months debe ser mayor que 0")
+    asyncio.run(run(args.retention_months, args.output_dir, args.mode, args.dry_run))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark: costo de autorización por petición.
+
+Compara, por llamada:
+  - requires_role anterior: SELECT roles.role_type por id en cada petición,
+    contra el registro de permisos (role_type ya compilado en memoria).
+  - has_permission anterior: búsqueda lineal del scope en la lista JSON del
+    rol (peor caso: el scope pedido es el último), contra el bitset
+    compilado (`mask & requerido == requerido`).
+
+Usa el primer rol existente para la parte de base de datos y roles
+sintéticos de --scopes scopes para la parte en memoria. No escribe nada.
+
+Ejecutar: python scripts/bench_authorization.py [--db-iterations 2000] [--iterations 200000] [--scopes 50]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Agregar el directorio raíz al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+
+from app.db.async_session import AsyncSessionLocal
+from app.models.role import Role, RoleTypeEnum
+from app.security.permissions import PermissionRegistry
+
+
+def _report(label: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(
+        f"{label:<40} media {statistics.fmean(samples) * 1e6:>9.2f} µs  "
+        f"p50 {statistics.median(samples) * 1e6:>9.2f} µs  p99 {p99 * 1e6:>9.2f} µs"
+    )
+
+
+async def bench_role_lookup(iterations: int) -> None:
+    registry = PermissionRegistry()
+    async with AsyncSessionLocal() as db:
+        role_id = (await db.execute(select(Role.id).limit(1))).scalar_one_or_none()
+        if role_id is None:
+            print("No hay roles en la base de datos: se omite la comparación de requires_role.")
+            return
+        await registry.load(db)
+        accepted = frozenset({RoleTypeEnum.ADMIN})
+
+        legacy: list[float] = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            role_type = (await db.execute(select(Role.role_type).where(Role.id == role_id))).scalar_one_or_none()
+            _ = role_type in accepted
+            legacy.append(time.perf_counter() - started)
+
+    compiled: list[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        role = registry.role(role_id)
+        _ = role is not None and role.role_type in accepted
+        compiled.append(time.perf_counter() - started)
+
+    _report("requires_role (SELECT por petición)", legacy)
+    _report("requires_role (registro en memoria)", compiled)
+
+
+def bench_scope_check(iterations: int, n_scopes: int) -> None:
+    scopes = [f"resource{i}:action{i % 4}" for i in range(n_scopes)]
+    wanted = scopes[-1]  # peor caso de la búsqueda lineal
+
+    registry = PermissionRegistry()
+    role_mask = registry.scopes.mask(scopes)
+    required = registry.compile(wanted)
+    role_json = list(scopes)
+    user = SimpleNamespace(superuser=False)
+
+    legacy: list[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        _ = not user.superuser and wanted in role_json
+        legacy.append(time.perf_counter() - started)
+
+    compiled: list[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        _ = not user.superuser and role_mask & required == required
+        compiled.append(time.perf_counter() - started)
+
+    _report(f"has_permission (lista, {n_scopes} scopes)", legacy)
+    _report(f"has_permission (bitset, {n_scopes} scopes)", compiled)
+
+
+async def run(db_iterations: int, iterations: int, n_scopes: int) -> None:
+    await bench_role_lookup(db_iterations)
+    bench_scope_check(iterations, n_scopes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-iterations", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--scopes", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.db_iterations, args.iterations, args.scopes))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark: numeración de documentos concurrente, antes y después.
+
+Compara, con N transacciones concurrentes sobre el MISMO tipo de documento:
+  - legacy:  SELECT documents ... FOR UPDATE + MAX(sequence_number) filtrado
+             por date_part('year', created_at) sobre `entries`,
+  - counter: `allocate_document_sequence` (UPSERT ... RETURNING sobre
+             `document_sequences`).
+
+Cada transacción toma su número, simula el resto de `create_entry` con
+pg_sleep(--hold-ms) y hace rollback: los contadores no avanzan.
+Con --seed N inserta N entradas sintéticas (BENCH-*) antes de medir, para
+que el MAX() recorra una tabla de tamaño realista, y las borra al final.
+Requiere al menos un tercero, concepto, bodega, usuario y un documento 'E'.
+
+Ejecutar: python scripts/bench_document_sequence.py [--tasks 200] [--concurrency 10] [--hold-ms 5] [--seed 100000]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import select, func, text
+
+from app.db.async_session import AsyncSessionLocal
+from app.models.document import Document
+from app.models.entry import Entry
+from app.core.sequence import allocate_document_sequence
+
+_SEED_ENTRIES = text("""
+    INSERT INTO entries (id, document_id, third_party_id, concept_id, warehouse_id, user_id,
+                         sequence_number, entry_number, subtotal, discount, tax, total, active, created_at)
+    SELECT gen_random_uuid(), :document_id, :third_party_id, :concept_id, :warehouse_id, :user_id,
+           g, 'BENCH-' || g, 0, 0, 0, 0, true, now()
+    FROM generate_series(1, :n) AS g
+""")
+
+
+async def _pick_fixture() -> dict:
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(text("""
+            SELECT
+              (SELECT id FROM documents WHERE document_type = 'E' LIMIT 1)  AS document_id,
+              (SELECT id FROM third_parties LIMIT 1)                        AS third_party_id,
+              (SELECT id FROM concepts LIMIT 1)                             AS concept_id,
+              (SELECT id FROM warehouses LIMIT 1)                           AS warehouse_id,
+              (SELECT id FROM users LIMIT 1)                                AS user_id
+        """))).mappings().one()
+    missing = [k for k, v in row.items() if v is None]
+    if missing:
+        raise SystemExit(f"Faltan datos base para el benchmark: {', '.join(missing)}")
+    return dict(row)
+
+
+async def _legacy_next(db, document_id, year: int) -> int:
+    """Implementación anterior de `get_next_document_number_async`."""
+    await db.execute(select(Document).where(Document.id == document_id).with_for_update())
+    res = await db.execute(
+        select(func.coalesce(func.max(Entry.sequence_number), 0)).where(
+            Entry.document_id == document_id,
+            func.date_part("year", Entry.created_at) == year,
+        )
+    )
+    return int(res.scalar_one() or 0) + 1
+
+
+async def _counter_next(db, document_id, year: int) -> int:
+    return await allocate_document_sequence(db, scope="entries", document_id=document_id, year=year)
+
+
+async def _measure(strategy, document_id, tasks: int, concurrency: int, hold_ms: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    year = datetime.utcnow().year
+    latencies: list[float] = []
+
+    async def _one() -> None:
+        async with sem, AsyncSessionLocal() as db:
+            t0 = time.perf_counter()
+            try:
+                await strategy(db, document_id, year)
+                if hold_ms:
+                    await db.execute(text("SELECT pg_sleep(:s)"), {"s": hold_ms / 1000})
+            finally:
+                await db.rollback()
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_one() for _ in range(tasks)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "tps": tasks / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+async def run(tasks: int, concurrency: int, hold_ms: int, seed: int) -> None:
+    fx = await _pick_fixture()
+    if seed:
+        async with AsyncSessionLocal() as db:
+            await db.execute(_SEED_ENTRIES, {**fx, "n": seed})
+            await db.execute(text("ANALYZE entries"))
+            await db.commit()
+    try:
+        print(f"{'estrategia':>10} | {'trans/s':>9} | {'p50 (ms)':>9} | {'p95 (ms)':>9}")
+        print("-" * 46)
+        for name, strategy in (("legacy", _legacy_next), ("counter", _counter_next)):
+            r = await _measure(strategy, fx["document_id"], tasks, concurrency, hold_ms)
+            print(f"{name:>10} | {r['tps']:>9.1f} | {r['p50']:>9.2f} | {r['p95']:>9.2f}")
+    finally:
+        if seed:
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("DELETE FROM entries WHERE entry_number LIKE 'BENCH-%'"))
+                await db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)  # <= pool_size + max_overflow
+    parser.add_argument("--hold-ms", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args.tasks, args.concurrency, args.hold_ms, args.seed))
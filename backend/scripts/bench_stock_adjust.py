@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ajuste incremental vs. reconstrucción completa del stock.
+
+Compara `adjust_stock_quantity` (aplica un delta con signo bajo FOR UPDATE)
+contra `rebuild_stock_quantity` (SUM de entradas - salidas sobre todo el
+histórico) para un par (producto, bodega) con 10k / 100k / 1M movimientos.
+
+Los movimientos sintéticos se insertan con `generate_series` dentro de una
+transacción que se revierte al final: la base de datos queda intacta.
+Requiere al menos un producto, bodega, tercero, concepto, usuario y un
+documento de tipo 'E' existentes.
+
+Ejecutar: python scripts/bench_stock_adjust.py [--sizes 10000,100000,1000000] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from app.db.async_session import AsyncSessionLocal
+from app.helper.stock import adjust_stock_quantity, rebuild_stock_quantity
+
+
+# ======================
+# SIEMBRA DE MOVIMIENTOS SINTÉTICOS
+# ======================
+_SEED_ENTRIES = text("""
+    INSERT INTO entries (id, document_id, third_party_id, concept_id, warehouse_id, user_id,
+                         sequence_number, entry_number, subtotal, discount, tax, total, active, created_at)
+    SELECT gen_random_uuid(), :document_id, :third_party_id, :concept_id, :warehouse_id, :user_id,
+           g, 'BENCH-' || g, 0, 0, 0, 0, true, now()
+    FROM generate_series(:start, :stop) AS g
+""")
+
+_SEED_ITEMS = text("""
+    INSERT INTO entry_items (id, entry_id, product_id, quantity, subtotal, discount, tax, total)
+    SELECT gen_random_uuid(), e.id, :product_id, 1, 0, 0, 0, 0
+    FROM entries e
+    WHERE e.entry_number LIKE 'BENCH-%' AND e.sequence_number BETWEEN :start AND :stop
+""")
+
+
+async def _pick_fixture(db) -> dict:
+    """Toma el primer registro existente de cada catálogo requerido por las FK."""
+    row = (await db.execute(text("""
+        SELECT
+          (SELECT id FROM documents WHERE document_type = 'E' LIMIT 1)  AS document_id,
+          (SELECT id FROM third_parties LIMIT 1)                        AS third_party_id,
+          (SELECT id FROM concepts LIMIT 1)                             AS concept_id,
+          (SELECT id FROM warehouses LIMIT 1)                           AS warehouse_id,
+          (SELECT id FROM users LIMIT 1)                                AS user_id,
+          (SELECT id FROM products LIMIT 1)                             AS product_id
+    """))).mappings().one()
+    missing = [k for k, v in row.items() if v is None]
+    if missing:
+        raise SystemExit(f"Faltan datos base para el benchmark: {', '.join(missing)}")
+    return dict(row)
+
+
+async def _time(fn, repeat: int) -> tuple[float, float]:
+    """Devuelve (mediana, p95) en milisegundos."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return statistics.median(samples), p95
+
+
+async def run(sizes: list[int], repeat: int) -> None:
+    async with AsyncSessionLocal() as db:
+        fx = await _pick_fixture(db)
+        pair = {"product_id": fx["product_id"], "warehouse_id": fx["warehouse_id"], "user_id": fx["user_id"]}
+        seeded = 0
+
+        print(f"{'movimientos':>12} | {'incremental p50/p95 (ms)':>26} | {'rebuild p50/p95 (ms)':>22}")
+        print("-" * 68)
+        try:
+            for size in sorted(sizes):
+                if size > seeded:
+                    params = {**fx, "start": seeded + 1, "stop": size}
+                    await db.execute(_SEED_ENTRIES, params)
+                    await db.execute(_SEED_ITEMS, params)
+                    await db.execute(text("ANALYZE entries"))
+                    await db.execute(text("ANALYZE entry_items"))
+                    seeded = size
+
+                # Deja el stock consistente antes de medir
+                await rebuild_stock_quantity(db, **pair)
+
+                inc = await _time(lambda: adjust_stock_quantity(db, **pair, delta=Decimal("1")), repeat)
+                reb = await _time(lambda: rebuild_stock_quantity(db, **pair), repeat)
+                print(f"{size:>12,} | {inc[0]:>12.2f} / {inc[1]:>11.2f} | {reb[0]:>10.2f} / {reb[1]:>9.2f}")
+        finally:
+            await db.rollback()  # nunca persistir los datos sintéticos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run([int(s) for s in args.sizes.split(",")], args.repeat))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Cierre de periodo de stock: escribe los snapshots de saldo por (producto, bodega).
+
+A partir del cierre, el recálculo de stock sólo suma los movimientos
+posteriores a la fecha de corte y no se admiten movimientos ni anulaciones
+con fecha dentro del periodo cerrado.
+
+Ejecutar: python scripts/close_stock_period.py [--period-end 2025-12-31T23:59:59] [--user-id <uuid>]
+Sin --period-end se cierra el mes calendario anterior (UTC).
+"""
+
+import argparse
+import asyncio
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.db.async_session import AsyncSessionLocal
+from app.helper.stock_snapshot import close_stock_period
+
+
+def _previous_month_end(now: datetime) -> datetime:
+    first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return first_of_month - timedelta(microseconds=1)
+
+
+async def run(period_end: datetime, user_id) -> None:
+    async with AsyncSessionLocal() as db:
+        try:
+            written = await close_stock_period(db, period_end=period_end, user_id=user_id)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    print(f"Periodo cerrado en {period_end.isoformat()}: {written} snapshots escritos.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--period-end", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--user-id", type=uuid.UUID, default=None)
+    args = parser.parse_args()
+    asyncio.run(run(args.period_end or _previous_month_end(datetime.utcnow()), args.user_id))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Conciliación de stock: compara `stocks.quantity` con el saldo esperado
+(último cierre + entradas - salidas activas posteriores) para todos los pares.
+
+Procesa las bodegas en paralelo (una conexión por bodega, hasta --concurrency)
+y escribe el reporte de descuadres como NDJSON (una línea JSON por registro)
+en stdout a medida que cada bodega termina. Con --fix corrige los pares
+descuadrados por lotes de --batch-size, en transacciones cortas.
+
+Ejecutar: python scripts/reconcile_stock.py [--warehouse <uuid> ...] [--concurrency 4] [--fix --user-id <uuid>] [--batch-size 500]
+Código de salida 1 si quedaron descuadres sin corregir o errores.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.db.async_session import AsyncSessionLocal
+from app.helper.stock_reconcile import reconcile_stock
+
+
+async def run(warehouse_ids, concurrency: int, fix: bool, batch_size: int, user_id) -> int:
+    summary = {}
+    async for item in reconcile_stock(
+        AsyncSessionLocal,
+        warehouse_ids=warehouse_ids,
+        concurrency=concurrency,
+        fix=fix,
+        batch_size=batch_size,
+        user_id=user_id,
+    ):
+        print(json.dumps(item, default=str), flush=True)
+        summary = item
+    pending = summary.get("drifted", 0) - summary.get("fixed", 0)
+    return 0 if pending == 0 and not summary.get("errors") else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--warehouse", type=uuid.UUID, action="append", default=None)
+    parser.add_argument("--concurrency", type=int, default=4)  # <= pool_size + max_overflow
+    parser.add_argument("--fix", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--user-id", type=uuid.UUID, default=None)
+    args = parser.parse_args()
+    if args.fix and not args.user_id:
+        parser.error("--fix requiere --user-id")
+    sys.exit(asyncio.run(run(args.warehouse, args.concurrency, args.fix, args.batch_size, args.user_id)))
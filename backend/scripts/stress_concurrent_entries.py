@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Prueba de estrés: movimientos de stock concurrentes con productos en común.
+
+Lanza cientos de transacciones en paralelo; cada una aplica deltas sobre un
+subconjunto aleatorio (y en orden aleatorio) de los mismos pares
+(producto, bodega), igual que `create_entry` con ítems en distinto orden.
+Al final verifica:
+  - que no hubo deadlocks ni errores,
+  - que no existen filas duplicadas en `stocks`,
+  - que cada saldo final = saldo inicial + suma de deltas confirmados.
+
+Incluye pares sin fila en `stocks` para ejercitar el alta concurrente.
+Al terminar revierte los deltas aplicados y elimina las filas que creó.
+
+Ejecutar: python scripts/stress_concurrent_entries.py [--tasks 500] [--pairs 20] [--lines 8] [--concurrency 15]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from decimal import Decimal
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.exc import DBAPIError
+
+from app.db.async_session import AsyncSessionLocal
+from app.models.stock import Stock
+from app.models.product import Product
+from app.models.warehouse import Warehouse
+from app.models.user import User
+from app.helper.stock import adjust_stock_quantities
+
+
+async def _pick_pairs(n: int) -> tuple[list[tuple], object]:
+    """Toma `n` pares producto × bodega existentes y un usuario para las altas."""
+    async with AsyncSessionLocal() as db:
+        user_id = (await db.execute(select(User.id).limit(1))).scalar_one_or_none()
+        products = (await db.execute(select(Product.id).limit(n))).scalars().all()
+        warehouses = (await db.execute(select(Warehouse.id).limit(2))).scalars().all()
+    pairs = [(p, w) for p in products for w in warehouses][:n]
+    if not pairs or user_id is None:
+        raise SystemExit("Faltan datos base (productos, bodegas o usuarios) para la prueba.")
+    return pairs, user_id
+
+
+async def _snapshot(pairs: list[tuple]) -> dict[tuple, list[Decimal]]:
+    """Cantidades por par (lista: más de una fila indica duplicados)."""
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(
+            select(Stock.product_id, Stock.warehouse_id, Stock.quantity)
+            .where(tuple_(Stock.product_id, Stock.warehouse_id).in_(pairs))
+        )
+        out: dict[tuple, list[Decimal]] = {}
+        for p, w, q in rows.all():
+            out.setdefault((p, w), []).append(Decimal(str(q)))
+        return out
+
+
+async def _one_entry(pairs, lines, user_id, sem, applied: Counter, failures: Counter) -> None:
+    chosen = random.sample(pairs, min(lines, len(pairs)))
+    random.shuffle(chosen)  # orden de ítems distinto en cada "entrada"
+    deltas = {pair: Decimal(random.randint(1, 5)) for pair in chosen}
+    async with sem, AsyncSessionLocal() as db:
+        try:
+            await adjust_stock_quantities(db, deltas=deltas, user_id=user_id, reason="STRESS")
+            await db.commit()
+            applied.update(deltas)
+        except DBAPIError as e:
+            await db.rollback()
+            failures["deadlock" if "deadlock" in str(e).lower() else type(e.orig).__name__] += 1
+
+
+async def run(tasks: int, n_pairs: int, lines: int, concurrency: int) -> int:
+    pairs, user_id = await _pick_pairs(n_pairs)
+    before = await _snapshot(pairs)
+    created = [p for p in pairs if p not in before]
+    print(f"pares={len(pairs)} (sin fila previa={len(created)}) tareas={tasks} líneas={lines} concurrencia={concurrency}")
+
+    applied: Counter = Counter()
+    failures: Counter = Counter()
+    sem = asyncio.Semaphore(concurrency)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_one_entry(pairs, lines, user_id, sem, applied, failures) for _ in range(tasks)))
+    elapsed = time.perf_counter() - t0
+
+    after = await _snapshot(pairs)
+    duplicates = {k: v for k, v in after.items() if len(v) > 1}
+    mismatches = {
+        k: (sum(before.get(k, [Decimal("0")])), applied[k], sum(after.get(k, [])))
+        for k in pairs
+        if sum(before.get(k, [Decimal("0")])) + applied[k] != sum(after.get(k, [Decimal("0")]))
+    }
+
+    print(f"tiempo={elapsed:.2f}s ({tasks / elapsed:.0f} tx/s) errores={dict(failures) or 0}")
+    print(f"duplicados={len(duplicates)} descuadres={len(mismatches)}")
+    for k, (b, d, a) in list(mismatches.items())[:10]:
+        print(f"  {k}: inicial={b} + deltas={d} != final={a}")
+
+    # Limpieza: revertir deltas y eliminar las filas creadas por la prueba
+    async with AsyncSessionLocal() as db:
+        await adjust_stock_quantities(db, deltas={k: -v for k, v in applied.items()}, user_id=user_id, reason="STRESS_CLEANUP")
+        if created:
+            await db.execute(delete(Stock).where(tuple_(Stock.product_id, Stock.warehouse_id).in_(created)))
+        await db.commit()
+
+    ok = not failures and not duplicates and not mismatches
+    print("OK" if ok else "FALLÓ")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--pairs", type=int, default=20)
+    parser.add_argument("--lines", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=15)  # <= pool_size + max_overflow
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.tasks, args.pairs, args.lines, args.concurrency)))